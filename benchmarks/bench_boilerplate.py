@@ -0,0 +1,81 @@
+"""
+Measure how much boilerplate ContentExtractor strips from a crawl: total chunk
+characters, tokens and chunks (i.e. embedding inputs and summary calls) with and
+without the learned per-site templates.
+
+    python crawl_pages.py --workers 8 --output crawl.jsonl
+    python benchmarks/bench_boilerplate.py crawl.jsonl --sample-pages 20
+
+Input is crawl_pages output, either the JSONL (or .jsonl.zst) records written by
+the concurrent mode or the data.json format ({"crawled_pages": {url: {...}}}).
+Only line-template stripping is measured here, as stored crawls keep no HTML for
+content selector detection.
+"""
+import os
+import sys
+import json
+import argparse
+from typing import List, Tuple
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from content_extractor import ContentExtractor
+from markdown_chunker import MarkdownChunker
+
+
+def load_pages(path: str) -> List[Tuple[str, str]]:
+    if path.endswith((".jsonl", ".jsonl.zst")):
+        from crawl_pages import JsonlWriter
+        return [
+            (record["url"], record["markdown"])
+            for record in JsonlWriter.read_records(path)
+            if record.get("status") == "success" and record.get("markdown")
+        ]
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return [
+        (url, page["markdown"])
+        for url, page in data.get("crawled_pages", {}).items()
+        if page.get("markdown")
+    ]
+
+
+def measure(chunker: MarkdownChunker, documents: List[str]) -> Tuple[int, int, int]:
+    chunks = [chunk for document in documents for chunk in chunker.chunks(document)]
+    return len(chunks), sum(len(chunk.text) for chunk in chunks), sum(chunk.tokens for chunk in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--sample-pages", type=int, default=20)
+    parser.add_argument("--min-page-fraction", type=float, default=0.6)
+    args = parser.parse_args()
+
+    pages = load_pages(args.path)
+    if not pages:
+        print(f"No crawled pages in {args.path}")
+        return
+
+    # A throwaway template store, learned from this crawl only
+    extractor = ContentExtractor(args.sample_pages, args.min_page_fraction, path=":memory:")
+    markdowns = dict(pages)
+    for url in extractor.sample_urls([url for url, _ in pages]):
+        extractor.observe(url, None, markdowns[url])
+    stripped = [extractor.strip(url, markdown) for url, markdown in pages]
+
+    chunker = MarkdownChunker()
+    before = measure(chunker, [markdown for _, markdown in pages])
+    after = measure(chunker, stripped)
+
+    print(f"{len(pages)} pages, templates learned from the first {args.sample_pages} of each host")
+    print(extractor.report())
+    for name, old, new in zip(("Chunks (embedding inputs)", "Chunk characters", "Chunk tokens"), before, after):
+        change = (old - new) / old if old else 0.0
+        print(f"{name}: {old} -> {new} (-{change:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compare per-chunk inserts (the original insert_chunk path) with ChunkWriter bulk
+upserts, in rows/sec.
+
+Run against a local Supabase stack (`supabase start`, which serves Postgres
+behind PostgREST) with site_pages.sql applied, and SUPABASE_URL /
+SUPABASE_SERVICE_KEY pointing at it:
+
+    python benchmarks/bench_chunk_writer.py --rows 2000 --batch-size 200
+
+Rows are written under a `https://bench.local/` URL prefix and deleted afterwards.
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import argparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from dotenv import load_dotenv
+from supabase import create_client
+
+from chunk_writer import ChunkWriter
+from repository import Repository
+
+BENCH_URL_PREFIX = "https://bench.local/"
+
+
+def fake_rows(count: int, run: str):
+    return [
+        {
+            "url": f"{BENCH_URL_PREFIX}{run}/page-{i // 10}",
+            "chunk_number": i % 10,
+            "title": f"Benchmark chunk {i}",
+            "summary": "Synthetic chunk used to benchmark writes.",
+            "content": "Pydantic AI agents call tools. " * 150,
+            "metadata": {"source": "benchmark"},
+            "embedding": [random.random() for _ in range(1536)],
+        }
+        for i in range(count)
+    ]
+
+
+async def per_chunk_inserts(client, rows) -> float:
+    async def insert_chunk(row):
+        client.table("site_pages").insert(row).execute()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[insert_chunk(row) for row in rows])
+    return time.perf_counter() - start
+
+
+async def bulk_upserts(repository, rows, batch_size: int) -> float:
+    writer = ChunkWriter(repository, batch_size=batch_size)
+    start = time.perf_counter()
+    for row in rows:
+        await writer.add(row)
+    await writer.flush()
+    elapsed = time.perf_counter() - start
+    print(writer.report())
+    return elapsed
+
+
+async def main(args):
+    load_dotenv()
+    client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    repository = Repository.from_env()
+    try:
+        insert_seconds = await per_chunk_inserts(client, fake_rows(args.rows, "insert"))
+        upsert_seconds = await bulk_upserts(repository, fake_rows(args.rows, "upsert"), args.batch_size)
+        print(f"Per-chunk insert: {args.rows / insert_seconds:.0f} rows/s ({insert_seconds:.2f}s)")
+        print(f"Bulk upsert:      {args.rows / upsert_seconds:.0f} rows/s ({upsert_seconds:.2f}s)")
+    finally:
+        client.table("site_pages").delete().like("url", f"{BENCH_URL_PREFIX}%").execute()
+        await repository.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
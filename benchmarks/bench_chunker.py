@@ -0,0 +1,113 @@
+"""
+Benchmark MarkdownChunker against the original character-based chunk_text on
+stored crawl output, reporting throughput, chunk-size distribution and how many
+chunks end up with unbalanced ``` fences.
+
+    python benchmarks/bench_chunker.py data.json --repeat 50
+
+Input files may hold a markdown string, a list of strings, or the crawl_pages
+output format ({"crawled_pages": {url: {"markdown": ...}}}).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import List
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from markdown_chunker import MarkdownChunker, count_tokens
+
+
+def original_chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
+    """chunk_text as it was in crawl_pydantic_ai_docs.py before MarkdownChunker."""
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    while start < text_length:
+        end = start + chunk_size
+        if end >= text_length:
+            chunks.append(text[start:].strip())
+            break
+
+        chunk = text[start:end]
+        code_block = chunk.rfind('```')
+        if code_block != -1 and code_block > chunk_size * 0.3:
+            end = start + code_block
+        elif '\n\n' in chunk:
+            last_break = chunk.rfind('\n\n')
+            if last_break > chunk_size * 0.3:
+                end = start + last_break
+        elif '. ' in chunk:
+            last_period = chunk.rfind('. ')
+            if last_period > chunk_size * 0.3:
+                end = start + last_period + 1
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = max(start + 1, end)
+
+    return chunks
+
+
+def load_documents(paths: List[str]) -> List[str]:
+    documents = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, str):
+            documents.append(data)
+        elif isinstance(data, list):
+            documents.extend(item for item in data if isinstance(item, str))
+        elif isinstance(data, dict):
+            for page in data.get("crawled_pages", {}).values():
+                if page.get("markdown"):
+                    documents.append(page["markdown"])
+    return documents
+
+
+def describe(name: str, chunks: List[str], seconds: float, total_chars: int):
+    chars = sorted(len(chunk) for chunk in chunks)
+    tokens = sorted(count_tokens(chunk) for chunk in chunks)
+    unbalanced = sum(1 for chunk in chunks if chunk.count("```") % 2)
+
+    def quantiles(values):
+        cuts = statistics.quantiles(values, n=10) if len(values) > 1 else values * 9
+        return f"p10 {cuts[0]:.0f}, p50 {cuts[4]:.0f}, p90 {cuts[8]:.0f}, max {values[-1]}"
+
+    print(f"{name}:")
+    print(f"  {total_chars / seconds / 1e6:.1f} MB/s, {len(chunks)} chunks")
+    print(f"  chars:  {quantiles(chars)}")
+    print(f"  tokens: {quantiles(tokens)}")
+    print(f"  chunks with unbalanced ``` fences: {unbalanced}")
+
+
+def main(args):
+    documents = load_documents(args.paths) * args.repeat
+    total_chars = sum(len(document) for document in documents)
+    print(f"{len(documents)} documents, {total_chars / 1e6:.1f} MB of markdown")
+
+    start = time.perf_counter()
+    original = [chunk for document in documents for chunk in original_chunk_text(document, args.chunk_size)]
+    describe("Original chunk_text", original, time.perf_counter() - start, total_chars)
+
+    chunker = MarkdownChunker(max_tokens=args.max_tokens, overlap_tokens=args.overlap_tokens)
+    start = time.perf_counter()
+    chunks = [chunk.text for document in documents for chunk in chunker.chunks(document)]
+    describe("MarkdownChunker", chunks, time.perf_counter() - start, total_chars)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="*", default=[os.path.join(parent_dir, "data.json")])
+    parser.add_argument("--repeat", type=int, default=50, help="Repeat the inputs to get a stable timing")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Characters per chunk for chunk_text")
+    parser.add_argument("--max-tokens", type=int, default=1200)
+    parser.add_argument("--overlap-tokens", type=int, default=0)
+    main(parser.parse_args())
@@ -0,0 +1,97 @@
+"""
+Measure crawl throughput of CrawlScheduler for different pool sizes against a
+local static test site, to check it scales close to linearly with the pool.
+
+    python benchmarks/bench_crawl_pool.py --pages 200 --pool-sizes 1 2 4 8
+
+Needs the Playwright browser installed (`playwright install chromium`).
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from aiohttp import web
+from crawl4ai import BrowserConfig, CrawlerRunConfig, CacheMode
+
+from crawl_scheduler import CrawlScheduler
+
+PAGE_TEMPLATE = """<!doctype html>
+<html><head><title>Page {n}</title></head>
+<body><nav><a href="/">Home</a></nav>
+<main><h1>Page {n}</h1>{paragraphs}</main></body></html>"""
+
+
+async def start_static_site(port: int, latency: float) -> web.AppRunner:
+    paragraph = "<p>" + "Pydantic AI agents call tools and validate results. " * 20 + "</p>"
+
+    async def page(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)  # Simulated server/network time
+        n = request.match_info["n"]
+        return web.Response(text=PAGE_TEMPLATE.format(n=n, paragraphs=paragraph * 10), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_get("/page/{n}", page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def measure(pool_size: int, browsers: int, urls) -> float:
+    browser_config = BrowserConfig(
+        headless=True,
+        verbose=False,
+        extra_args=["--disable-gpu", "--disable-dev-shm-usage", "--no-sandbox"],
+    )
+    crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
+    browsers = min(browsers, pool_size)
+    scheduler = CrawlScheduler(
+        browser_config,
+        crawl_config,
+        browsers=browsers,
+        pages_per_browser=max(1, pool_size // browsers),
+        max_per_host=pool_size,
+    )
+    failures = 0
+
+    async def handle(url, result):
+        nonlocal failures
+        failures += 0 if result.success else 1
+
+    async with scheduler:
+        start = time.perf_counter()
+        await scheduler.crawl(urls, handle)
+        elapsed = time.perf_counter() - start
+    if failures:
+        print(f"  {failures} failed crawls")
+    return len(urls) / elapsed
+
+
+async def main(args):
+    runner = await start_static_site(args.port, args.latency)
+    urls = [f"http://127.0.0.1:{args.port}/page/{n}" for n in range(args.pages)]
+    try:
+        baseline = None
+        for pool_size in args.pool_sizes:
+            rate = await measure(pool_size, args.browsers, urls)
+            baseline = baseline or rate / pool_size
+            print(f"Pool {pool_size:>3}: {rate:6.1f} pages/s "
+                  f"({rate / (baseline * pool_size):.0%} of linear scaling)")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--browsers", type=int, default=2, help="Browsers to spread each pool over")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--port", type=int, default=8780)
+    asyncio.run(main(parser.parse_args()))
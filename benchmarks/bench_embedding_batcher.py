@@ -0,0 +1,97 @@
+"""
+Compare one-request-per-chunk embedding with EmbeddingBatcher against the
+local fake OpenAI server. Batching cuts the request count (and so the load on
+the account's rate limits); a partial batch waits up to --flush-interval for
+more chunks, so wall time only improves when that is short next to a request's
+latency.
+
+    python benchmarks/bench_embedding_batcher.py --pages 300 --chunks-per-page 8
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from openai import AsyncOpenAI
+
+from embedding_batcher import EmbeddingBatcher, EMBEDDING_MODEL
+from fake_openai import FakeOpenAI, start_fake_openai
+
+
+def fake_chunks(pages: int, chunks_per_page: int):
+    return [
+        [f"Page {p} chunk {c}. " + "Pydantic AI agents call tools. " * 40 for c in range(chunks_per_page)]
+        for p in range(pages)
+    ]
+
+
+async def run_unbatched(client: AsyncOpenAI, docs, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed_doc(chunks):
+        async with semaphore:
+            await asyncio.gather(*[
+                client.embeddings.create(model=EMBEDDING_MODEL, input=chunk) for chunk in chunks
+            ])
+
+    start = time.perf_counter()
+    await asyncio.gather(*[embed_doc(chunks) for chunks in docs])
+    return time.perf_counter() - start
+
+
+async def run_batched(batcher: EmbeddingBatcher, docs, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def embed_doc(chunks):
+        async with semaphore:
+            await asyncio.gather(*[batcher.embed(chunk) for chunk in chunks])
+
+    start = time.perf_counter()
+    await asyncio.gather(*[embed_doc(chunks) for chunks in docs])
+    await batcher.close()
+    return time.perf_counter() - start
+
+
+async def main(args):
+    fake = FakeOpenAI(latency=args.latency)
+    runner = await start_fake_openai(fake, port=args.port)
+    client = AsyncOpenAI(api_key="fake", base_url=f"http://127.0.0.1:{args.port}/v1")
+    docs = fake_chunks(args.pages, args.chunks_per_page)
+
+    try:
+        unbatched = await run_unbatched(client, docs, args.concurrency)
+        unbatched_requests = fake.counters["embeddings"]
+
+        fake.counters["embeddings"] = 0
+        batcher = EmbeddingBatcher(
+            client,
+            max_inputs=args.max_inputs,
+            max_tokens=args.max_tokens,
+            flush_interval=args.flush_interval,
+        )
+        batched = await run_batched(batcher, docs, args.concurrency)
+
+        print(f"Unbatched: {unbatched_requests} requests in {unbatched:.2f}s")
+        print(f"Batched:   {fake.counters['embeddings']} requests in {batched:.2f}s")
+        print(batcher.report())
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--chunks-per-page", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--max-inputs", type=int, default=256)
+    parser.add_argument("--max-tokens", type=int, default=200000)
+    parser.add_argument("--flush-interval", type=float, default=0.02)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Compare vector-only and hybrid (full-text + vector, fused with RRF) retrieval on a
+fixed set of Pydantic AI questions: recall@k of the page that answers each
+question, and per-query latency of the backend call (embeddings are computed once
+up front and not timed).
+
+    python benchmarks/bench_hybrid_retrieval.py --backend local -k 5
+    python benchmarks/bench_hybrid_retrieval.py --backend supabase -k 5
+
+The local backend reads the index exported with `python retrieval_backends.py`;
+both need OPENAI_API_KEY to embed the questions.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List, Tuple
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from dotenv import load_dotenv
+from openai import AsyncOpenAI
+
+from repository import Repository
+from retrieval_backends import LocalVectorIndex, RetrievalBackend, SupabaseBackend
+
+load_dotenv()
+
+# (question, fragment of the URL of a page that answers it)
+QUESTIONS: List[Tuple[str, str]] = [
+    ("How do I raise ModelRetry from a tool?", "/tools/"),
+    ("What does RunContext.retry contain?", "/tools/"),
+    ("How do I pass dependencies to an agent with deps_type?", "/dependencies/"),
+    ("How do I stream structured results with run_stream?", "/results/"),
+    ("What is result_validator used for?", "/results/"),
+    ("How do I continue a conversation with message_history?", "/message-history/"),
+    ("What does all_messages() return?", "/message-history/"),
+    ("How do I use TestModel in unit tests?", "/testing-evals/"),
+    ("How can I override an agent's model with FunctionModel?", "/testing-evals/"),
+    ("How do I set up logfire instrumentation?", "/logfire/"),
+    ("Which models are supported, e.g. GeminiModel or GroqModel?", "/models/"),
+    ("How do I configure an OpenAI API key for OpenAIModel?", "/models/"),
+    ("What is the difference between run_sync and run?", "/agents/"),
+    ("How do I register a dynamic system prompt with @agent.system_prompt?", "/agents/"),
+    ("What does UnexpectedModelBehavior mean?", "/exceptions/"),
+    ("How are UsageLimits enforced?", "/agents/"),
+    ("How do I define a tool with tool_plain?", "/tools/"),
+    ("How do I use prepare to modify a tool definition per step?", "/tools/"),
+    ("How do I build a multi-agent application with agent delegation?", "/multi-agent-applications/"),
+    ("What does the bank support example show?", "/examples/bank-support/"),
+]
+
+
+async def embed_questions(client: AsyncOpenAI) -> List[List[float]]:
+    response = await client.embeddings.create(
+        model="text-embedding-3-small",
+        input=[question for question, _ in QUESTIONS]
+    )
+    return [item.embedding for item in response.data]
+
+
+async def evaluate(backend: RetrievalBackend, embeddings: List[List[float]], k: int, hybrid: bool):
+    """Returns (recall@k, per-query latencies in ms)."""
+    match_filter = {'source': 'pydantic_ai_docs'}
+    hits = 0
+    latencies = []
+    for (question, expected), embedding in zip(QUESTIONS, embeddings):
+        start = time.perf_counter()
+        if hybrid:
+            matches = await backend.hybrid_match(question, embedding, match_count=k, filter=match_filter)
+        else:
+            matches = await backend.match(embedding, match_count=k, filter=match_filter)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(expected in doc['url'] for doc in matches)
+    return hits / len(QUESTIONS), latencies
+
+
+def report(name: str, recall: float, latencies: List[float], k: int):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    print(f"{name}: recall@{k} {recall:.0%}, latency p50 {statistics.median(latencies):.1f}ms, p95 {p95:.1f}ms")
+
+
+async def main(args):
+    if args.backend == "local":
+        backend = LocalVectorIndex(args.path)
+    else:
+        backend = SupabaseBackend(Repository.from_env())
+
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    try:
+        embeddings = await embed_questions(client)
+    finally:
+        await client.close()
+
+    if args.backend == "local":
+        # Build the BM25 index outside the timed runs
+        await backend.hybrid_match(QUESTIONS[0][0], embeddings[0], 1, {})
+
+    print(f"{len(QUESTIONS)} questions against the {args.backend} backend")
+    for name, hybrid in (("Vector", False), ("Hybrid", True)):
+        recall, latencies = await evaluate(backend, embeddings, args.k, hybrid)
+        report(name, recall, latencies, args.k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["local", "supabase"], default="local")
+    parser.add_argument("--path", default=os.getenv("LOCAL_INDEX_PATH", "local_index/site_pages"))
+    parser.add_argument("-k", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,84 @@
+"""
+Run a burst of chat and embedding requests against the local fake OpenAI server
+with a requests-per-minute limit and randomly injected 429s, once with the plain
+AsyncOpenAI client and once through RateLimitedOpenAI, and compare failures,
+429s and throughput.
+
+    python benchmarks/bench_rate_limiter.py --requests 300 --rpm 1200 --error-rate 0.05
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from openai import AsyncOpenAI
+
+from rate_limited_openai import RateLimitedOpenAI
+from fake_openai import FakeOpenAI, start_fake_openai
+
+
+async def burst(client, requests: int, concurrency: int):
+    """Fire `requests` calls with at most `concurrency` in flight. Returns (ok, failed, seconds)."""
+    semaphore = asyncio.Semaphore(concurrency)
+    ok = failed = 0
+
+    async def one(i: int):
+        nonlocal ok, failed
+        async with semaphore:
+            try:
+                if i % 2:
+                    await client.embeddings.create(model="text-embedding-3-small", input=[f"chunk {i}"])
+                else:
+                    await client.chat.completions.create(
+                        model="gpt-4o-mini",
+                        messages=[{"role": "user", "content": f"Summarize chunk {i}"}],
+                    )
+                ok += 1
+            except Exception:
+                failed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    return ok, failed, time.perf_counter() - start
+
+
+async def main(args):
+    fake = FakeOpenAI(latency=args.latency, rpm=args.rpm, error_rate=args.error_rate)
+    runner = await start_fake_openai(fake, port=args.port)
+    base_url = f"http://127.0.0.1:{args.port}/v1"
+
+    try:
+        # The plain client retries twice on its own, as in the original crawler
+        plain = AsyncOpenAI(api_key="fake", base_url=base_url)
+        ok, failed, seconds = await burst(plain, args.requests, args.concurrency)
+        print(f"Plain client:   {ok} ok, {failed} failed, {fake.counters['rate_limited']} 429s "
+              f"in {seconds:.1f}s ({ok / seconds:.1f} req/s)")
+        await plain.close()
+
+        # Start the second run against a fresh rate limit window
+        fake.counters["rate_limited"] = 0
+        fake.reset_rate_limit()
+        limited = RateLimitedOpenAI(AsyncOpenAI(api_key="fake", base_url=base_url))
+        ok, failed, seconds = await burst(limited, args.requests, args.concurrency)
+        print(f"Rate limited:   {ok} ok, {failed} failed, {fake.counters['rate_limited']} 429s "
+              f"in {seconds:.1f}s ({ok / seconds:.1f} req/s)")
+        print(limited.report())
+        await limited.client.close()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--rpm", type=int, default=1200)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
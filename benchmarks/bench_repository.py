@@ -0,0 +1,166 @@
+"""
+Compare the synchronous supabase client called from async code (how the agent
+tools used to query) with the async, pooled Repository, with many concurrent
+callers each running retrieval-style queries: total time, per-query p50/p99
+and how long the event loop was stalled.
+
+    python benchmarks/bench_repository.py --callers 50 --queries 5
+    python benchmarks/bench_repository.py --supabase --callers 50 --queries 5
+
+By default both run against a local fake PostgREST that answers the
+match_site_pages RPC and page chunk queries after `--latency` seconds, standing in
+for the database round trip. With --supabase they query SUPABASE_URL instead
+(read only).
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import threading
+import argparse
+from typing import List
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import numpy as np
+from aiohttp import web
+from dotenv import load_dotenv
+from supabase import AsyncClient, create_client
+
+from repository import Repository
+
+# Any JWT-shaped string passes the client's key check
+FAKE_KEY = "fake.fake.fake"
+
+
+def fake_postgrest(latency: float) -> web.Application:
+    rows = [
+        {"id": i, "url": f"https://ai.pydantic.dev/page-{i}/", "chunk_number": 0, "title": f"Chunk {i}",
+         "summary": "Synthetic chunk.", "content": "Agents call tools. " * 200, "metadata": {}, "similarity": 0.5}
+        for i in range(5)
+    ]
+
+    async def rpc(request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(latency)
+        return web.Response(text=json.dumps(rows), content_type="application/json")
+
+    async def table(request: web.Request) -> web.Response:
+        await asyncio.sleep(latency)
+        # No stored conversations; every other table reads as the chunk rows
+        data = [] if request.match_info["table"] == "messages" else rows
+        return web.Response(text=json.dumps(data), content_type="application/json")
+
+    async def insert(request: web.Request) -> web.Response:
+        await request.read()
+        await asyncio.sleep(latency)
+        return web.Response(status=201, text="[]", content_type="application/json")
+
+    app = web.Application()
+    app.router.add_post("/rest/v1/rpc/{function}", rpc)
+    app.router.add_get("/rest/v1/{table}", table)
+    app.router.add_post("/rest/v1/{table}", insert)
+    return app
+
+
+def query_params():
+    return {
+        'query_embedding': np.random.default_rng().normal(size=1536).round(5).tolist(),
+        'match_count': 5,
+        'filter': {'source': 'pydantic_ai_docs'}
+    }
+
+
+async def watch_loop(stop: asyncio.Event, stalls: List[float], interval: float = 0.01):
+    """Record how late each tick of the event loop runs, i.e. how long it was blocked."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(max(0.0, time.perf_counter() - start - interval))
+
+
+async def run(name: str, query, callers: int, queries: int):
+    """`query(i)` is awaited `queries` times by each of `callers` concurrent callers."""
+    latencies: List[float] = []
+    stalls: List[float] = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(watch_loop(stop, stalls))
+
+    async def caller(c: int):
+        for q in range(queries):
+            start = time.perf_counter()
+            await query(c * queries + q)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[caller(c) for c in range(callers)])
+    seconds = time.perf_counter() - start
+    stop.set()
+    await watcher
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name}: {len(latencies)} queries in {seconds:.2f}s ({len(latencies) / seconds:.0f}/s), "
+          f"p50 {p50:.0f} ms, p99 {p99:.0f} ms, longest event loop stall {max(stalls, default=0) * 1000:.0f} ms")
+
+
+def serve_in_thread(app: web.Application, port: int):
+    """Run the fake on its own event loop, so the blocking client can't stall it."""
+    started = threading.Event()
+
+    async def serve():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", port).start()
+        started.set()
+        await asyncio.Event().wait()
+
+    threading.Thread(target=asyncio.run, args=(serve(),), daemon=True).start()
+    started.wait()
+
+
+async def main(args):
+    if args.supabase:
+        load_dotenv()
+        url, key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY")
+    else:
+        serve_in_thread(fake_postgrest(args.latency), args.port)
+        url, key = f"http://127.0.0.1:{args.port}", FAKE_KEY
+
+    sync_client = create_client(url, key)
+    repository = Repository(AsyncClient(url, key), max_concurrency=args.max_concurrency)
+
+    async def sync_query(i: int):
+        # What the tools did: a blocking call straight from a coroutine
+        if i % 2:
+            sync_client.rpc('match_site_pages', query_params()).execute()
+        else:
+            sync_client.from_('site_pages').select('title, summary, content, chunk_number') \
+                .eq('url', f"https://ai.pydantic.dev/page-{random.randrange(5)}/").order('chunk_number').execute()
+
+    async def async_query(i: int):
+        if i % 2:
+            await repository.rpc('match_site_pages', query_params())
+        else:
+            await repository.page_chunks(f"https://ai.pydantic.dev/page-{random.randrange(5)}/")
+
+    try:
+        print(f"{args.callers} concurrent callers, {args.queries} queries each")
+        await run("Sync client ", sync_query, args.callers, args.queries)
+        await run("Repository  ", async_query, args.callers, args.queries)
+    finally:
+        await repository.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02, help="Fake PostgREST response time in seconds")
+    parser.add_argument("--supabase", action="store_true", help="Query SUPABASE_URL instead of the fake")
+    parser.add_argument("--port", type=int, default=8766)
+    asyncio.run(main(parser.parse_args()))
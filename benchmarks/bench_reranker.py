@@ -0,0 +1,74 @@
+"""
+Measure two-stage retrieval on the fixed question set of bench_hybrid_retrieval:
+cross-encoder rerank latency on CPU, and the tokens the retrieval tool returns as
+the plain top 5 chunks and as reranked candidates assembled into a token budget,
+along with how often the answering page makes it into the returned context.
+
+    pip install onnxruntime
+    python benchmarks/bench_reranker.py --candidates 30 --budget 3000
+
+Searches the local index exported with `python retrieval_backends.py` and needs
+OPENAI_API_KEY to embed the questions.
+"""
+import os
+import sys
+import asyncio
+import argparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from openai import AsyncOpenAI
+
+from bench_hybrid_retrieval import QUESTIONS, embed_questions
+from context_assembler import ContextAssembler, format_hit
+from markdown_chunker import count_tokens
+from reranker import CrossEncoderReranker
+from retrieval_backends import LocalVectorIndex
+
+MATCH_FILTER = {'source': 'pydantic_ai_docs'}
+
+
+async def main(args):
+    index = LocalVectorIndex(args.path)
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    try:
+        embeddings = await embed_questions(client)
+    finally:
+        await client.close()
+
+    reranker = CrossEncoderReranker(batch_size=args.batch_size, threads=args.threads)
+    # Load the model outside the timed queries
+    reranker.score("warm up", ["warm up"])
+
+    assembler = ContextAssembler(max_tokens=args.budget)
+    baseline_hits = reranked_hits = baseline_tokens = 0
+    for (question, expected), embedding in zip(QUESTIONS, embeddings):
+        candidates = await index.hybrid_match(question, embedding, args.candidates, MATCH_FILTER)
+        top = candidates[:5]
+        baseline_hits += any(expected in doc['url'] for doc in top)
+        # What the tool returned before: the top 5 chunks in full
+        baseline_tokens += count_tokens("\n\n---\n\n".join(format_hit(doc) for doc in top))
+
+        ranked = await reranker.rerank(question, candidates)
+        context = assembler.documentation(ranked)
+        reranked_hits += any(expected in doc['url'] and f"Source: {doc['url']}\n" in context for doc in ranked)
+
+    print(f"{len(QUESTIONS)} questions, {args.candidates} candidates, {args.budget} token budget")
+    print(f"Top 5 chunks:        answer page returned for {baseline_hits}/{len(QUESTIONS)} questions, "
+          f"{baseline_tokens / len(QUESTIONS):.0f} tokens per answer")
+    print(f"Reranked + assembled: answer page returned for {reranked_hits}/{len(QUESTIONS)} questions, "
+          f"{assembler.stats.tokens_out / len(QUESTIONS):.0f} tokens per answer")
+    print(reranker.report())
+    print(assembler.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default=os.getenv("LOCAL_INDEX_PATH", "local_index/site_pages"))
+    parser.add_argument("--candidates", type=int, default=30)
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads (0: all cores)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,193 @@
+"""
+Load test the studio endpoint: many concurrent sessions, each sending a few
+queries, against the blocking /api/pydantic-ai-expert route and the SSE
+/api/pydantic-ai-expert/stream route. Reports p50/p99 request latency and,
+for the stream, time to the first answer token.
+
+    python benchmarks/bench_studio_endpoint.py --sessions 50 --turns 3
+
+Everything is local: the app runs under uvicorn in this process, the LLM is a
+pydantic_ai FunctionModel that calls retrieve_relevant_documentation once and
+then answers (streaming it word by word), embeddings come from the fake OpenAI
+server and the database is the fake PostgREST from bench_repository.py, each on
+its own thread. They still share the process (and the GIL) with the app, so
+the latencies include some of their CPU time.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+from typing import List
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(parent_dir, "studio-integration-version"))
+
+import httpx
+import numpy as np
+import uvicorn
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart, ToolCallPart, ToolReturnPart, UserPromptPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from bench_repository import FAKE_KEY, fake_postgrest, serve_in_thread
+from fake_openai import FakeOpenAI
+
+TOKEN = "bench-token"
+ANSWER = (
+    "Register a tool with the @agent.tool decorator. The function takes a RunContext as its "
+    "first argument and the model calls it with arguments validated against its signature."
+)
+
+
+def fake_llm(latency: float, token_interval: float) -> FunctionModel:
+    """First turn calls retrieve_relevant_documentation with the user's query, the second answers."""
+
+    def user_query(messages: List[ModelMessage]) -> str:
+        return next(
+            part.content for message in reversed(messages) for part in message.parts
+            if isinstance(part, UserPromptPart)
+        )
+
+    def has_tool_result(messages: List[ModelMessage]) -> bool:
+        return any(isinstance(part, ToolReturnPart) for part in messages[-1].parts)
+
+    async def answer(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(latency)
+        if not has_tool_result(messages):
+            return ModelResponse(parts=[ToolCallPart.from_raw_args(
+                'retrieve_relevant_documentation', {'user_query': user_query(messages)}
+            )])
+        return ModelResponse(parts=[TextPart(content=ANSWER)])
+
+    async def stream_answer(messages: List[ModelMessage], info: AgentInfo):
+        await asyncio.sleep(latency)
+        if not has_tool_result(messages):
+            yield {0: DeltaToolCall(
+                name='retrieve_relevant_documentation',
+                json_args=json.dumps({'user_query': user_query(messages)})
+            )}
+            return
+        for word in ANSWER.split(" "):
+            yield word + " "
+            await asyncio.sleep(token_interval)
+
+    return FunctionModel(answer, stream_function=stream_answer)
+
+
+async def ask(client: httpx.AsyncClient, session_id: str, query: str, stream: bool):
+    """Returns (success, seconds to the first answer token or None, total seconds)."""
+    body = {"query": query, "user_id": "bench", "request_id": str(uuid.uuid4()), "session_id": session_id}
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post("/api/pydantic-ai-expert", json=body)
+        return response.json()["success"], None, time.perf_counter() - start
+
+    first_token = None
+    success = False
+    async with client.stream("POST", "/api/pydantic-ai-expert/stream", json=body) as response:
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                if event == "delta" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif event == "done":
+                    success = json.loads(line[len("data: "):])["success"]
+    return success, first_token, time.perf_counter() - start
+
+
+async def run(client: httpx.AsyncClient, name: str, sessions: int, turns: int, stream: bool):
+    totals: List[float] = []
+    first_tokens: List[float] = []
+    failures = 0
+
+    async def session(s: int):
+        nonlocal failures
+        session_id = str(uuid.uuid4())
+        for turn in range(turns):
+            # Distinct queries so the agent's query cache doesn't answer them
+            success, first_token, total = await ask(
+                client, session_id, f"Session {s}, question {turn}: how do I register a tool?", stream
+            )
+            failures += not success
+            totals.append(total * 1000)
+            if first_token is not None:
+                first_tokens.append(first_token * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[session(s) for s in range(sessions)])
+    seconds = time.perf_counter() - start
+
+    p50, p99 = np.percentile(totals, [50, 99])
+    line = (f"{name}: {len(totals)} requests in {seconds:.2f}s ({len(totals) / seconds:.1f}/s), "
+            f"latency p50 {p50:.0f} ms, p99 {p99:.0f} ms")
+    if first_tokens:
+        p50, p99 = np.percentile(first_tokens, [50, 99])
+        line += f", first token p50 {p50:.0f} ms, p99 {p99:.0f} ms"
+    print(line + f", {failures} failed")
+
+
+async def main(args):
+    # The fakes get their own event loops so only the app runs on this one
+    serve_in_thread(fake_postgrest(args.db_latency), args.db_port)
+    serve_in_thread(FakeOpenAI(latency=args.embedding_latency).app(), args.openai_port)
+
+    outbox_dir = tempfile.TemporaryDirectory()
+    os.environ.update({
+        "SUPABASE_URL": f"http://127.0.0.1:{args.db_port}",
+        "SUPABASE_SERVICE_KEY": FAKE_KEY,
+        "OPENAI_API_KEY": "fake",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.openai_port}/v1",
+        "API_BEARER_TOKEN": TOKEN,
+        "MESSAGE_OUTBOX_PATH": os.path.join(outbox_dir.name, "outbox.sqlite3"),
+        # Keep the agent's spans off the console
+        "LOGFIRE_CONSOLE": "false",
+    })
+    # Imported once the environment points at the fakes
+    from pydantic_ai_expert import pydantic_ai_expert
+    from pydantic_ai_expert_endpoint import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    client = httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{args.port}",
+        headers={"Authorization": f"Bearer {TOKEN}"},
+        timeout=120,
+        limits=httpx.Limits(max_connections=args.sessions)
+    )
+    try:
+        with pydantic_ai_expert.override(model=fake_llm(args.llm_latency, args.token_interval)):
+            # Warm up the tokenizer, the connection pools and the page index
+            await ask(client, "warmup", "warm up", stream=False)
+
+            print(f"{args.sessions} concurrent sessions, {args.turns} queries each, "
+                  f"LLM {args.llm_latency * 1000:.0f} ms per call + {args.token_interval * 1000:.0f} ms per streamed word")
+            await run(client, "Blocking", args.sessions, args.turns, stream=False)
+            await run(client, "SSE     ", args.sessions, args.turns, stream=True)
+    finally:
+        await client.aclose()
+        server.should_exit = True
+        await server_task
+        outbox_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake LLM seconds per model call")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Fake LLM seconds between streamed words")
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.02, help="Fake PostgREST response time in seconds")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--openai-port", type=int, default=8765)
+    parser.add_argument("--db-port", type=int, default=8766)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,106 @@
+"""
+Compare per-chunk title/summary requests with SummaryBatcher's multi-chunk
+requests against the local fake OpenAI server: request count, prompt size and
+wall time for the same set of pages.
+
+    python benchmarks/bench_summary_batcher.py --pages 100 --chunks-per-page 8 --bad-batch-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from typing import Dict
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+from openai import AsyncOpenAI
+
+from summary_batcher import SummaryBatcher, chunk_excerpt
+from fake_openai import FakeOpenAI, start_fake_openai
+
+SYSTEM_PROMPT = """You are an AI that extracts titles and summaries from documentation chunks.
+    Return a JSON object with 'title' and 'summary' keys.
+    For the title: If this seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
+    For the summary: Create a concise summary of the main points in this chunk.
+    Keep both title and summary concise but informative."""
+
+
+def fake_pages(pages: int, chunks_per_page: int):
+    return {
+        f"https://ai.pydantic.dev/page-{p}/": [
+            f"## Section {c}\n\n" + "Agents call tools and validate results with Pydantic models. " * 30
+            for c in range(chunks_per_page)
+        ]
+        for p in range(pages)
+    }
+
+
+def per_chunk(client: AsyncOpenAI):
+    """get_title_and_summary's request, without the cache."""
+    async def summarize(chunk: str, url: str) -> Dict[str, str]:
+        response = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk_excerpt(chunk)}..."}
+            ],
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+    return summarize
+
+
+async def run(pages, summarize, concurrency: int) -> float:
+    """Summarize every chunk, a page's chunks concurrently as the pipeline does."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def page(url, chunks):
+        async with semaphore:
+            results = await asyncio.gather(*[summarize(chunk, url) for chunk in chunks])
+            assert all(result["title"] for result in results)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[page(url, chunks) for url, chunks in pages.items()])
+    return time.perf_counter() - start
+
+
+def report(name: str, fake: FakeOpenAI, seconds: float):
+    tokens = fake.counters["chat_prompt_chars"] // 4
+    print(f"{name}: {fake.counters['chat']} requests, ~{tokens} prompt tokens, {seconds:.2f}s")
+    fake.counters["chat"] = fake.counters["chat_prompt_chars"] = 0
+
+
+async def main(args):
+    fake = FakeOpenAI(latency=args.latency, bad_batch_rate=args.bad_batch_rate)
+    runner = await start_fake_openai(fake, port=args.port)
+    client = AsyncOpenAI(api_key="fake", base_url=f"http://127.0.0.1:{args.port}/v1")
+    pages = fake_pages(args.pages, args.chunks_per_page)
+
+    try:
+        single = await run(pages, per_chunk(client), args.concurrency)
+        report("Per-chunk", fake, single)
+
+        batcher = SummaryBatcher(client, fallback=per_chunk(client), max_chunks=args.max_chunks)
+        batched = await run(pages, lambda chunk, url: batcher.summarize(url, chunk), args.concurrency)
+        await batcher.close()
+        report("Batched  ", fake, batched)
+        print(batcher.report())
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--chunks-per-page", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--max-chunks", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--bad-batch-rate", type=float, default=0.05)
+    parser.add_argument("--port", type=int, default=8765)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Compare the precompiled URLClassifier with the original list-scanning
+is_content_url on a synthetic URL set, and check both make identical decisions.
+
+    python benchmarks/bench_url_classifier.py --urls 1000000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from collections import Counter
+from urllib.parse import urlparse
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import site_map_extractor as sme
+
+
+def original_is_content_url(url):
+    """The filter as it was before URLClassifier: lists rebuilt and scanned on every call."""
+    content_indicators = list(sme.content_indicators)
+    exclude_paths = list(sme.exclude_paths)
+    exclude_extensions = list(sme.exclude_extensions)
+    exclude_params = list(sme.exclude_params)
+
+    url_lower = url.lower()
+    parsed_url = urlparse(url)
+    path = parsed_url.path.lower()
+
+    if any(url_lower.endswith(ext) for ext in exclude_extensions):
+        return False
+    if any(param in url_lower for param in exclude_params):
+        return False
+    if any(path in url_lower for path in exclude_paths):
+        return False
+    if path.strip('/').isdigit():
+        return False
+    if len(path.split('/')) > 4:
+        return False
+    has_content_indicator = any(indicator in url_lower for indicator in content_indicators)
+
+    if not has_content_indicator:
+        path_segments = [s for s in path.split('/') if s]
+        return len(path_segments) <= 2
+
+    return True
+
+
+def synthetic_urls(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    words = ["docs", "agents", "tools", "models", "api", "guide", "intro", "install", "2024", "12",
+             "results", "testing", "graph", "Blog", "news", "streaming", "dependencies", "retries"]
+    segments = [p.strip('/') for p in sme.content_indicators + sme.exclude_paths] + words * 6
+    extensions = sme.exclude_extensions + [""] * 200 + [".html"] * 20
+    params = sme.exclude_params + ["q=", "lang_x=", "navid="] + [""] * 150
+    hosts = ["https://ai.pydantic.dev", "https://www.example.edu", "http://media.example.com"]
+
+    urls = []
+    for _ in range(count):
+        depth = rng.choice([0, 1, 1, 2, 2, 3, 4])
+        path = "/".join(rng.choice(segments) for _ in range(depth))
+        url = f"{rng.choice(hosts)}/{path}"
+        if rng.random() < 0.5:
+            url += "/"
+        url += rng.choice(extensions)
+        param = rng.choice(params)
+        if param:
+            url += f"?{param}{rng.randint(0, 99)}"
+        urls.append(url)
+    return urls
+
+
+def main(args):
+    urls = synthetic_urls(args.urls)
+    classifier = sme.URLClassifier()
+
+    start = time.perf_counter()
+    expected = [original_is_content_url(url) for url in urls]
+    original_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = classifier.classify(urls)
+    compiled_seconds = time.perf_counter() - start
+
+    mismatches = [url for url, keep, (got, _) in zip(urls, expected, results) if keep != got]
+    print(f"Original is_content_url: {original_seconds:.2f}s ({len(urls) / original_seconds:,.0f} URLs/s)")
+    print(f"URLClassifier.classify:  {compiled_seconds:.2f}s ({len(urls) / compiled_seconds:,.0f} URLs/s)")
+    print(f"Speedup: {original_seconds / compiled_seconds:.1f}x")
+    print(f"Decisions: {Counter(reason for _, reason in results).most_common()}")
+    print(f"Mismatches: {len(mismatches)}")
+    for url in mismatches[:10]:
+        print(f"  {url}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    main(parser.parse_args())
@@ -0,0 +1,119 @@
+"""
+Measure the site_pages ANN index against exact search: p50/p99 latency of the
+match_site_pages RPC and recall@k at several ef_search (HNSW) or probes (IVFFlat)
+settings.
+
+    python benchmarks/bench_vector_index.py --queries 200 -k 5 --ef-search 10 20 40 80 160
+    python benchmarks/bench_vector_index.py --build ivfflat --probes 1 5 10 20
+
+Exact neighbours come from a brute-force search over all embeddings, exported with
+export_local_index. Queries are stored chunk embeddings with a little noise added,
+so no OpenAI calls are needed.
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+import argparse
+from typing import List, Optional
+
+# Append parent directory to system path
+parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(parent_dir)
+
+import numpy as np
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from repository import Repository
+from retrieval_backends import LocalVectorIndex, export_local_index
+from vector_index import build_vector_index
+
+load_dotenv()
+
+MATCH_FILTER = {'source': 'pydantic_ai_docs'}
+
+
+def make_queries(index: LocalVectorIndex, count: int, noise: float, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(index.rows), size=min(count, len(index.rows)), replace=False)
+    queries = index.embeddings[picks] + rng.normal(scale=noise, size=(len(picks), index.embeddings.shape[1]))
+    return (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+
+
+def run(
+    supabase: Client,
+    queries: np.ndarray,
+    exact: List[set],
+    k: int,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+):
+    """Returns (recall@k, latencies in ms) of the RPC with the given search breadth."""
+    latencies = []
+    found = 0
+    for query, expected in zip(queries, exact):
+        params = {'query_embedding': query.tolist(), 'match_count': k, 'filter': MATCH_FILTER}
+        if ef_search:
+            params['ef_search'] = ef_search
+        if probes:
+            params['probes'] = probes
+        start = time.perf_counter()
+        result = supabase.rpc('match_site_pages', params).execute()
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += len(expected & {row['id'] for row in result.data or []})
+    return found / sum(len(expected) for expected in exact), latencies
+
+
+async def build_index(method: str) -> str:
+    repository = Repository.from_env()
+    try:
+        return await build_vector_index(repository, method=method)
+    finally:
+        await repository.close()
+
+
+def report(name: str, recall: float, latencies: List[float], k: int):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name}: recall@{k} {recall:.3f}, latency p50 {p50:.1f}ms, p99 {p99:.1f}ms")
+
+
+def main(args):
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    if args.build:
+        print(asyncio.run(build_index(args.build)))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "site_pages")
+        count = export_local_index(supabase, path)
+        index = LocalVectorIndex(path)
+        print(f"{count} chunks, {args.queries} queries")
+
+        queries = make_queries(index, args.queries, args.noise)
+        start = time.perf_counter()
+        exact = [
+            {row['id'] for row in index.search(query.tolist(), args.k, MATCH_FILTER)}
+            for query in queries
+        ]
+        print(f"Exact (in process): {(time.perf_counter() - start) * 1000 / len(queries):.1f}ms per query")
+
+        # Warm up the connection and the index pages
+        run(supabase, queries[:5], exact[:5], args.k)
+
+        report("Default settings", *run(supabase, queries, exact, args.k), args.k)
+        for ef_search in args.ef_search or []:
+            report(f"ef_search={ef_search}", *run(supabase, queries, exact, args.k, ef_search=ef_search), args.k)
+        for probes in args.probes or []:
+            report(f"probes={probes}", *run(supabase, queries, exact, args.k, probes=probes), args.k)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--noise", type=float, default=0.02, help="Gaussian noise added to each query embedding")
+    parser.add_argument("--ef-search", type=int, nargs="*", help="HNSW ef_search values to try")
+    parser.add_argument("--probes", type=int, nargs="*", help="IVFFlat probes values to try")
+    parser.add_argument("--build", choices=["hnsw", "ivfflat"], help="Rebuild the index with this method first")
+    main(parser.parse_args())
@@ -0,0 +1,170 @@
+"""
+Minimal local stand-in for the OpenAI API, used by the benchmarks.
+
+Serves `/v1/embeddings` and `/v1/chat/completions` with deterministic fake
+responses and a configurable per-request latency, and counts every request so
+benchmarks can report how many API calls a run would have cost.
+
+To exercise rate limiting it can enforce a requests-per-minute limit and inject
+random 429s (`error_rate`). Like the real API, the limit is a bucket that refills
+continuously, every response carries `x-ratelimit-*` headers and every 429 a
+`retry-after-ms`.
+
+Chat requests whose prompt holds several `<chunk index="N">` blocks (batched
+summaries) get a `{"chunks": [...]}` array back; `bad_batch_rate` makes a
+fraction of those answers drop a chunk, to exercise the per-chunk fallback.
+
+Run standalone with:
+    python benchmarks/fake_openai.py --port 8765 --latency 0.2 --rpm 600 --error-rate 0.05
+then point the scripts at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+"""
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Dict, Optional
+
+from aiohttp import web
+
+EMBEDDING_DIMENSIONS = 1536
+CHUNK_TAG_RE = re.compile(r'<chunk index="(\d+)">')
+
+
+def fake_embedding(text: str, dimensions: int = EMBEDDING_DIMENSIONS):
+    """Deterministic unit-ish vector derived from the text hash."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [((digest[i % len(digest)] / 255.0) - 0.5) for i in range(dimensions)]
+
+
+class FakeOpenAI:
+    def __init__(
+        self,
+        latency: float = 0.05,
+        rpm: Optional[int] = None,
+        error_rate: float = 0.0,
+        bad_batch_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.rpm = rpm
+        self.error_rate = error_rate
+        self.bad_batch_rate = bad_batch_rate
+        self.counters: Dict[str, int] = {
+            "embeddings": 0, "embedding_inputs": 0, "chat": 0, "chat_prompt_chars": 0, "rate_limited": 0,
+        }
+        self.reset_rate_limit()
+
+    def reset_rate_limit(self):
+        """Refill the request budget, e.g. between benchmark runs."""
+        self._budget = float(self.rpm or 0)
+        self._budget_updated = time.monotonic()
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        if not self.rpm:
+            return {}
+        reset = (self.rpm - self._budget) * 60 / self.rpm
+        return {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(int(self._budget)),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+
+    def _check_rate_limit(self) -> Optional[web.Response]:
+        """A 429 response if this request is over the limit or picked for an injected error."""
+        if self.rpm:
+            now = time.monotonic()
+            self._budget = min(self.rpm, self._budget + (now - self._budget_updated) * self.rpm / 60)
+            self._budget_updated = now
+        over_limit = self.rpm and self._budget < 1
+        if over_limit or random.random() < self.error_rate:
+            self.counters["rate_limited"] += 1
+            wait = (1 - self._budget) * 60 / self.rpm if over_limit else 0.05
+            return web.json_response(
+                {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                status=429,
+                headers={**self._rate_limit_headers(), "retry-after-ms": str(int(wait * 1000))},
+            )
+        if self.rpm:
+            self._budget -= 1
+        return None
+
+    async def embeddings(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        rejected = self._check_rate_limit()
+        if rejected is not None:
+            return rejected
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        self.counters["embeddings"] += 1
+        self.counters["embedding_inputs"] += len(inputs)
+        await asyncio.sleep(self.latency)
+        return web.json_response({
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(text)}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }, headers=self._rate_limit_headers())
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        rejected = self._check_rate_limit()
+        if rejected is not None:
+            return rejected
+        self.counters["chat"] += 1
+        prompt = "\n".join(str(message.get("content") or "") for message in body.get("messages", []))
+        self.counters["chat_prompt_chars"] += len(prompt)
+        await asyncio.sleep(self.latency)
+        indexes = [int(index) for index in CHUNK_TAG_RE.findall(prompt)]
+        if indexes:
+            if random.random() < self.bad_batch_rate:
+                indexes = indexes[:-1]
+            content = json.dumps({"chunks": [
+                {"index": i, "title": f"Fake title {i}", "summary": f"Fake summary {i}"} for i in indexes
+            ]})
+        else:
+            content = json.dumps({"title": "Fake title", "summary": "Fake summary"})
+        return web.json_response({
+            "id": f"chatcmpl-{self.counters['chat']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }, headers=self._rate_limit_headers())
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/v1/embeddings", self.embeddings)
+        app.router.add_post("/v1/chat/completions", self.chat_completions)
+        return app
+
+
+async def start_fake_openai(fake: FakeOpenAI, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+    """Start the fake server in the current event loop; call `runner.cleanup()` to stop it."""
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rpm", type=int, default=None, help="Requests per minute before answering 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with a 429")
+    parser.add_argument("--bad-batch-rate", type=float, default=0.0, help="Fraction of batched answers missing a chunk")
+    args = parser.parse_args()
+    fake = FakeOpenAI(args.latency, args.rpm, args.error_rate, args.bad_batch_rate)
+    web.run_app(fake.app(), host=args.host, port=args.port)
@@ -0,0 +1,146 @@
+import os
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# (url, chunk_number) of a stored chunk
+ChunkKey = Tuple[str, int]
+
+
+@dataclass
+class Duplicate:
+    """The canonical chunk a duplicate matched, and whether its normalized text is identical."""
+    canonical: ChunkKey
+    exact: bool
+
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a chunk, so reflowed copies hash the same."""
+    return " ".join(text.lower().split())
+
+
+def exact_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, for estimating Jaccard similarity."""
+
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # Random affine hash functions, computed modulo 2**64 by uint64 overflow
+        self.a = rng.integers(1, 2 ** 63, num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2 ** 63, num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> set:
+        words = normalize_text(text).split()
+        size = self.shingle_size
+        return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self.shingles(text)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        with np.errstate(over="ignore"):
+            return (hashes[:, None] * self.a + self.b).min(axis=0)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+
+@dataclass
+class DedupeStats:
+    chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    bytes_saved: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def duplicates(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    def report(self) -> str:
+        share = self.duplicates / self.chunks if self.chunks else 0.0
+        return (
+            f"Deduplicated {self.duplicates} of {self.chunks} chunks ({share:.1%}): "
+            f"{self.exact_duplicates} exact, {self.near_duplicates} near duplicates. "
+            f"Saved {self.bytes_saved / 1024:.0f} KB / {self.tokens_saved} tokens of summarization, "
+            f"{self.duplicates} summary calls and {self.exact_duplicates} embedding inputs"
+        )
+
+
+class ChunkDeduper:
+    """
+    Find chunks that repeat across the pages of a crawl.
+
+    Exact duplicates are found by hashing the normalized text. Near duplicates
+    (the same nav block or snippet with a different active link, say) are found
+    with MinHash signatures bucketed by LSH bands and confirmed when the estimated
+    Jaccard similarity of their word shingles reaches `threshold`. The first chunk
+    seen with some content is its canonical copy; `check` returns a Duplicate
+    naming the canonical chunk for later copies, so they can reuse its enrichment.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        num_perm: int = 128,
+        bands: int = 16,
+    ):
+        self.threshold = threshold or float(os.getenv("CHUNK_DEDUPE_THRESHOLD", "0.9"))
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.stats = DedupeStats()
+        self._exact: Dict[str, ChunkKey] = {}
+        self._signatures: Dict[ChunkKey, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[ChunkKey]] = {}
+
+    def _band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        rows = self.rows_per_band
+        return [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+
+    def check(self, key: ChunkKey, text: str, tokens: int = 0) -> Optional[Duplicate]:
+        """Register a chunk. Returns its canonical chunk if it's a duplicate, else None."""
+        self.stats.chunks += 1
+        digest = exact_hash(text)
+        canonical = self._exact.get(digest)
+        if canonical is not None:
+            self.stats.exact_duplicates += 1
+            self._saved(text, tokens)
+            return Duplicate(canonical, exact=True)
+
+        signature = self.hasher.signature(text)
+        band_keys = self._band_keys(signature)
+        candidates = {candidate for band_key in band_keys for candidate in self._buckets.get(band_key, ())}
+        best, best_similarity = None, 0.0
+        for candidate in candidates:
+            similarity = MinHasher.similarity(signature, self._signatures[candidate])
+            if similarity > best_similarity:
+                best, best_similarity = candidate, similarity
+        if best is not None and best_similarity >= self.threshold:
+            self.stats.near_duplicates += 1
+            self._saved(text, tokens)
+            return Duplicate(best, exact=False)
+
+        self._exact[digest] = key
+        self._signatures[key] = signature
+        for band_key in band_keys:
+            self._buckets.setdefault(band_key, []).append(key)
+        return None
+
+    def _saved(self, text: str, tokens: int):
+        self.stats.bytes_saved += len(text.encode("utf-8"))
+        self.stats.tokens_saved += tokens
+
+    def report(self) -> str:
+        return self.stats.report()
@@ -0,0 +1,95 @@
+import os
+import time
+import random
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from repository import Repository, is_transient_error
+
+
+@dataclass
+class WriterStats:
+    rows: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed_rows: int = 0
+    seconds: float = 0.0
+
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def report(self) -> str:
+        return (
+            f"Upserted {self.rows} rows in {self.batches} batches "
+            f"({self.rows_per_sec():.0f} rows/s), {self.retries} retries, {self.failed_rows} failed rows"
+        )
+
+
+class ChunkWriter:
+    """
+    Buffer processed chunks and write them to `site_pages` as bulk upserts.
+
+    Rows are upserted on the (url, chunk_number) unique key, so re-processing a
+    page overwrites its chunks instead of failing. Writes go through the async
+    repository so they don't block the event loop, and transient failures
+    are retried with exponential backoff. `on_stored`, if set, is called with
+    every batch of rows once it has been written.
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        table: str = "site_pages",
+        batch_size: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        on_stored: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ):
+        self.repository = repository
+        self.table = table
+        self.batch_size = batch_size or int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("UPSERT_MAX_RETRIES", "5"))
+        self.on_stored = on_stored
+        self.stats = WriterStats()
+        self._buffer: List[Dict[str, Any]] = []
+
+    async def add(self, chunk) -> None:
+        """Queue a ProcessedChunk (or row dict), flushing once a full batch has accumulated."""
+        self._buffer.append(chunk if isinstance(chunk, dict) else asdict(chunk))
+        if len(self._buffer) >= self.batch_size:
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Write everything buffered so far."""
+        rows, self._buffer = self._buffer, []
+        for start in range(0, len(rows), self.batch_size):
+            await self._upsert(rows[start:start + self.batch_size])
+
+    async def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        # A single upsert statement can't touch the same key twice, keep the latest row
+        rows = list({(row["url"], row["chunk_number"]): row for row in rows}.values())
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                await self.repository.upsert_chunks(rows, self.table)
+                self.stats.seconds += time.perf_counter() - start
+                self.stats.rows += len(rows)
+                self.stats.batches += 1
+                print(f"Upserted {len(rows)} chunks")
+                if self.on_stored is not None:
+                    self.on_stored(rows)
+                return
+            except Exception as e:
+                self.stats.seconds += time.perf_counter() - start
+                if attempt == self.max_retries or not is_transient_error(e):
+                    print(f"Error upserting {len(rows)} chunks: {e}")
+                    self.stats.failed_rows += len(rows)
+                    return
+                self.stats.retries += 1
+                delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+                print(f"Transient error upserting chunks, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+    def report(self) -> str:
+        return self.stats.report()
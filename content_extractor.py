@@ -0,0 +1,313 @@
+import os
+import re
+import copy
+import json
+import asyncio
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+from crawl4ai import CrawlerRunConfig, CrawlResult
+
+from markdown_chunker import FENCE_RE, HEADING_RE
+
+# Navigation-looking lines: markdown links, "Docs > Guide" style breadcrumbs and footers
+LINK_RE = re.compile(r"\[[^\]]*\]\([^)]*\)")
+BREADCRUMB_RE = re.compile(r"\S\s+(?:>|»|›|/|\|)\s+\S")
+FOOTER_RE = re.compile(r"©|\(c\)|copyright|all rights reserved|powered by|made with", re.IGNORECASE)
+
+# Containers that hold the main content in common site generators, most specific first
+# (MkDocs Material, Docusaurus, Sphinx/Read the Docs, GitHub-style, then generic landmarks)
+CONTENT_SELECTORS = [
+    "article.md-content__inner",
+    ".md-content",
+    ".theme-doc-markdown",
+    ".rst-content [role=main]",
+    ".rst-content",
+    ".markdown-body",
+    "div.document",
+    "article",
+    "main",
+    "[role=main]",
+    "#content",
+    ".content",
+]
+
+
+def content_lines(markdown: str, page_url: str = ""):
+    """
+    Yield (index, key) for every line that may be template boilerplate.
+
+    Code blocks, headings and blank or trivially short lines are never boilerplate.
+    The page's own URL is removed from the key, since crawl4ai prefixes relative nav
+    links with it.
+    """
+    fence = None
+    for i, line in enumerate(markdown.split("\n")):
+        stripped = line.strip()
+        if fence is not None:
+            if stripped.startswith(fence) and stripped == fence[0] * len(stripped):
+                fence = None
+            continue
+        fence_match = FENCE_RE.match(line)
+        if fence_match:
+            fence = fence_match.group(1)
+            continue
+        if len(stripped) < 3 or HEADING_RE.match(line):
+            continue
+        yield i, stripped.replace(page_url, "") if page_url else stripped
+
+
+def looks_like_navigation(line: str) -> bool:
+    """Links, breadcrumbs and footers, as opposed to repeated prose like "Example:"."""
+    return bool(LINK_RE.search(line) or BREADCRUMB_RE.search(line) or FOOTER_RE.search(line))
+
+
+@dataclass
+class SiteTemplate:
+    pages: int = 0
+    line_counts: Counter = field(default_factory=Counter)
+    boilerplate: Optional[Set[str]] = None  # Learned once `pages` reaches the sample size
+    selector_hits: Counter = field(default_factory=Counter)
+    selector: Optional[str] = None
+
+
+@dataclass
+class ExtractionStats:
+    sampled: int = 0
+    pages: int = 0
+    pages_stripped: int = 0
+    pages_with_selector: int = 0
+    chars_in: int = 0
+    chars_out: int = 0
+    # Page text (from the HTML) of pages crawled with a selector, and what it kept
+    selector_chars_in: int = 0
+    selector_chars_out: int = 0
+
+    def report(self) -> str:
+        removed = self.chars_in - self.chars_out
+        share = removed / self.chars_in if self.chars_in else 0.0
+        selector_removed = self.selector_chars_in - self.selector_chars_out
+        selector_share = selector_removed / self.selector_chars_in if self.selector_chars_in else 0.0
+        return (
+            f"Templates learned from {self.sampled} sample pages. "
+            f"Content selector used for {self.pages_with_selector} of {self.pages} pages: "
+            f"removed {selector_removed} of {self.selector_chars_in} characters of page text ({selector_share:.1%}). "
+            f"Boilerplate lines stripped from {self.pages_stripped} pages: "
+            f"removed {removed} of {self.chars_in} markdown characters ({share:.1%})"
+        )
+
+
+class ContentExtractor:
+    """
+    Learn each site's page template from a sample of its pages and strip it from all of them.
+
+    For every host, `sample_pages` pages are used to learn:
+    - boilerplate lines: markdown lines (outside code blocks, never headings)
+      that occur on at least `min_page_fraction` of the sampled pages. On a page
+      they are removed if they look like navigation (links, breadcrumbs,
+      footers) or form a run of at least `min_run` such lines, so repeated
+      section text like "Example:" survives while menus and link farms don't.
+    - a main-content CSS selector: the most specific of CONTENT_SELECTORS that
+      matches exactly one element on every sampled page and holds most of its
+      text. Pages of the host are crawled with it as
+      `CrawlerRunConfig.css_selector`, so the template never reaches markdown.
+
+    Learned templates are kept per host in a local SQLite file
+    (CONTENT_TEMPLATE_PATH), so every run, incremental ones included, strips
+    pages the same way without sampling again. A template older than
+    `max_age_days` is learned again, in case the site changed its layout.
+    """
+
+    def __init__(
+        self,
+        sample_pages: Optional[int] = None,
+        min_page_fraction: Optional[float] = None,
+        min_content_share: float = 0.3,
+        min_run: int = 3,
+        path: Optional[str] = None,
+        max_age_days: Optional[float] = None,
+    ):
+        self.sample_pages = sample_pages or int(os.getenv("BOILERPLATE_SAMPLE_PAGES", "20"))
+        self.min_page_fraction = min_page_fraction or float(os.getenv("BOILERPLATE_MIN_PAGE_FRACTION", "0.6"))
+        self.min_content_share = min_content_share
+        self.min_run = min_run
+        self.max_age_days = max_age_days or float(os.getenv("BOILERPLATE_MAX_AGE_DAYS", "30"))
+        self.stats = ExtractionStats()
+        self._sites: Dict[str, SiteTemplate] = {}
+
+        self.path = path or os.getenv("CONTENT_TEMPLATE_PATH", "content_templates.sqlite3")
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("""
+            create table if not exists templates (
+                host text primary key,
+                boilerplate text not null,
+                selector text,
+                learned_at text not null
+            )
+        """)
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        oldest = (datetime.now(timezone.utc) - timedelta(days=self.max_age_days)).isoformat()
+        rows = self._db.execute(
+            "select host, boilerplate, selector from templates where learned_at >= ?", (oldest,)
+        )
+        for host, boilerplate, selector in rows:
+            self._sites[host] = SiteTemplate(boilerplate=set(json.loads(boilerplate)), selector=selector)
+
+    def _save(self, host: str, site: SiteTemplate):
+        self._db.execute(
+            "insert or replace into templates (host, boilerplate, selector, learned_at) values (?, ?, ?, ?)",
+            (host, json.dumps(sorted(site.boilerplate)), site.selector, datetime.now(timezone.utc).isoformat())
+        )
+        self._db.commit()
+
+    def _site(self, url: str) -> SiteTemplate:
+        return self._sites.setdefault(urlparse(url).netloc, SiteTemplate())
+
+    def crawl_config(self, url: str, base: CrawlerRunConfig) -> CrawlerRunConfig:
+        """`base`, narrowed to the host's main-content selector once one has been detected."""
+        selector = self._site(url).selector
+        if not selector or base.css_selector:
+            return base
+        config = copy.copy(base)
+        config.css_selector = selector
+        return config
+
+    def _matching_selectors(self, html: str) -> List[str]:
+        soup = BeautifulSoup(html, "lxml")
+        body = soup.body or soup
+        total = len(body.get_text(" ", strip=True))
+        matches = []
+        for selector in CONTENT_SELECTORS:
+            elements = body.select(selector)
+            if len(elements) != 1:
+                continue
+            if total and len(elements[0].get_text(" ", strip=True)) / total >= self.min_content_share:
+                matches.append(selector)
+        return matches
+
+    def sample_urls(self, urls: List[str]) -> List[str]:
+        """The first `sample_pages` URLs of every host that has no template yet and enough pages to learn one."""
+        by_host: Dict[str, List[str]] = {}
+        for url in urls:
+            by_host.setdefault(urlparse(url).netloc, []).append(url)
+        return [
+            url
+            for host, host_urls in by_host.items()
+            if len(host_urls) >= self.sample_pages and self._site(host_urls[0]).boilerplate is None
+            for url in host_urls[:self.sample_pages]
+        ]
+
+    async def learn(self, urls: List[str], fetch: Callable[[str], Awaitable[CrawlResult]]):
+        """
+        Fetch sample pages of the hosts in `urls` that have no template and learn theirs.
+
+        Run before crawling, so the template applies to every page, the sampled ones
+        included. A host whose sample pages don't all fetch is sampled again next run.
+        """
+        sample = self.sample_urls(urls)
+        if not sample:
+            return
+        print(f"Learning page templates from {len(sample)} sample pages")
+        results = await asyncio.gather(*[fetch(url) for url in sample], return_exceptions=True)
+        for url, result in zip(sample, results):
+            if isinstance(result, BaseException) or not result.success:
+                continue
+            self.stats.sampled += 1
+            self.observe(url, result.html, result.markdown_v2.raw_markdown)
+
+    def observe(self, url: str, html: Optional[str], markdown: str):
+        """Learn from a sample page while its host's template is still being learned."""
+        site = self._site(url)
+        if site.boilerplate is not None:
+            return
+        site.pages += 1
+        site.line_counts.update({key for _, key in content_lines(markdown, url)})
+        if html:
+            site.selector_hits.update(self._matching_selectors(html))
+
+        if site.pages >= self.sample_pages:
+            threshold = self.min_page_fraction * site.pages
+            site.boilerplate = {line for line, count in site.line_counts.items() if count >= threshold}
+            site.line_counts = Counter()
+            # Most specific selector found on every sampled page
+            site.selector = next(
+                (selector for selector in CONTENT_SELECTORS if site.selector_hits[selector] == site.pages),
+                None
+            )
+            self._save(urlparse(url).netloc, site)
+            print(
+                f"Learned template for {urlparse(url).netloc}: {len(site.boilerplate)} boilerplate lines, "
+                f"content selector {site.selector or 'not found'}"
+            )
+
+    def _boilerplate_lines(self, lines: List[str], candidates, boilerplate: Set[str]) -> Set[int]:
+        """Indexes of the template lines to drop: navigation-like ones and runs of `min_run` or more."""
+        drop: Set[int] = set()
+        run: List[int] = []
+
+        def end_run():
+            if len(run) >= self.min_run:
+                drop.update(run)
+            else:
+                drop.update(i for i in run if looks_like_navigation(lines[i]))
+            run.clear()
+
+        for i, key in candidates:
+            # Only blank or trivially short lines may sit between the lines of a run
+            if run and any(len(lines[j].strip()) >= 3 for j in range(run[-1] + 1, i)):
+                end_run()
+            if key in boilerplate:
+                run.append(i)
+            else:
+                end_run()
+        end_run()
+        return drop
+
+    @staticmethod
+    def _selected_text(html: str, selector: str) -> Tuple[int, int]:
+        soup = BeautifulSoup(html, "lxml")
+        body = soup.body or soup
+        selected = sum(len(element.get_text(" ", strip=True)) for element in body.select(selector))
+        return len(body.get_text(" ", strip=True)), selected
+
+    async def measure_selector(self, url: str, html: Optional[str]):
+        """Count how much of the page's text the host's content selector left out, for the report."""
+        selector = self._site(url).selector
+        if not selector or not html:
+            return
+        # Parses the full HTML, so off the event loop
+        total, selected = await asyncio.to_thread(self._selected_text, html, selector)
+        self.stats.selector_chars_in += total
+        self.stats.selector_chars_out += selected
+
+    def strip(self, url: str, markdown: str, used_selector: bool = False) -> str:
+        """
+        Remove the host's learned boilerplate lines from a page's markdown. What the
+        content selector removed before is measured by `measure_selector`.
+        """
+        self.stats.pages += 1
+        self.stats.pages_with_selector += used_selector
+        self.stats.chars_in += len(markdown)
+        boilerplate = self._site(url).boilerplate
+        if boilerplate:
+            lines = markdown.split("\n")
+            drop = self._boilerplate_lines(lines, content_lines(markdown, url), boilerplate)
+            if drop:
+                self.stats.pages_stripped += 1
+                markdown = "\n".join(line for i, line in enumerate(lines) if i not in drop)
+        self.stats.chars_out += len(markdown)
+        return markdown
+
+    def report(self) -> str:
+        return self.stats.report()
+
+    def close(self):
+        self._db.close()
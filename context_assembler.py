@@ -0,0 +1,191 @@
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import logfire
+
+from markdown_chunker import MarkdownChunker, count_tokens, iter_blocks
+
+tokens_in_metric = logfire.metric_histogram('rag.context.tokens_in', unit='tokens', description='Tokens of the material a tool result was assembled from')
+tokens_out_metric = logfire.metric_histogram('rag.context.tokens_out', unit='tokens', description='Tokens of the assembled tool result')
+
+TRIMMED_NOTE = "[... trimmed to fit the context budget]"
+OUTLINE_HEADER = "Sections not shown:"
+# Share of a trimmed page's budget kept for the summaries of the sections left out
+OUTLINE_SHARE = 0.15
+# Don't bother showing less than this much of a chunk that crosses the budget
+MIN_TRIMMED_TOKENS = 100
+
+
+# Both forms name the page, so the model can fetch it with get_page_content
+def format_hit(doc: Dict[str, Any]) -> str:
+    return f"""
+# {doc['title']}
+Source: {doc['url']}
+
+{doc['content']}
+"""
+
+
+def format_hit_summary(doc: Dict[str, Any]) -> str:
+    return f"""
+# {doc['title']}
+Source: {doc['url']}
+
+Summary: {doc['summary']}
+"""
+
+
+def trim_markdown(markdown: str, max_tokens: int) -> str:
+    """
+    The start of `markdown` within `max_tokens`, cut between sections or blocks.
+
+    Uses the chunker's first chunk, so headings, paragraphs and code fences stay
+    whole (or balanced) wherever possible.
+    """
+    if count_tokens(markdown) <= max_tokens:
+        return markdown
+    budget = max(1, max_tokens - count_tokens(TRIMMED_NOTE))
+    first = next(MarkdownChunker(max_tokens=budget).chunks(markdown), None)
+    return f"{first.text if first else ''}\n\n{TRIMMED_NOTE}"
+
+
+def heading_titles(markdown: str) -> List[str]:
+    return [block.title for block in iter_blocks(markdown.split("\n")) if block.kind == "heading"]
+
+
+@dataclass
+class AssemblyStats:
+    calls: int = 0
+    tokens_in: int = 0
+    tokens_out: int = 0
+    summarized: int = 0
+    trimmed: int = 0
+    dropped: int = 0
+
+    def report(self) -> str:
+        saved = 1 - self.tokens_out / self.tokens_in if self.tokens_in else 0.0
+        return (
+            f"Context: {self.calls} tool results, {self.tokens_in} tokens in, {self.tokens_out} out ({saved:.0%} saved), "
+            f"{self.summarized} hits as summaries, {self.trimmed} trimmed, {self.dropped} dropped"
+        )
+
+
+class ContextAssembler:
+    """
+    Fit the agent's tool results into a token budget.
+
+    Retrieval hits are added best first: the top `full_hits` in full, the rest as
+    their summary and URL (the model can still fetch the page). A hit that doesn't
+    fit in full falls back to its summary, and the best hit is trimmed between
+    sections rather than summarized. Pages keep their chunks in order until the
+    budget, trim the chunk that crosses it and list the summaries of the sections
+    left out. Tokens in and out are recorded in `stats` and as logfire metrics.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        full_hits: Optional[int] = None,
+        max_hits: Optional[int] = None,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("CONTEXT_MAX_TOKENS") or 3000)
+        self.full_hits = full_hits if full_hits is not None else int(os.getenv("CONTEXT_FULL_HITS") or 2)
+        self.max_hits = max_hits or int(os.getenv("CONTEXT_MAX_HITS") or 5)
+        self.stats = AssemblyStats()
+
+    def _record(self, tokens_in: int, result: str) -> str:
+        tokens_out = count_tokens(result)
+        self.stats.calls += 1
+        self.stats.tokens_in += tokens_in
+        self.stats.tokens_out += tokens_out
+        tokens_in_metric.record(tokens_in)
+        tokens_out_metric.record(tokens_out)
+        return result
+
+    def documentation(self, docs: List[Dict[str, Any]]) -> str:
+        """Ranked retrieval hits, best first, as one tool result."""
+        docs = docs[:self.max_hits]
+        tokens_in = 0
+        parts: List[str] = []
+        used = 0
+        for rank, doc in enumerate(docs):
+            full = format_hit(doc)
+            full_tokens = count_tokens(full)
+            tokens_in += full_tokens
+
+            summary = format_hit_summary(doc) if doc.get('summary') else None
+            if rank < self.full_hits and used + full_tokens <= self.max_tokens:
+                text, tokens = full, full_tokens
+            elif rank < self.full_hits and not parts:
+                # The best hit is worth more than a summary even when it has to be cut
+                text = trim_markdown(full, self.max_tokens)
+                tokens = count_tokens(text)
+                self.stats.trimmed += 1
+            elif summary is not None and used + count_tokens(summary) <= self.max_tokens:
+                text, tokens = summary, count_tokens(summary)
+                self.stats.summarized += 1
+            else:
+                self.stats.dropped += 1
+                continue
+            parts.append(text)
+            used += tokens
+
+        return self._record(tokens_in, "\n\n---\n\n".join(parts))
+
+    def page(self, title: str, chunks: List[Dict[str, Any]]) -> str:
+        """A page's chunks in order, trimmed to the budget."""
+        header = f"# {title}\n"
+        tokens = [count_tokens(chunk['content']) for chunk in chunks]
+        tokens_in = count_tokens(header) + sum(tokens)
+        if tokens_in <= self.max_tokens:
+            return self._record(tokens_in, "\n\n".join([header] + [chunk['content'] for chunk in chunks]))
+
+        # Leave part of the budget for the outline of what's left out
+        content_budget = int(self.max_tokens * (1 - OUTLINE_SHARE))
+        parts = [header]
+        used = count_tokens(header)
+        shown = 0
+        for chunk, chunk_tokens in zip(chunks, tokens):
+            if used + chunk_tokens > content_budget:
+                break
+            parts.append(chunk['content'])
+            used += chunk_tokens
+            shown += 1
+
+        # (line, whether it stands for a whole chunk) for everything left out
+        unshown = []
+        if shown < len(chunks) and content_budget - used > MIN_TRIMMED_TOKENS:
+            # Keep the start of the chunk that crosses the budget
+            content = chunks[shown]['content']
+            trimmed = trim_markdown(content, content_budget - used)
+            parts.append(trimmed)
+            used += count_tokens(trimmed)
+            shown += 1
+            self.stats.trimmed += 1
+            # The trimmed text is a prefix, so its headings come first
+            unshown += [(f"- {title}", False) for title in heading_titles(content)[len(heading_titles(trimmed)):]]
+        for chunk in chunks[shown:]:
+            line = f"- {chunk['title']}"
+            if chunk.get('summary'):
+                line += f": {chunk['summary']}"
+            unshown.append((line, True))
+
+        # The model can see what it's missing and ask a narrower question
+        outline = []
+        used += count_tokens(OUTLINE_HEADER)
+        for line, whole_chunk in unshown:
+            line_tokens = count_tokens(line)
+            if used + line_tokens > self.max_tokens:
+                self.stats.dropped += whole_chunk
+                continue
+            outline.append(line)
+            used += line_tokens
+            self.stats.summarized += whole_chunk
+        if outline:
+            parts.append("\n".join([OUTLINE_HEADER] + outline))
+
+        return self._record(tokens_in, "\n\n".join(parts))
+
+    def report(self) -> str:
+        return self.stats.report()
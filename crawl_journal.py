@@ -0,0 +1,216 @@
+import os
+import json
+import array
+import sqlite3
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+# Page states, in the order a page moves through the pipeline
+QUEUED = "queued"
+FETCHED = "fetched"
+CHUNKED = "chunked"
+EMBEDDED = "embedded"
+STORED = "stored"
+PAGE_STATES = (QUEUED, FETCHED, CHUNKED, EMBEDDED, STORED)
+
+
+@dataclass
+class JournalChunk:
+    url: str
+    chunk_number: int
+    content: str
+    metadata: Dict[str, Any]
+    title: Optional[str]
+    summary: Optional[str]
+    embedding: Optional[List[float]]
+
+
+class CrawlJournal:
+    """
+    Durable SQLite journal of an ingestion run, so an interrupted run can resume.
+
+    Every URL moves through queued → fetched → chunked → embedded → stored. The
+    journal keeps whatever each step produced (the page markdown once fetched, the
+    chunks once chunked, their title/summary and embedding as they are enriched),
+    so a resumed run picks every page up at its last completed step instead of
+    crawling and enriching it again. Every step is safe to repeat: chunks are
+    numbered deterministically and stored with an upsert on (url, chunk_number).
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CRAWL_JOURNAL_PATH", "crawl_journal.sqlite3")
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("pragma journal_mode=wal")
+        # Each update is still durable across a killed process, just not a power cut
+        self._db.execute("pragma synchronous=normal")
+        self._db.execute("""
+            create table if not exists pages (
+                url text primary key,
+                state text not null,
+                lastmod text,
+                markdown text,
+                error text,
+                updated_at text not null
+            )
+        """)
+        self._db.execute("""
+            create table if not exists chunks (
+                url text not null,
+                chunk_number integer not null,
+                content text not null,
+                metadata text not null,
+                title text,
+                summary text,
+                embedding blob,
+                stored integer not null default 0,
+                primary key (url, chunk_number)
+            )
+        """)
+        self._db.execute("create index if not exists idx_pages_state on pages (state)")
+        self._db.commit()
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def reset(self):
+        """Forget the previous run."""
+        self._db.execute("delete from chunks")
+        self._db.execute("delete from pages")
+        self._db.commit()
+
+    def enqueue(self, urls: Iterable[str], lastmods: Optional[Dict[str, Optional[str]]] = None):
+        """Add URLs in the queued state. URLs already in the journal keep their state."""
+        lastmods = lastmods or {}
+        now = self._now()
+        self._db.executemany(
+            "insert or ignore into pages (url, state, lastmod, updated_at) values (?, ?, ?, ?)",
+            [(url, QUEUED, lastmods.get(url), now) for url in urls]
+        )
+        self._db.commit()
+
+    def urls(self) -> List[str]:
+        return [row[0] for row in self._db.execute("select url from pages order by rowid")]
+
+    def lastmods(self) -> Dict[str, Optional[str]]:
+        return dict(self._db.execute("select url, lastmod from pages"))
+
+    def state(self, url: str) -> Optional[str]:
+        row = self._db.execute("select state from pages where url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def counts(self) -> Dict[str, int]:
+        counts = dict.fromkeys(PAGE_STATES, 0)
+        counts.update(self._db.execute("select state, count(*) from pages group by state"))
+        return counts
+
+    def markdown(self, url: str) -> Optional[str]:
+        row = self._db.execute("select markdown from pages where url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def _set_state(self, url: str, state: str, **columns):
+        assignments = "".join(f", {column} = ?" for column in columns)
+        self._db.execute(
+            f"update pages set state = ?, updated_at = ?{assignments} where url = ?",
+            (state, self._now(), *columns.values(), url)
+        )
+
+    def mark_queued(self, url: str, error: Optional[str] = None):
+        """Send a page back to the start, e.g. after a failed fetch."""
+        self._db.execute("delete from chunks where url = ?", (url,))
+        self._set_state(url, QUEUED, markdown=None, error=error)
+        self._db.commit()
+
+    def mark_fetched(self, url: str, markdown: str):
+        self._db.execute("delete from chunks where url = ?", (url,))
+        self._set_state(url, FETCHED, markdown=markdown, error=None)
+        self._db.commit()
+
+    def mark_stored(self, url: str):
+        """Mark a page done without chunks, e.g. unchanged in an incremental crawl."""
+        self._set_state(url, STORED, markdown=None)
+        self._db.commit()
+
+    def mark_chunked(self, url: str, chunks: List[Dict[str, Any]]):
+        """Record a page's chunks (dicts with chunk_number, content and metadata)."""
+        self._db.execute("delete from chunks where url = ?", (url,))
+        self._db.executemany(
+            "insert into chunks (url, chunk_number, content, metadata) values (?, ?, ?, ?)",
+            [
+                (url, chunk["chunk_number"], chunk["content"], json.dumps(chunk["metadata"]))
+                for chunk in chunks
+            ]
+        )
+        # The markdown is no longer needed once the chunks are safe
+        self._set_state(url, CHUNKED if chunks else STORED, markdown=None)
+        self._db.commit()
+
+    def record_summary(self, url: str, chunk_number: int, title: str, summary: str):
+        self._db.execute(
+            "update chunks set title = ?, summary = ? where url = ? and chunk_number = ?",
+            (title, summary, url, chunk_number)
+        )
+        self._db.commit()
+
+    def record_metadata(self, url: str, chunk_number: int, metadata: Dict[str, Any]):
+        self._db.execute(
+            "update chunks set metadata = ? where url = ? and chunk_number = ?",
+            (json.dumps(metadata), url, chunk_number)
+        )
+        self._db.commit()
+
+    def record_embedding(self, url: str, chunk_number: int, embedding: List[float]):
+        self._db.execute(
+            "update chunks set embedding = ? where url = ? and chunk_number = ?",
+            (array.array("f", embedding).tobytes(), url, chunk_number)
+        )
+        self._db.execute(
+            "update pages set state = ?, updated_at = ? where url = ? and state = ? "
+            "and not exists (select 1 from chunks where url = ? and embedding is null)",
+            (EMBEDDED, self._now(), url, CHUNKED, url)
+        )
+        self._db.commit()
+
+    def record_stored(self, rows: Iterable[Dict[str, Any]]):
+        """Mark upserted rows as stored, completing pages that have no chunks left."""
+        keys = [(row["url"], row["chunk_number"]) for row in rows]
+        self._db.executemany("update chunks set stored = 1 where url = ? and chunk_number = ?", keys)
+        now = self._now()
+        self._db.executemany(
+            "update pages set state = ?, updated_at = ? where url = ? and state != ? "
+            "and not exists (select 1 from chunks where url = ? and stored = 0)",
+            [(STORED, now, url, STORED, url) for url in {url for url, _ in keys}]
+        )
+        self._db.commit()
+
+    def chunk_count(self, url: str) -> int:
+        """How many chunks the page was split into, stored or not."""
+        return self._db.execute("select count(*) from chunks where url = ?", (url,)).fetchone()[0]
+
+    def chunks(self, url: str) -> List[JournalChunk]:
+        """The journaled chunks of a page that still need to be stored."""
+        rows = self._db.execute(
+            "select url, chunk_number, content, metadata, title, summary, embedding "
+            "from chunks where url = ? and stored = 0 order by chunk_number",
+            (url,)
+        ).fetchall()
+        return [
+            JournalChunk(
+                url=url,
+                chunk_number=chunk_number,
+                content=content,
+                metadata=json.loads(metadata),
+                title=title,
+                summary=summary,
+                embedding=array.array("f", embedding).tolist() if embedding is not None else None,
+            )
+            for url, chunk_number, content, metadata, title, summary, embedding in rows
+        ]
+
+    def report(self) -> str:
+        counts = self.counts()
+        return "Crawl journal: " + ", ".join(f"{counts[state]} {state}" for state in PAGE_STATES)
+
+    def close(self):
+        self._db.close()
@@ -9,6 +9,111 @@ import json
 from typing import List , Dict 
 from datetime import datetime 
 from urllib.parse import urlparse   
+from typing import Iterator, Set
+import argparse
+import io
+import os
+
+from crawl_scheduler import CrawlScheduler
+
+
+class JsonlWriter:
+    """
+    Append-only JSON Lines writer, one record per line, flushed as it is written.
+
+    Paths ending in `.zst` are zstd-compressed (needs the optional `zstandard`
+    package). Each flush ends a zstd frame, so a file cut short by a crash still
+    decompresses up to the last completed record. Reopening the file cuts off a
+    half-written frame first, then appends new frames after the complete ones.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.compressed = path.endswith(".zst")
+        self._compressor = None
+        if self.compressed:
+            self._compressor = _zstandard().ZstdCompressor()
+            if os.path.exists(path):
+                # Frames appended after a truncated one could never be read back
+                end = _complete_zstd_length(path)
+                if end < os.path.getsize(path):
+                    with open(path, "r+b") as existing:
+                        existing.truncate(end)
+        elif os.path.exists(path) and os.path.getsize(path):
+            # Start on a fresh line if a crash left the last record half written
+            with open(path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                needs_newline = existing.read(1) != b"\n"
+            if needs_newline:
+                with open(path, "ab") as existing:
+                    existing.write(b"\n")
+        self._file = open(path, "ab")
+
+    def write(self, record: Dict) -> None:
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if self._compressor is not None:
+            line = self._compressor.compress(line)
+        self._file.write(line)
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    @staticmethod
+    def read_records(path: str) -> Iterator[Dict]:
+        """Yield the records of a (possibly partially written) JSONL file."""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as raw:
+            if path.endswith(".zst"):
+                reader = _zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+                stream = io.TextIOWrapper(reader, encoding="utf-8")
+            else:
+                stream = io.TextIOWrapper(raw, encoding="utf-8")
+            try:
+                for line in stream:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A record cut off by a crash
+                        continue
+            except Exception as e:
+                print(f"Stopped reading {path} at a truncated record: {e}")
+
+
+def _complete_zstd_length(path: str, read_size: int = 1 << 20) -> int:
+    """Bytes at the start of a .zst file taken up by complete frames."""
+    zstandard = _zstandard()
+    dctx = zstandard.ZstdDecompressor()
+    end = 0
+    with open(path, "rb") as f:
+        decompressor = dctx.decompressobj()
+        # File offset of the start of `data`
+        offset = 0
+        data = f.read(read_size)
+        while data:
+            try:
+                decompressor.decompress(data)
+            except zstandard.ZstdError:
+                break
+            if decompressor.eof:
+                end = offset + len(data) - len(decompressor.unused_data)
+                offset, data = end, decompressor.unused_data
+                decompressor = dctx.decompressobj()
+                if data:
+                    continue
+            else:
+                offset += len(data)
+            data = f.read(read_size)
+    return end
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("Writing .zst output requires the zstandard package: pip install zstandard") from e
+    return zstandard
 
 
 class Crawler : 
@@ -20,9 +125,10 @@ class Crawler :
         )
         self.crawl_config = crawl_config 
         self.path = path_  
-        self.crawler = AsyncWebCrawler(config=self.browser_config) 
         
     async def crawl_urls(self , urls : List[str]) : 
+          # Only the sequential mode uses a single crawler; concurrent mode has a browser pool
+          self.crawler = AsyncWebCrawler(config=self.browser_config) 
           await self.crawler.start() 
           crawled_data : Dict[str , Dict] = {}
           try :
@@ -70,11 +176,75 @@ class Crawler :
                 ensure_ascii=False
             )    
                 await self.crawler.close()
-                
-                
-               
-               
+
+    def _record(self, url: str, result, session_id: str) -> Dict:
+        record = {
+            "url": url,
+            "status": "success" if result.success else "failed",
+            "crawl_timestamp": datetime.now().isoformat(),
+            "session_id": session_id,
+            "path": urlparse(url).path,
+            "domain": urlparse(url).netloc,
+        }
+        if result.success:
+            record["markdown"] = result.markdown_v2.raw_markdown if result.markdown_v2 else result.markdown
+            record["metadata"] = result.metadata
+        else:
+            record["error"] = result.error_message
+        return record
+
+    async def crawl_urls_concurrent(self, urls: List[str], workers: int = 5, resume: bool = True):
+        """
+        Crawl URLs with `workers` concurrent pages and stream every result to
+        `self.path` as JSON Lines as soon as it completes, success or failure.
+
+        With `resume`, URLs already crawled successfully in an existing output file
+        are skipped and only the rest (including earlier failures) are crawled.
+        """
+        done: Set[str] = set()
+        if resume:
+            done = {
+                record["url"] for record in JsonlWriter.read_records(self.path)
+                if record.get("status") == "success"
+            }
+            if done:
+                print(f"Resuming: {len(done)} URLs already crawled")
+        pending = [url for url in dict.fromkeys(urls) if url not in done]
+
+        writer = JsonlWriter(self.path)
+        scheduler = CrawlScheduler(
+            self.browser_config,
+            self.crawl_config or CrawlerRunConfig(),
+            browsers=1,
+            pages_per_browser=workers,
+        )
+        crawled = failed = 0
+
+        async def handle(url: str, result):
+            nonlocal crawled, failed
+            if result.success:
+                print(f"Successfully crawled: {url}")
+                crawled += 1
+            else:
+                print(f"Failed: {url} - Error: {result.error_message}")
+                failed += 1
+            writer.write(self._record(url, result, result.session_id or ""))
+
+        try:
+            async with scheduler:
+                await scheduler.crawl(pending, handle)
+        finally:
+            writer.close()
+            print(f"Crawled {crawled} URLs, {failed} failed, {len(done)} skipped from a previous run")
+
+
 if __name__ == "__main__" : 
+    parser = argparse.ArgumentParser(description="Crawl a site's pages to disk.")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent pages; above 1 streams JSON Lines output")
+    parser.add_argument("--output", default=None, help="Output file (.json, .jsonl or .jsonl.zst)")
+    parser.add_argument("--no-resume", action="store_true", help="Recrawl URLs already in the output file")
+    args = parser.parse_args()
+
     
     # config = CrawlerRunConfig(
     #     css_selector="main.content", 
@@ -86,7 +256,11 @@ if __name__ == "__main__" :
     #     exclude_external_images=True,
     #     cache_mode=CacheMode.BYPASS
     # )
-    web_crawler = Crawler("data.json" ) 
     urls = get_all_urls("https://ai.pydantic.dev/")
     print(urls[:10])
-    asyncio.run(web_crawler.crawl_urls(urls))                 
\ No newline at end of file
+    if args.workers > 1:
+        web_crawler = Crawler(args.output or "data.jsonl")
+        asyncio.run(web_crawler.crawl_urls_concurrent(urls, workers=args.workers, resume=not args.no_resume))
+    else:
+        web_crawler = Crawler(args.output or "data.json" ) 
+        asyncio.run(web_crawler.crawl_urls(urls))                 
\ No newline at end of file
@@ -2,26 +2,51 @@ import os
 import sys
 import json
 import asyncio
+import argparse
 import requests
 from xml.etree import ElementTree
-from typing import List, Dict, Any
-from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Set, Tuple
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 from dotenv import load_dotenv
+import aiohttp
 
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
+from crawl4ai import BrowserConfig, CrawlerRunConfig, CacheMode
 from openai import AsyncOpenAI
-from supabase import create_client, Client
+
+from embedding_batcher import EmbeddingBatcher, EMBEDDING_MODEL
+from rate_limited_openai import RateLimitedOpenAI
+from summary_batcher import SummaryBatcher, chunk_excerpt
+from enrichment_cache import EnrichmentCache
+from crawl_state import CrawlState, content_hash, response_validators
+from chunk_writer import ChunkWriter
+from repository import Repository
+from ingestion_pipeline import Pipeline
+from markdown_chunker import Chunk, MarkdownChunker
+from crawl_scheduler import CrawlScheduler
+from fast_fetch import HybridFetcher
+from chunk_dedupe import ChunkDeduper
+from content_extractor import ContentExtractor
+from vector_index import VECTOR_INDEX_METHOD, build_vector_index
+from crawl_journal import CrawlJournal, JournalChunk, FETCHED, CHUNKED, EMBEDDED, STORED
 
 load_dotenv()
 
-# Initialize OpenAI and Supabase clients
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
+# Initialize OpenAI and Supabase clients. Every OpenAI call goes through one
+# shared rate limiter, so summaries and embeddings share the account's limits.
+openai_client = RateLimitedOpenAI(AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
+# Async and pooled, so database writes don't stall the crawl's event loop
+repository = Repository.from_env()
+
+# Chunks from all concurrently crawled pages share one embedding batcher
+embedding_batcher = EmbeddingBatcher(openai_client)
+
+# Summaries and embeddings of unchanged chunks are reused across crawl runs
+enrichment_cache = EnrichmentCache()
+
+# Processed chunks are written to site_pages in bulk upserts
+chunk_writer = ChunkWriter(repository)
 
 @dataclass
 class ProcessedChunk:
@@ -31,154 +56,214 @@ class ProcessedChunk:
     summary: str
     content: str
     metadata: Dict[str, Any]
-    embedding: List[float]
-
-def chunk_text(text: str, chunk_size: int = 5000) -> List[str]:
-    """Split text into chunks, respecting code blocks and paragraphs."""
-    chunks = []
-    start = 0
-    text_length = len(text)
-
-    while start < text_length:
-        # Calculate end position
-        end = start + chunk_size
-
-        # If we're at the end of the text, just take what's left
-        if end >= text_length:
-            chunks.append(text[start:].strip())
-            break
-
-        # Try to find a code block boundary first (```)
-        chunk = text[start:end]
-        code_block = chunk.rfind('```')
-        if code_block != -1 and code_block > chunk_size * 0.3:
-            end = start + code_block
-
-        # If no code block, try to break at a paragraph
-        elif '\n\n' in chunk:
-            # Find the last paragraph break
-            last_break = chunk.rfind('\n\n')
-            if last_break > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_break
-
-        # If no paragraph break, try to break at a sentence
-        elif '. ' in chunk:
-            # Find the last sentence break
-            last_period = chunk.rfind('. ')
-            if last_period > chunk_size * 0.3:  # Only break if we're past 30% of chunk_size
-                end = start + last_period + 1
-
-        # Extract chunk and clean it up
-        chunk = text[start:end].strip()
-        if chunk:
-            chunks.append(chunk)
-
-        # Move start position for next chunk
-        start = max(start + 1, end)
-
-    return chunks
+    embedding: Optional[List[float]]
+
+@dataclass
+class PendingPage:
+    """
+    A crawled page waiting for its new chunks to be stored. Then its old chunks
+    past the new end are deleted and, if it has a content hash, it's recorded in
+    the crawl state.
+    """
+    lastmod: Optional[str]
+    headers: Dict[str, str]
+    content_hash: Optional[str]
+    chunk_count: Optional[int] = None
+    stored: Set[int] = field(default_factory=set)
+
+def chunk_text(text: str, max_tokens: Optional[int] = None) -> List[Chunk]:
+    """Split text into token-bounded chunks, respecting headings, code blocks and paragraphs."""
+    return list(MarkdownChunker(max_tokens).chunks(text))
+
+def summary_cache_input(chunk: str, url: str) -> str:
+    """The per-chunk prompt, also the key summaries are cached under in either mode."""
+    return f"URL: {url}\n\nContent:\n{chunk_excerpt(chunk)}..."  # Send first 1000 chars for context
 
 async def get_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
-    """Extract title and summary using GPT-4."""
+    """Extract title and summary using GPT-4, or reuse a cached one."""
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    user_content = summary_cache_input(chunk, url)
+
+    cached = enrichment_cache.get_summary(model, user_content)
+    if cached is not None:
+        return cached
+
+    extracted = await request_title_and_summary(chunk, url)
+    enrichment_cache.put_summary(model, user_content, extracted)
+    return extracted
+
+async def request_title_and_summary(chunk: str, url: str) -> Dict[str, str]:
+    """Extract title and summary using GPT-4, without the cache."""
     system_prompt = """You are an AI that extracts titles and summaries from documentation chunks.
     Return a JSON object with 'title' and 'summary' keys.
     For the title: If this seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
     For the summary: Create a concise summary of the main points in this chunk.
     Keep both title and summary concise but informative."""
-    
-    try:
-        response = await openai_client.chat.completions.create(
-            model=os.getenv("LLM_MODEL", "gpt-4o-mini"),
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"URL: {url}\n\nContent:\n{chunk[:1000]}..."}  # Send first 1000 chars for context
-            ],
-            response_format={ "type": "json_object" }
-        )
-        return json.loads(response.choices[0].message.content)
-    except Exception as e:
-        print(f"Error getting title and summary: {e}")
-        return {"title": "Error processing title", "summary": "Error processing summary"}
+    model = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    user_content = summary_cache_input(chunk, url)
+
+    # Errors propagate: the chunk is left out of this run (and retried by --resume)
+    # rather than stored with a placeholder title and summary
+    response = await openai_client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ],
+        response_format={ "type": "json_object" }
+    )
+    return json.loads(response.choices[0].message.content)
+
+# Several chunks of a page share one summary request unless SUMMARY_MODE=single.
+# summarize_chunk has already missed the cache and caches the result, so the
+# per-chunk fallback skips it.
+summary_batcher = SummaryBatcher(openai_client, fallback=request_title_and_summary)
+
+async def summarize_chunk(chunk: str, url: str) -> Dict[str, str]:
+    """Title and summary of a chunk, batched with the page's other chunks if enabled."""
+    if os.getenv("SUMMARY_MODE", "batched") == "single":
+        return await get_title_and_summary(chunk, url)
+
+    model = summary_batcher.model
+    user_content = summary_cache_input(chunk, url)
+    cached = enrichment_cache.get_summary(model, user_content)
+    if cached is not None:
+        return cached
+
+    extracted = await summary_batcher.summarize(url, chunk)
+    enrichment_cache.put_summary(model, user_content, extracted)
+    return extracted
 
 async def get_embedding(text: str) -> List[float]:
-    """Get embedding vector from OpenAI."""
-    try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
+    """Get embedding vector from OpenAI, batched with other pending chunks."""
+    cached = enrichment_cache.get_embedding(EMBEDDING_MODEL, text)
+    if cached is not None:
+        return cached
+
+    embedding = await embedding_batcher.embed(text)
+    enrichment_cache.put_embedding(EMBEDDING_MODEL, text, embedding)
+    return embedding
+
+def build_chunks(url: str, markdown: str) -> List[ProcessedChunk]:
+    """Split a document into chunks awaiting title, summary and embedding."""
+    crawled_at = datetime.now(timezone.utc).isoformat()
+    return [
+        ProcessedChunk(
+            url=url,
+            chunk_number=i,
+            title="",
+            summary="",
+            content=chunk.text,  # Store the original chunk content
+            metadata={
+                "source": "pydantic_ai_docs",
+                "chunk_size": len(chunk.text),
+                "chunk_tokens": chunk.tokens,
+                "headings": chunk.headings,
+                "crawled_at": crawled_at,
+                "url_path": urlparse(url).path
+            },
+            embedding=[]
         )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
-
-async def process_chunk(chunk: str, chunk_number: int, url: str) -> ProcessedChunk:
-    """Process a single chunk of text."""
-    # Get title and summary
-    extracted = await get_title_and_summary(chunk, url)
-    
-    # Get embedding
-    embedding = await get_embedding(chunk)
-    
-    # Create metadata
-    metadata = {
-        "source": "pydantic_ai_docs",
-        "chunk_size": len(chunk),
-        "crawled_at": datetime.now(timezone.utc).isoformat(),
-        "url_path": urlparse(url).path
-    }
-    
+        for i, chunk in enumerate(chunk_text(markdown))
+    ]
+
+def chunk_from_journal(chunk: JournalChunk) -> ProcessedChunk:
+    """Rebuild a chunk from the journal, keeping whatever enrichment it already had."""
     return ProcessedChunk(
-        url=url,
-        chunk_number=chunk_number,
-        title=extracted['title'],
-        summary=extracted['summary'],
-        content=chunk,  # Store the original chunk content
-        metadata=metadata,
-        embedding=embedding
+        url=chunk.url,
+        chunk_number=chunk.chunk_number,
+        title=chunk.title or "",
+        summary=chunk.summary or "",
+        content=chunk.content,
+        metadata=chunk.metadata,
+        embedding=chunk.embedding or []
     )
 
-async def insert_chunk(chunk: ProcessedChunk):
-    """Insert a processed chunk into Supabase."""
+async def delete_page_chunks(url: str, from_chunk: int = 0) -> bool:
+    """Delete a page's stored chunks from `from_chunk` on (all by default). Returns whether it worked."""
     try:
-        data = {
-            "url": chunk.url,
-            "chunk_number": chunk.chunk_number,
-            "title": chunk.title,
-            "summary": chunk.summary,
-            "content": chunk.content,
-            "metadata": chunk.metadata,
-            "embedding": chunk.embedding
-        }
-        
-        result = supabase.table("site_pages").insert(data).execute()
-        print(f"Inserted chunk {chunk.chunk_number} for {chunk.url}")
-        return result
+        await repository.delete_page_chunks(url, from_chunk)
+        print(f"Deleted chunks for {url}")
+        return True
     except Exception as e:
-        print(f"Error inserting chunk: {e}")
-        return None
-
-async def process_and_store_document(url: str, markdown: str):
-    """Process a document and store its chunks in parallel."""
-    # Split into chunks
-    chunks = chunk_text(markdown)
-    
-    # Process chunks in parallel
-    tasks = [
-        process_chunk(chunk, i, url) 
-        for i, chunk in enumerate(chunks)
-    ]
-    processed_chunks = await asyncio.gather(*tasks)
-    
-    # Store chunks in parallel
-    insert_tasks = [
-        insert_chunk(chunk) 
-        for chunk in processed_chunks
-    ]
-    await asyncio.gather(*insert_tasks)
+        print(f"Error deleting chunks for {url}: {e}")
+        return False
+
+async def detach_duplicates(urls: Set[str], skip: Set[Tuple[str, int]] = frozenset()) -> int:
+    """
+    Store stored duplicates of chunks on `urls` as chunks in their own right.
+
+    Their `duplicate_of` link points at a chunk that was rewritten or deleted, so
+    it may no longer hold the same text: each gets its own embedding and loses the
+    link, keeping its title and summary. Chunks in `skip` (written by this run,
+    with a fresh link) are left alone. Returns how many were detached.
+    """
+    async def detach(row: Dict[str, Any]) -> bool:
+        try:
+            row["embedding"] = await get_embedding(row["content"])
+        except Exception as e:
+            print(f"Error embedding duplicate chunk {row['chunk_number']} of {row['url']}: {e}")
+            return False
+        row["metadata"].pop("duplicate_of", None)
+        await chunk_writer.add(row)
+        return True
+
+    detached = 0
+    for url in urls:
+        try:
+            rows = await repository.duplicate_chunks(url)
+        except Exception as e:
+            print(f"Error looking up duplicates of {url}: {e}")
+            continue
+        rows = [row for row in rows if (row["url"], row["chunk_number"]) not in skip]
+        detached += sum(await asyncio.gather(*[detach(row) for row in rows]))
+    await chunk_writer.flush()
+    return detached
+
+async def crawl_parallel(
+    urls: List[str],
+    max_concurrent: Optional[int] = None,
+    state: Optional[CrawlState] = None,
+    lastmods: Optional[Dict[str, Optional[str]]] = None,
+    journal: Optional[CrawlJournal] = None,
+):
+    """
+    Crawl, chunk, summarize, embed and store URLs as a staged pipeline.
+
+    Each stage has its own worker count and bounded queues between stages, so a
+    slow stage throttles the ones before it instead of piling up work in memory.
+    Pages are fetched over plain HTTP when they are static HTML and otherwise
+    crawled by a CrawlScheduler browser pool, sized to the machine unless
+    `max_concurrent` pins it to one browser with that many pages; the other
+    stages take their worker counts from PIPELINE_*_WORKERS.
+
+    Pages have their chunks overwritten in place; once every new chunk of a page
+    is stored, its old chunks past the new end are deleted. If a CrawlState is
+    given the crawl is incremental: pages whose sitemap lastmod, ETag/Last-Modified
+    or content hash are unchanged since the last run are skipped, and a changed
+    page is recorded in the state once its chunks are stored. A page with a failed
+    chunk isn't recorded, so the next run retries it.
+
+    Before crawling, sample pages of each site without a stored template teach a
+    ContentExtractor the site's template: recurring menu/footer lines are stripped
+    from every page, which is also crawled with the detected main-content CSS
+    selector. The content hash that detects changes is taken before stripping.
 
-async def crawl_parallel(urls: List[str], max_concurrent: int = 5):
-    """Crawl multiple URLs in parallel with a concurrency limit."""
+    Chunks that repeat across pages (exact or near duplicates, typically nav and
+    footer boilerplate) are only summarized once: copies take the canonical
+    chunk's title and summary and are stored as soon as it has them. Near
+    duplicates are embedded on their own, since their text differs; exact ones
+    are stored without an embedding and with a `duplicate_of` link to the
+    canonical chunk in their metadata. If the canonical chunk's summary fails,
+    its copies are left unstored with it. Incremental runs detach stored copies
+    from canonical chunks on changed pages (see `detach_duplicates`).
+
+    If a CrawlJournal is given, every page's progress is checkpointed in it and
+    pages the journal already has are resumed at their last completed step:
+    stored pages are skipped, fetched pages are not crawled again, and chunks
+    are not summarized or embedded again.
+    """
+    lastmods = lastmods or {}
     browser_config = BrowserConfig(
         headless=True,
         verbose=False,
@@ -186,34 +271,264 @@ async def crawl_parallel(urls: List[str], max_concurrent: int = 5):
     )
     crawl_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS)
 
-    # Create the crawler instance
-    crawler = AsyncWebCrawler(config=browser_config)
-    await crawler.start()
+    # Create the browser pool
+    if max_concurrent:
+        scheduler = CrawlScheduler(browser_config, crawl_config, browsers=1, pages_per_browser=max_concurrent)
+    else:
+        scheduler = CrawlScheduler(browser_config, crawl_config)
+    # Static pages skip the browser, which is only started if a page needs it
+    fetcher = HybridFetcher(scheduler, crawl_config)
+    http_session = aiohttp.ClientSession()
+    unchanged = 0
+    resumed = 0
+    extractor = ContentExtractor()
+    deduper = ChunkDeduper()
+    summaries: Dict[Tuple[str, int], Tuple[str, str]] = {}
+    # Duplicates waiting for their canonical chunk's title and summary, by its key
+    waiting_duplicates: Dict[Tuple[str, int], List[ProcessedChunk]] = {}
+    failed_canonicals: Set[Tuple[str, int]] = set()
+    # Pages waiting for their chunks to be stored, and those whose chunks all are
+    pending_pages: Dict[str, PendingPage] = {}
+    finished_pages: List[Tuple[str, PendingPage]] = []
+    # Every page re-crawled by an incremental run and every chunk this run stored
+    refreshed_pages: Set[str] = set()
+    stored_chunks: Set[Tuple[str, int]] = set()
+    if journal is not None:
+        journal.enqueue(urls, lastmods)
+
+    def record_stored(rows: List[Dict[str, Any]]):
+        if journal is not None:
+            journal.record_stored(rows)
+        for row in rows:
+            stored_chunks.add((row["url"], row["chunk_number"]))
+            page = pending_pages.get(row["url"])
+            if page is None:
+                continue
+            page.stored.add(row["chunk_number"])
+            if len(page.stored) == page.chunk_count:
+                finished_pages.append((row["url"], pending_pages.pop(row["url"])))
+
+    def page_failed(url: str):
+        # Left out of the state, so the next incremental run crawls it again; its
+        # old chunks past the new end stay until a run stores it completely
+        pending_pages.pop(url, None)
+
+    async def record_finished_pages():
+        while finished_pages:
+            url, page = finished_pages.pop()
+            # The new chunks replaced the old ones in place, drop any left past the end
+            deleted = await delete_page_chunks(url, from_chunk=page.chunk_count)
+            if deleted and state is not None and page.content_hash is not None:
+                state.record(url, page.lastmod, page.headers, page.content_hash)
+
+    chunk_writer.on_stored = record_stored
+
+    async def crawl_stage(url: str, emit):
+        nonlocal unchanged, resumed
+        if journal is not None:
+            page_state = journal.state(url)
+            if page_state == STORED:
+                resumed += 1
+                return
+            if page_state == FETCHED:
+                resumed += 1
+                # No content hash: the old chunks' tail is dropped but the state isn't updated
+                pending_pages[url] = PendingPage(lastmods.get(url), {}, None)
+                await emit((url, journal.markdown(url)))
+                return
+            if page_state in (CHUNKED, EMBEDDED):
+                resumed += 1
+                chunks = journal.chunks(url)
+                chunk_count = journal.chunk_count(url)
+                stored = set(range(chunk_count)) - {chunk.chunk_number for chunk in chunks}
+                pending_pages[url] = PendingPage(lastmods.get(url), {}, None, chunk_count, stored)
+                await emit((url, [chunk_from_journal(chunk) for chunk in chunks]))
+                return
+
+        headers = {}
+        if state is not None:
+            headers = await state.check_for_changes(http_session, url, lastmods.get(url))
+            if headers is None:
+                unchanged += 1
+                if journal is not None:
+                    journal.mark_stored(url)
+                return
+
+        page_config = extractor.crawl_config(url, crawl_config)
+        result = await fetcher.fetch(url, config=page_config)
+        used_selector = page_config is not crawl_config
+        if used_selector and result.success and not result.markdown_v2.raw_markdown.strip():
+            # This page lacks the site's usual content container
+            used_selector = False
+            result = await fetcher.fetch(url)
+        if not result.success:
+            print(f"Failed: {url} - Error: {result.error_message}")
+            if journal is not None:
+                journal.mark_queued(url, result.error_message)
+            return
+
+        print(f"Successfully crawled: {url}")
+        # The validators of the response the page was actually read from
+        headers = {**headers, **response_validators(result.response_headers)}
+        markdown = result.markdown_v2.raw_markdown
+        # Hashed as crawled, so it doesn't depend on the boilerplate template
+        page_hash = content_hash(markdown)
+        if used_selector:
+            await extractor.measure_selector(url, result.html)
+        markdown = extractor.strip(url, markdown, used_selector)
+        if state is not None:
+            previous = state.get(url)
+            if previous is not None and previous.content_hash == page_hash:
+                unchanged += 1
+                state.record(url, lastmods.get(url), headers, page_hash)
+                if journal is not None:
+                    journal.mark_stored(url)
+                return
+            refreshed_pages.add(url)
+        pending_pages[url] = PendingPage(lastmods.get(url), headers, page_hash)
+        if journal is not None:
+            journal.mark_fetched(url, markdown)
+        await emit((url, markdown))
+
+    async def chunk_stage(page, emit):
+        # A page is either fresh markdown or the chunks of a resumed page
+        url, content = page
+        if isinstance(content, str):
+            chunks = build_chunks(url, content)
+            if journal is not None:
+                journal.mark_chunked(url, [asdict(chunk) for chunk in chunks])
+            if url in pending_pages:
+                pending_pages[url].chunk_count = len(chunks)
+                if not chunks:
+                    finished_pages.append((url, pending_pages.pop(url)))
+                    await record_finished_pages()
+        else:
+            chunks = content
+        for chunk in chunks:
+            await emit(chunk)
+
+    def set_summary(chunk: ProcessedChunk, title: str, summary: str):
+        chunk.title = title
+        chunk.summary = summary
+        if journal is not None:
+            journal.record_summary(chunk.url, chunk.chunk_number, title, summary)
+
+    async def dedupe_stage(chunk: ProcessedChunk, emit):
+        if chunk.embedding or chunk.title:  # Enriched before the run was interrupted
+            await emit(chunk)
+            return
+        # A resumed chunk's link is decided again, its canonical chunk may not be in this run
+        linked = chunk.metadata.pop("duplicate_of", None)
+        duplicate = deduper.check((chunk.url, chunk.chunk_number), chunk.content, chunk.metadata.get("chunk_tokens", 0))
+        if duplicate is not None and duplicate.exact:
+            # Searches find the canonical copy, so this one needs no embedding
+            chunk.metadata["duplicate_of"] = {"url": duplicate.canonical[0], "chunk_number": duplicate.canonical[1]}
+            chunk.embedding = None
+        if journal is not None and chunk.metadata.get("duplicate_of") != linked:
+            # Kept with the chunk, so --resume doesn't embed an exact duplicate
+            journal.record_metadata(chunk.url, chunk.chunk_number, chunk.metadata)
+        if duplicate is None:
+            await emit(chunk)
+            return
+        canonical = duplicate.canonical
+        if canonical in summaries:
+            set_summary(chunk, *summaries[canonical])
+            await emit(chunk)
+        elif canonical in failed_canonicals:
+            page_failed(chunk.url)
+        else:
+            waiting_duplicates.setdefault(canonical, []).append(chunk)
+
+    async def summarize_stage(chunk: ProcessedChunk, emit):
+        key = (chunk.url, chunk.chunk_number)
+        if not chunk.title:
+            try:
+                extracted = await summarize_chunk(chunk.content, chunk.url)
+            except Exception:
+                page_failed(chunk.url)
+                # Its duplicates have no title and summary to take either
+                failed_canonicals.add(key)
+                for duplicate in waiting_duplicates.pop(key, []):
+                    page_failed(duplicate.url)
+                raise
+            set_summary(chunk, extracted['title'], extracted['summary'])
+        summaries[key] = (chunk.title, chunk.summary)
+        await emit(chunk)
+        for duplicate in waiting_duplicates.pop(key, []):
+            set_summary(duplicate, chunk.title, chunk.summary)
+            await emit(duplicate)
+
+    async def embed_stage(chunk: ProcessedChunk, emit):
+        if not chunk.embedding and "duplicate_of" not in chunk.metadata:
+            try:
+                chunk.embedding = await get_embedding(chunk.content)
+            except Exception:
+                page_failed(chunk.url)
+                raise
+            if journal is not None:
+                journal.record_embedding(chunk.url, chunk.chunk_number, chunk.embedding)
+        await emit(chunk)
+
+    async def store_stage(chunk: ProcessedChunk, emit):
+        await chunk_writer.add(chunk)
+        await record_finished_pages()
+
+    queue_size = int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+    pipeline = Pipeline(report_interval=float(os.getenv("PIPELINE_REPORT_SECONDS", "10")))
+    pipeline.add_stage("crawl", crawl_stage, scheduler.size, queue_size)
+    pipeline.add_stage("chunk", chunk_stage, int(os.getenv("PIPELINE_CHUNK_WORKERS", "2")), queue_size)
+    pipeline.add_stage("dedupe", dedupe_stage, 1, queue_size)
+    # Like embedding, batched summaries need enough waiting workers to fill a page's batch
+    pipeline.add_stage("summarize", summarize_stage, int(os.getenv("PIPELINE_SUMMARIZE_WORKERS", "32")), queue_size)
+    # Embedding workers mostly wait on the shared batcher, so many are needed to fill batches
+    pipeline.add_stage("embed", embed_stage, int(os.getenv("PIPELINE_EMBED_WORKERS", "64")), queue_size)
+    pipeline.add_stage("store", store_stage, 1, queue_size)
 
     try:
-        # Create a semaphore to limit concurrency
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def process_url(url: str):
-            async with semaphore:
-                result = await crawler.arun(
-                    url=url,
-                    config=crawl_config,
-                    session_id="session1"
-                )
-                if result.success:
-                    print(f"Successfully crawled: {url}")
-                    await process_and_store_document(url, result.markdown_v2.raw_markdown)
-                else:
-                    print(f"Failed: {url} - Error: {result.error_message}")
-        
-        # Process all URLs in parallel with limited concurrency
-        await asyncio.gather(*[process_url(url) for url in urls])
+        # Templates apply to every page, so they are learned before any is crawled
+        await extractor.learn(urls, fetcher.fetch)
+        await pipeline.run(urls)
+
+        # Only left if the run stopped before their canonical chunk was summarized
+        for canonical, waiting in waiting_duplicates.items():
+            for duplicate in waiting:
+                page_failed(duplicate.url)
+        if waiting_duplicates:
+            print(f"Duplicate chunks left unstored: {sum(map(len, waiting_duplicates.values()))}")
+
+        if refreshed_pages:
+            await chunk_writer.flush()
+            detached = await detach_duplicates(refreshed_pages, skip=stored_chunks)
+            print(f"Duplicates of re-crawled chunks given their own embedding: {detached}")
     finally:
-        await crawler.close()
+        await fetcher.close()
+        print(fetcher.report())
+        print(scheduler.report())
+        await http_session.close()
+        await chunk_writer.flush()
+        await record_finished_pages()
+        chunk_writer.on_stored = None
+        if pending_pages:
+            print(f"Pages not fully stored, left for the next run: {len(pending_pages)}")
+        print(f"Pipeline finished:\n{pipeline.report()}")
+        print(chunk_writer.report())
+        print(extractor.report())
+        extractor.close()
+        print(deduper.report())
+        if state is not None:
+            print(f"Unchanged pages skipped: {unchanged} of {len(urls)}")
+        if journal is not None:
+            print(f"Pages resumed from the journal: {resumed} of {len(urls)}")
+            print(journal.report())
+        await summary_batcher.close()
+        print(summary_batcher.report())
+        await embedding_batcher.close()
+        print(embedding_batcher.report())
+        print(openai_client.report())
+        print(enrichment_cache.report())
 
-def get_pydantic_ai_docs_urls() -> List[str]:
-    """Get URLs from Pydantic AI docs sitemap."""
+def get_pydantic_ai_docs_sitemap() -> Dict[str, Optional[str]]:
+    """Get URLs and their <lastmod> dates from Pydantic AI docs sitemap."""
     sitemap_url = "https://ai.pydantic.dev/sitemap.xml"
     try:
         response = requests.get(sitemap_url)
@@ -222,24 +537,95 @@ def get_pydantic_ai_docs_urls() -> List[str]:
         # Parse the XML
         root = ElementTree.fromstring(response.content)
         
-        # Extract all URLs from the sitemap
+        # Extract all URLs and lastmod dates from the sitemap
         namespace = {'ns': 'http://www.sitemaps.org/schemas/sitemap/0.9'}
-        urls = [loc.text for loc in root.findall('.//ns:loc', namespace)]
+        entries = {}
+        for url in root.findall('.//ns:url', namespace):
+            loc = url.find('ns:loc', namespace)
+            lastmod = url.find('ns:lastmod', namespace)
+            if loc is not None and loc.text:
+                entries[loc.text] = lastmod.text if lastmod is not None else None
         
-        return urls
+        return entries
     except Exception as e:
         print(f"Error fetching sitemap: {e}")
-        return []
+        return {}
 
-async def main():
-    # Get URLs from Pydantic AI docs
-    urls = get_pydantic_ai_docs_urls()
-    if not urls:
-        print("No URLs found to crawl")
+def get_pydantic_ai_docs_urls() -> List[str]:
+    """Get URLs from Pydantic AI docs sitemap."""
+    return list(get_pydantic_ai_docs_sitemap())
+
+async def update_vector_index(rebuild: bool):
+    """Build the vector index over the freshly loaded chunks."""
+    try:
+        result = await build_vector_index(repository, rebuild=rebuild)
+    except Exception as e:
+        # The chunks are stored either way, searches just fall back to a scan
+        print(f"Error building vector index: {e}")
         return
-    
-    print(f"Found {len(urls)} URLs to crawl")
-    await crawl_parallel(urls)
+    if result:
+        print(f"Vector index: {result}")
+
+async def main(incremental: bool = False, resume: bool = False):
+    journal = CrawlJournal()
+    try:
+        if resume and journal.urls():
+            # Pick up the interrupted run's URLs rather than today's sitemap
+            urls = journal.urls()
+            sitemap = journal.lastmods()
+            print(f"Resuming crawl of {len(urls)} URLs")
+            print(journal.report())
+        else:
+            if resume:
+                print("Nothing to resume, starting a new crawl")
+            # Get URLs from Pydantic AI docs
+            sitemap = get_pydantic_ai_docs_sitemap()
+            urls = list(sitemap)
+            if not urls:
+                print("No URLs found to crawl")
+                return
+            print(f"Found {len(urls)} URLs to crawl")
+            journal.reset()
+
+        if not incremental:
+            await crawl_parallel(urls, journal=journal)
+            # IVFFlat lists are retrained on the loaded rows; HNSW stays current
+            # through the upserts, so an existing one is kept
+            await update_vector_index(rebuild=VECTOR_INDEX_METHOD == "ivfflat")
+            return
+
+        state = CrawlState()
+        try:
+            await crawl_parallel(urls, state=state, lastmods=sitemap, journal=journal)
+
+            # Remove pages that are no longer in the sitemap
+            removed = state.urls() - set(urls)
+            for url in removed:
+                if await delete_page_chunks(url):
+                    state.delete(url)
+            if removed:
+                detached = await detach_duplicates(removed)
+                print(f"Duplicates of removed chunks given their own embedding: {detached}")
+            # HNSW stays current through inserts, only build it if it's missing
+            await update_vector_index(rebuild=False)
+        finally:
+            state.close()
+    finally:
+        journal.close()
+        enrichment_cache.close()
+        await repository.close()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Crawl the Pydantic AI docs into Supabase.")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only re-process pages that changed since the last run and drop removed pages"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted run from the crawl journal instead of starting over"
+    )
+    args = parser.parse_args()
+    asyncio.run(main(incremental=args.incremental, resume=args.resume))
@@ -0,0 +1,287 @@
+import os
+import copy
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import psutil
+from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig
+from crawl4ai.models import CrawlResult
+
+# Rough resident memory of one open Chromium page
+MEMORY_PER_PAGE = 250 * 1024 * 1024
+
+
+def default_pool_size() -> Tuple[int, int]:
+    """(browsers, pages per browser) sized to the machine's cores and free memory."""
+    cpus = os.cpu_count() or 1
+    pages_for_memory = max(1, psutil.virtual_memory().available // MEMORY_PER_PAGE)
+    pages = max(1, min(cpus * 2, pages_for_memory))
+    browsers = max(1, min(cpus // 2, pages // 4, 4))
+    return browsers, max(1, pages // browsers)
+
+
+@dataclass(order=True)
+class CrawlRequest:
+    priority: int
+    sequence: int
+    url: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    config: Optional[CrawlerRunConfig] = field(default=None, compare=False)
+    # A host slot for a request made outside the browser pool, see `host_slot`
+    slot: bool = field(default=False, compare=False)
+
+
+@dataclass
+class HostState:
+    active: int = 0
+    next_allowed: float = 0.0
+
+
+class CrawlScheduler:
+    """
+    Crawl URLs on a pool of browsers, each running several pages (sessions).
+
+    Every worker owns a distinct session, so concurrent crawls really run in
+    separate tabs. Requests wait in a per-host priority frontier (lower priority
+    value first) and are only started when their host is below
+    `max_per_host` concurrent requests and its `min_interval` since the last
+    request has elapsed, so a single host is never hammered by the whole pool.
+
+    Use `fetch(url)` to crawl one URL, or `crawl(urls, handler)` for a batch.
+    Requests made without the browser (e.g. plain HTTP) hold a `host_slot(url)`,
+    which waits on the same frontier and limits.
+    """
+
+    def __init__(
+        self,
+        browser_config: BrowserConfig,
+        crawl_config: CrawlerRunConfig,
+        browsers: Optional[int] = None,
+        pages_per_browser: Optional[int] = None,
+        max_per_host: Optional[int] = None,
+        requests_per_second_per_host: Optional[float] = None,
+    ):
+        default_browsers, default_pages = default_pool_size()
+        self.browser_config = browser_config
+        self.crawl_config = crawl_config
+        self.browsers = browsers or int(os.getenv("CRAWL_BROWSERS") or default_browsers)
+        self.pages_per_browser = pages_per_browser or int(os.getenv("CRAWL_PAGES_PER_BROWSER") or default_pages)
+        self.max_per_host = max_per_host or int(os.getenv("CRAWL_MAX_PER_HOST") or self.size)
+        rate = requests_per_second_per_host or float(os.getenv("CRAWL_RATE_PER_HOST") or 0)
+        self.min_interval = 1 / rate if rate > 0 else 0.0
+
+        self._crawlers: List[AsyncWebCrawler] = []
+        self._workers: List[asyncio.Task] = []
+        self._frontier: Dict[str, List[CrawlRequest]] = {}
+        self._hosts: Dict[str, HostState] = {}
+        self._sequence = itertools.count()
+        self._changed = asyncio.Event()
+        self._slot_timer: Optional[asyncio.TimerHandle] = None
+        self.pages_crawled = 0
+        self._started_at = 0.0
+
+    @property
+    def size(self) -> int:
+        return self.browsers * self.pages_per_browser
+
+    async def start(self):
+        self._crawlers = [AsyncWebCrawler(config=self.browser_config) for _ in range(self.browsers)]
+        await asyncio.gather(*[crawler.start() for crawler in self._crawlers])
+        self._started_at = time.monotonic()
+        self._workers = [
+            asyncio.create_task(self._worker(crawler, f"pool-{b}-{p}"))
+            for b, crawler in enumerate(self._crawlers)
+            for p in range(self.pages_per_browser)
+        ]
+        print(f"Crawl pool: {self.browsers} browsers x {self.pages_per_browser} pages, "
+              f"max {self.max_per_host} per host")
+
+    async def close(self):
+        if self._slot_timer is not None:
+            self._slot_timer.cancel()
+            self._slot_timer = None
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        await asyncio.gather(*[crawler.close() for crawler in self._crawlers], return_exceptions=True)
+        for heap in self._frontier.values():
+            for request in heap:
+                request.future.cancel()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def fetch(
+        self,
+        url: str,
+        priority: int = 0,
+        config: Optional[CrawlerRunConfig] = None,
+    ) -> Awaitable[CrawlResult]:
+        """
+        Queue a URL on the frontier and return a future for its CrawlResult.
+
+        `config` overrides the scheduler's crawl config for this URL only.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._push(CrawlRequest(priority, next(self._sequence), url, future, config))
+        return future
+
+    @asynccontextmanager
+    async def host_slot(self, url: str, priority: int = 0) -> AsyncIterator[None]:
+        """
+        Hold one of the URL's host slots for a request made outside the browser pool.
+
+        The slot is queued on the frontier like a browser fetch and only granted
+        once the host is below `max_per_host` and its `min_interval` has elapsed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._push(CrawlRequest(priority, next(self._sequence), url, future, slot=True))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted just as the caller was cancelled
+            if future.done() and not future.cancelled():
+                self._release(url)
+            raise
+        try:
+            yield
+        finally:
+            self._release(url)
+
+    def _push(self, request: CrawlRequest):
+        host = urlparse(request.url).netloc
+        heapq.heappush(self._frontier.setdefault(host, []), request)
+        self._hosts.setdefault(host, HostState())
+        self._changed.set()
+        self._grant_slots()
+
+    async def crawl(
+        self,
+        urls: Iterable[str],
+        handler: Callable[[str, CrawlResult], Awaitable[None]],
+        priority: int = 0,
+    ):
+        """
+        Crawl every URL and call `handler(url, result)` as each one finishes.
+
+        A fetch that raises (a browser crash, say) is handed to the handler as a
+        failed CrawlResult, so one page can't cancel the rest of the crawl.
+        """
+        async def crawl_one(url: str):
+            try:
+                result = await self.fetch(url, priority)
+            except Exception as e:
+                result = CrawlResult(url=url, html="", success=False, error_message=f"{type(e).__name__}: {e}")
+            await handler(url, result)
+
+        await asyncio.gather(*[crawl_one(url) for url in urls])
+
+    def _take_ready(self, slots_only: bool = False) -> Tuple[Optional[CrawlRequest], Optional[float]]:
+        """Pop the best request whose host may be crawled now, else how long to wait."""
+        now = time.monotonic()
+        best_host = None
+        wait = None
+        for host, heap in self._frontier.items():
+            if not heap or (slots_only and not heap[0].slot):
+                continue
+            state = self._hosts[host]
+            if state.active >= self.max_per_host:
+                continue
+            if state.next_allowed > now:
+                delay = state.next_allowed - now
+                wait = delay if wait is None else min(wait, delay)
+                continue
+            if best_host is None or heap[0] < self._frontier[best_host][0]:
+                best_host = host
+
+        if best_host is None:
+            return None, wait
+        state = self._hosts[best_host]
+        state.active += 1
+        state.next_allowed = now + self.min_interval
+        return heapq.heappop(self._frontier[best_host]), None
+
+    def _grant(self, request: CrawlRequest):
+        if request.future.cancelled():
+            self._release(request.url)
+        else:
+            request.future.set_result(None)
+
+    def _grant_slots(self):
+        """Grant host slots whose turn has come; browser fetches are left to the workers."""
+        while True:
+            request, wait = self._take_ready(slots_only=True)
+            if request is None:
+                break
+            self._grant(request)
+        if wait is None:
+            return
+        loop = asyncio.get_running_loop()
+        # Keep one timer, for the earliest host that becomes ready
+        if self._slot_timer is not None:
+            if self._slot_timer.when() <= loop.time() + wait:
+                return
+            self._slot_timer.cancel()
+        self._slot_timer = loop.call_later(wait, self._on_slot_timer)
+
+    def _on_slot_timer(self):
+        self._slot_timer = None
+        self._grant_slots()
+
+    async def _next_request(self) -> CrawlRequest:
+        while True:
+            request, wait = self._take_ready()
+            if request is not None:
+                if request.slot:
+                    self._grant(request)
+                    continue
+                if request.future.cancelled():
+                    self._release(request.url)
+                    continue
+                return request
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def _release(self, url: str):
+        self._hosts[urlparse(url).netloc].active -= 1
+        self._changed.set()
+        self._grant_slots()
+
+    async def _worker(self, crawler: AsyncWebCrawler, session_id: str):
+        # Each worker reuses its own page through a dedicated session
+        config = copy.copy(self.crawl_config)
+        config.session_id = session_id
+        while True:
+            request = await self._next_request()
+            request_config = config
+            if request.config is not None:
+                request_config = copy.copy(request.config)
+                request_config.session_id = session_id
+            try:
+                result = await crawler.arun(url=request.url, config=request_config)
+                self.pages_crawled += 1
+                if not request.future.done():
+                    request.future.set_result(result)
+            except Exception as e:
+                if not request.future.done():
+                    request.future.set_exception(e)
+            finally:
+                self._release(request.url)
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0
+        rate = self.pages_crawled / elapsed if elapsed else 0.0
+        return f"Crawled {self.pages_crawled} pages with a pool of {self.size} ({rate:.2f} pages/s)"
@@ -0,0 +1,143 @@
+import os
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Mapping, Optional, Set
+
+import aiohttp
+
+
+@dataclass
+class PageState:
+    url: str
+    lastmod: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    content_hash: Optional[str]
+    crawled_at: str
+
+
+def content_hash(markdown: str) -> str:
+    return hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+
+
+def response_validators(headers: Optional[Mapping[str, str]]) -> Dict[str, str]:
+    """The ETag / Last-Modified of a response, whatever the case of its header names."""
+    by_name = {key.lower(): value for key, value in (headers or {}).items()}
+    return {key: by_name[key.lower()] for key in ("ETag", "Last-Modified") if key.lower() in by_name}
+
+
+class CrawlState:
+    """
+    Local SQLite record of what was stored for each URL on the previous crawl.
+
+    Used by the incremental crawl mode to skip pages whose sitemap `<lastmod>`,
+    HTTP validators (ETag / Last-Modified) or content hash show they have not
+    changed, and to find pages that have disappeared from the sitemap. Validators
+    are checked with a conditional HEAD request, so a page is only downloaded once,
+    by the crawl itself, which records the validators of its own response.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("CRAWL_STATE_PATH", "crawl_state.sqlite3")
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("""
+            create table if not exists pages (
+                url text primary key,
+                lastmod text,
+                etag text,
+                last_modified text,
+                content_hash text,
+                crawled_at text not null
+            )
+        """)
+        self._db.commit()
+
+    def get(self, url: str) -> Optional[PageState]:
+        row = self._db.execute(
+            "select url, lastmod, etag, last_modified, content_hash, crawled_at from pages where url = ?",
+            (url,)
+        ).fetchone()
+        return PageState(*row) if row else None
+
+    def urls(self) -> Set[str]:
+        return {row[0] for row in self._db.execute("select url from pages")}
+
+    def record(
+        self,
+        url: str,
+        lastmod: Optional[str],
+        headers: Dict[str, str],
+        content_hash: Optional[str],
+    ):
+        """Remember the validators and content hash of a successfully stored page."""
+        self._db.execute(
+            "insert or replace into pages (url, lastmod, etag, last_modified, content_hash, crawled_at) "
+            "values (?, ?, ?, ?, ?, ?)",
+            (
+                url,
+                lastmod,
+                headers.get("ETag"),
+                headers.get("Last-Modified"),
+                content_hash,
+                datetime.now(timezone.utc).isoformat(),
+            )
+        )
+        self._db.commit()
+
+    def delete(self, url: str):
+        self._db.execute("delete from pages where url = ?", (url,))
+        self._db.commit()
+
+    async def check_for_changes(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        lastmod: Optional[str],
+    ) -> Optional[Dict[str, str]]:
+        """
+        Decide whether a URL needs to be re-crawled.
+
+        Returns None if the page is known to be unchanged, otherwise the response
+        validators (ETag / Last-Modified) known so far; the crawl's own response
+        headers are recorded over them once the page has been stored.
+        """
+        previous = self.get(url)
+        if previous is None:
+            # Nothing to compare with, the crawl fetches it anyway
+            return {}
+
+        # The sitemap already tells us nothing changed, no request needed
+        if lastmod and previous.lastmod == lastmod and previous.content_hash:
+            return None
+
+        conditional_headers = {}
+        if previous.etag:
+            conditional_headers["If-None-Match"] = previous.etag
+        if previous.last_modified:
+            conditional_headers["If-Modified-Since"] = previous.last_modified
+        if not conditional_headers:
+            return {}
+
+        return await self._fetch_validators(session, url, conditional_headers)
+
+    async def _fetch_validators(
+        self,
+        session: aiohttp.ClientSession,
+        url: str,
+        request_headers: Dict[str, str],
+    ) -> Optional[Dict[str, str]]:
+        try:
+            # HEAD, so a changed page isn't downloaded here and again by the crawl
+            async with session.head(url, headers=request_headers, allow_redirects=True) as response:
+                if response.status == 304:
+                    return None
+                return response_validators(response.headers)
+        except Exception as e:
+            # Can't tell, so crawl it anyway
+            print(f"Conditional request failed for {url}: {e}")
+            return {}
+
+    def close(self):
+        self._db.close()
@@ -0,0 +1,142 @@
+import os
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+from markdown_chunker import count_tokens
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_DIMENSIONS = 1536
+
+
+@dataclass
+class BatcherStats:
+    """Counters used to tune the batch size and flush deadline."""
+    batches: int = 0
+    inputs: int = 0
+    tokens: int = 0
+    errors: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def batches_per_sec(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.batches / elapsed if elapsed > 0 else 0.0
+
+    def mean_fill(self, max_inputs: int) -> float:
+        """Average fraction of `max_inputs` used per batch."""
+        if not self.batches:
+            return 0.0
+        return self.inputs / (self.batches * max_inputs)
+
+    def report(self, max_inputs: int) -> str:
+        return (
+            f"Embedding batches: {self.batches} ({self.batches_per_sec():.2f}/s), "
+            f"inputs: {self.inputs}, tokens: {self.tokens}, "
+            f"mean fill: {self.mean_fill(max_inputs):.1%}, errors: {self.errors}"
+        )
+
+
+class EmbeddingBatcher:
+    """
+    Coalesce single-text embedding requests into batched `embeddings.create` calls.
+
+    Callers await `embed(text)` as if it were a single request. Texts are queued
+    until the batch reaches `max_inputs` inputs or `max_tokens` tokens, or until
+    `flush_interval` seconds have passed since the first queued text, whichever
+    comes first. Each caller then gets back its own vector, or the exception
+    that failed its batch.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        model: str = EMBEDDING_MODEL,
+        max_inputs: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.client = client
+        self.model = model
+        self.max_inputs = max_inputs or int(os.getenv("EMBEDDING_BATCH_MAX_INPUTS", "256"))
+        self.max_tokens = max_tokens or int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "200000"))
+        self.flush_interval = flush_interval or float(os.getenv("EMBEDDING_BATCH_FLUSH_SECONDS", "0.02"))
+        self.stats = BatcherStats()
+
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._pending_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue a text for embedding and wait for its vector."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        tokens = count_tokens(text)
+
+        # Flush first if this text would push the batch over its token budget
+        if self._pending and self._pending_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        self._pending.append((text, tokens, future))
+        self._pending_tokens += tokens
+
+        if len(self._pending) >= self.max_inputs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.flush_interval, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send everything queued so far as one request."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, []
+        batch_tokens, self._pending_tokens = self._pending_tokens, 0
+
+        task = asyncio.ensure_future(self._send(batch, batch_tokens))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[str, int, asyncio.Future]], batch_tokens: int):
+        if not self.stats.batches:
+            self.stats.started_at = time.monotonic()  # Measure throughput from the first batch
+        self.stats.batches += 1
+        self.stats.inputs += len(batch)
+        self.stats.tokens += batch_tokens
+        try:
+            response = await self.client.embeddings.create(
+                model=self.model,
+                input=[text for text, _, _ in batch]
+            )
+            # The API returns one item per input, tagged with its input index
+            vectors = {item.index: item.embedding for item in response.data}
+            for i, (_, _, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if i in vectors:
+                    future.set_result(vectors[i])
+                else:
+                    future.set_exception(ValueError(f"No embedding returned for input {i}"))
+        except Exception as e:
+            print(f"Error getting embeddings for batch of {len(batch)}: {e}")
+            self.stats.errors += 1
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    async def close(self):
+        """Flush whatever is still queued and wait for in-flight requests."""
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def report(self) -> str:
+        return self.stats.report(self.max_inputs)
@@ -0,0 +1,139 @@
+import os
+import json
+import time
+import array
+import sqlite3
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def report(self, name: str) -> str:
+        return (
+            f"{name} cache: {self.hits} hits, {self.misses} misses "
+            f"({self.hit_rate():.1%} hit rate)"
+        )
+
+
+class EnrichmentCache:
+    """
+    Persistent SQLite cache for chunk summaries and embeddings.
+
+    Entries are keyed by a SHA-256 of the model name and the exact input text, so an
+    unchanged chunk is never re-summarized or re-embedded across crawl runs. The
+    total stored size is bounded by `max_bytes`; once it is exceeded the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.path = path or os.getenv("ENRICHMENT_CACHE_PATH", "enrichment_cache.sqlite3")
+        self.max_bytes = max_bytes or int(os.getenv("ENRICHMENT_CACHE_MAX_MB", "1024")) * 1024 * 1024
+        self.summary_stats = CacheStats()
+        self.embedding_stats = CacheStats()
+        self.evictions = 0
+
+        self._db = sqlite3.connect(self.path)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("""
+            create table if not exists cache (
+                key text primary key,
+                value blob not null,
+                size integer not null,
+                last_used real not null
+            )
+        """)
+        self._db.execute("create index if not exists idx_cache_last_used on cache (last_used)")
+        self._db.commit()
+        self._total_bytes = self._db.execute("select coalesce(sum(size), 0) from cache").fetchone()[0]
+        self._touched: Dict[str, float] = {}
+
+    @staticmethod
+    def make_key(kind: str, model: str, text: str) -> str:
+        return hashlib.sha256(f"{kind}\0{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._db.execute("select value from cache where key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        # Hits are on the hot path of re-crawling an unchanged site, so their
+        # last_used updates are kept in memory and written with the next put
+        self._touched[key] = time.time()
+        return row[0]
+
+    def _write_touched(self):
+        if self._touched:
+            self._db.executemany(
+                "update cache set last_used = ? where key = ?",
+                [(last_used, key) for key, last_used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _put(self, key: str, value: bytes):
+        self._write_touched()
+        old = self._db.execute("select size from cache where key = ?", (key,)).fetchone()
+        self._db.execute(
+            "insert or replace into cache (key, value, size, last_used) values (?, ?, ?, ?)",
+            (key, value, len(value), time.time())
+        )
+        self._total_bytes += len(value) - (old[0] if old else 0)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+        self._db.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is 90% full."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute("select key, size from cache order by last_used").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._db.executemany("delete from cache where key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def get_summary(self, model: str, text: str) -> Optional[Dict[str, str]]:
+        value = self._get(self.make_key("summary", model, text))
+        if value is None:
+            self.summary_stats.misses += 1
+            return None
+        self.summary_stats.hits += 1
+        return json.loads(value)
+
+    def put_summary(self, model: str, text: str, summary: Dict[str, Any]):
+        self._put(self.make_key("summary", model, text), json.dumps(summary).encode("utf-8"))
+
+    def get_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        value = self._get(self.make_key("embedding", model, text))
+        if value is None:
+            self.embedding_stats.misses += 1
+            return None
+        self.embedding_stats.hits += 1
+        return array.array("f", value).tolist()
+
+    def put_embedding(self, model: str, text: str, embedding: List[float]):
+        # Stored as packed float32, about a fifth of the size of the JSON form
+        self._put(self.make_key("embedding", model, text), array.array("f", embedding).tobytes())
+
+    def report(self) -> str:
+        return "\n".join([
+            self.summary_stats.report("Summary"),
+            self.embedding_stats.report("Embedding"),
+            f"Cache size: {self._total_bytes / (1024 * 1024):.1f} MB of {self.max_bytes / (1024 * 1024):.0f} MB, "
+            f"{self.evictions} evictions",
+        ])
+
+    def close(self):
+        self._write_touched()
+        self._db.commit()
+        self._db.close()
@@ -0,0 +1,239 @@
+import os
+import re
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import aiohttp
+from crawl4ai import CrawlerRunConfig
+from crawl4ai.content_scraping_strategy import WebScrapingStrategy
+from crawl4ai.markdown_generation_strategy import DefaultMarkdownGenerator
+from crawl4ai.models import CrawlResult
+
+from crawl_scheduler import CrawlScheduler
+
+# Empty mount points of client-rendered apps (React, Vue, Next, Nuxt, Svelte, Angular)
+SPA_ROOT_RE = re.compile(
+    r'<(?:div|main)[^>]*\bid=["\'](?:root|app|__next|__nuxt|svelte)["\'][^>]*>\s*</(?:div|main)>'
+    r'|<app-root[^>]*>\s*</app-root>',
+    re.IGNORECASE
+)
+NOSCRIPT_RE = re.compile(r"<noscript[^>]*>(.*?)</noscript>", re.IGNORECASE | re.DOTALL)
+JS_REQUIRED_RE = re.compile(r"(enable|requires?|turn on)\s+javascript", re.IGNORECASE)
+
+
+def needs_javascript(html: str) -> Optional[str]:
+    """Why a page looks like it must be rendered in a browser, or None if it looks static."""
+    if SPA_ROOT_RE.search(html):
+        return "spa_root"
+    for noscript in NOSCRIPT_RE.findall(html):
+        if JS_REQUIRED_RE.search(noscript):
+            return "noscript"
+    return None
+
+
+@dataclass
+class PathStats:
+    pages: int = 0
+    seconds: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+
+    def add(self, seconds: float):
+        self.pages += 1
+        self.seconds += seconds
+        self.latencies.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def report(self, name: str) -> str:
+        mean = self.seconds / self.pages if self.pages else 0.0
+        return (
+            f"{name}: {self.pages} pages, mean {mean * 1000:.0f} ms, "
+            f"p50 {self.percentile(0.5) * 1000:.0f} ms, p95 {self.percentile(0.95) * 1000:.0f} ms"
+        )
+
+
+class HybridFetcher:
+    """
+    Fetch pages over plain HTTP when possible, falling back to the browser pool.
+
+    Each URL is first fetched with a pooled aiohttp GET and converted to markdown
+    with crawl4ai's own scraping and markdown generation, so results match what
+    the browser would produce for static HTML. Pages that fail, aren't HTML, look
+    client-rendered (empty SPA mount points, "enable JavaScript" noscript
+    notices) or yield less than `min_markdown_chars` of markdown are escalated to
+    the CrawlScheduler; client errors other than 403 (which may be a bot check a
+    browser passes) are returned as failures. Every HTTP request holds one of the
+    scheduler's host slots, so it is subject to the same per-host concurrency and
+    rate limits as browser crawls. The browser pool is only started once the
+    first page needs it.
+    Set CRAWL_FAST_PATH=false to always use the browser.
+    """
+
+    def __init__(
+        self,
+        scheduler: CrawlScheduler,
+        crawl_config: CrawlerRunConfig,
+        enabled: Optional[bool] = None,
+        min_markdown_chars: Optional[int] = None,
+        timeout: float = 30,
+    ):
+        self.scheduler = scheduler
+        self.crawl_config = crawl_config
+        self.enabled = enabled if enabled is not None else os.getenv("CRAWL_FAST_PATH", "true").lower() != "false"
+        self.min_markdown_chars = min_markdown_chars or int(os.getenv("FAST_PATH_MIN_MARKDOWN_CHARS", "200"))
+        self.timeout = timeout
+        self.fast = PathStats()
+        self.browser = PathStats()
+        self.escalations: Dict[str, int] = {}
+        self.http_errors: Dict[str, int] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._browser_started = False
+        self._browser_lock = asyncio.Lock()
+        self._scraper = WebScrapingStrategy()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=self.scheduler.max_per_host)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={"User-Agent": self.scheduler.browser_config.user_agent},
+            )
+        return self._session
+
+    async def _browser_fetch(self, url: str, priority: int, config: Optional[CrawlerRunConfig]) -> CrawlResult:
+        async with self._browser_lock:
+            if not self._browser_started:
+                await self.scheduler.start()
+                self._browser_started = True
+        return await self.scheduler.fetch(url, priority, config)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        if self._browser_started:
+            await self.scheduler.close()
+            self._browser_started = False
+
+    def _escalate(self, reason: str):
+        self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def _to_result(
+        self,
+        url: str,
+        html: str,
+        status: int,
+        headers: Dict[str, str],
+        config: CrawlerRunConfig,
+    ) -> CrawlResult:
+        """Same scraping and markdown generation crawl4ai applies to browser-rendered HTML."""
+        params = {k: v for k, v in config.to_dict().items() if k != "url"}
+        scraped = self._scraper.scrap(url, html, **params)
+        markdown_generator = config.markdown_generator or DefaultMarkdownGenerator()
+        markdown = markdown_generator.generate_markdown(
+            cleaned_html=scraped.get("cleaned_html", ""),
+            base_url=url,
+        )
+        return CrawlResult(
+            url=url,
+            html=html,
+            success=True,
+            cleaned_html=scraped.get("cleaned_html"),
+            media=scraped.get("media", {}),
+            links=scraped.get("links", {}),
+            markdown=markdown.raw_markdown,
+            markdown_v2=markdown,
+            metadata=scraped.get("metadata", {}),
+            response_headers=headers,
+            status_code=status,
+        )
+
+    async def _fetch_static(self, url: str, priority: int, config: CrawlerRunConfig) -> Optional[CrawlResult]:
+        """The page fetched over HTTP, or None if it has to go through the browser."""
+        try:
+            async with self.scheduler.host_slot(url, priority):
+                async with self._get_session().get(url, allow_redirects=True) as response:
+                    if 400 <= response.status < 500 and response.status != 403:
+                        # The browser would get the same answer
+                        reason = f"http_{response.status}"
+                        self.http_errors[reason] = self.http_errors.get(reason, 0) + 1
+                        return CrawlResult(
+                            url=url,
+                            html="",
+                            success=False,
+                            status_code=response.status,
+                            error_message=f"HTTP {response.status}",
+                        )
+                    if response.status != 200:
+                        self._escalate(f"http_{response.status}")
+                        return None
+                    if "html" not in response.headers.get("Content-Type", "text/html"):
+                        self._escalate("not_html")
+                        return None
+                    html = await response.text(errors="replace")
+                    headers = dict(response.headers)
+        except Exception:
+            self._escalate("request_failed")
+            return None
+
+        reason = needs_javascript(html)
+        if reason:
+            self._escalate(reason)
+            return None
+
+        try:
+            # Scraping and markdown conversion are CPU bound, keep them off the event loop
+            result = await asyncio.to_thread(self._to_result, url, html, 200, headers, config)
+        except Exception:
+            self._escalate("conversion_failed")
+            return None
+        if len(result.markdown_v2.raw_markdown.strip()) < self.min_markdown_chars:
+            # Almost nothing in the served HTML, the content is probably rendered by scripts
+            self._escalate("empty_body")
+            return None
+        return result
+
+    async def fetch(
+        self,
+        url: str,
+        priority: int = 0,
+        config: Optional[CrawlerRunConfig] = None,
+    ) -> CrawlResult:
+        """Crawl a URL, with `config` overriding the crawl config for this URL only."""
+        if self.enabled:
+            start = time.perf_counter()
+            result = await self._fetch_static(url, priority, config or self.crawl_config)
+            if result is not None:
+                self.fast.add(time.perf_counter() - start)
+                return result
+
+        start = time.perf_counter()
+        result = await self._browser_fetch(url, priority, config)
+        self.browser.add(time.perf_counter() - start)
+        return result
+
+    def fast_path_fraction(self) -> float:
+        total = self.fast.pages + self.browser.pages
+        return self.fast.pages / total if total else 0.0
+
+    def report(self) -> str:
+        lines = [
+            f"Fast path served {self.fast.pages} of {self.fast.pages + self.browser.pages} pages "
+            f"({self.fast_path_fraction():.1%})",
+            self.fast.report("HTTP fast path"),
+            self.browser.report("Browser"),
+        ]
+        if self.escalations:
+            reasons = ", ".join(f"{reason} {count}" for reason, count in sorted(self.escalations.items()))
+            lines.append(f"Escalated to the browser: {reasons}")
+        if self.http_errors:
+            errors = ", ".join(f"{reason} {count}" for reason, count in sorted(self.http_errors.items()))
+            lines.append(f"Failed over HTTP: {errors}")
+        return "\n".join(lines)
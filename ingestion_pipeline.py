@@ -0,0 +1,115 @@
+import time
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+
+# A stage handler receives one item and an `emit` coroutine that hands results to
+# the next stage. `emit` blocks while the next queue is full, which is what
+# throttles a fast stage behind a slow one.
+Emit = Callable[[Any], Awaitable[None]]
+Handler = Callable[[Any, Emit], Awaitable[None]]
+
+
+@dataclass
+class StageStats:
+    processed: int = 0
+    errors: int = 0
+    busy_workers: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+class Stage:
+    def __init__(self, name: str, handler: Handler, workers: int, queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = StageStats()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, emit: Emit):
+        self.stats.started_at = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker(emit)) for _ in range(self.workers)]
+
+    async def _worker(self, emit: Emit):
+        while True:
+            item = await self.queue.get()
+            self.stats.busy_workers += 1
+            try:
+                await self.handler(item, emit)
+                self.stats.processed += 1
+            except Exception as e:
+                self.stats.errors += 1
+                print(f"Error in {self.name} stage: {e}")
+            finally:
+                self.stats.busy_workers -= 1
+                self.queue.task_done()
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def status(self) -> str:
+        return (
+            f"{self.name}: queue {self.queue.qsize()}/{self.queue.maxsize}, "
+            f"busy {self.stats.busy_workers}/{self.workers}, "
+            f"done {self.stats.processed} ({self.stats.throughput():.1f}/s), errors {self.stats.errors}"
+        )
+
+
+class Pipeline:
+    """
+    Chain of stages connected by bounded queues, each with its own worker pool.
+
+    Items fed into the pipeline go through every stage in order. Because every
+    queue is bounded, a slow stage fills its input queue and blocks the stage
+    before it, so memory and in-flight API calls stay bounded no matter how much
+    work the first stage produces. Per-stage queue depth, busy workers and
+    throughput are printed every `report_interval` seconds.
+    """
+
+    def __init__(self, report_interval: Optional[float] = 10.0):
+        self.stages: List[Stage] = []
+        self.report_interval = report_interval
+
+    def add_stage(self, name: str, handler: Handler, workers: int = 1, queue_size: int = 100) -> "Pipeline":
+        self.stages.append(Stage(name, handler, workers, queue_size))
+        return self
+
+    def report(self) -> str:
+        return "\n".join(stage.status() for stage in self.stages)
+
+    async def _report_periodically(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            print(f"Pipeline status:\n{self.report()}")
+
+    async def run(self, items: Iterable[Any]):
+        """Feed `items` to the first stage and wait until every stage has drained."""
+        async def discard(_item):
+            pass
+
+        for i, stage in enumerate(self.stages):
+            next_stage = self.stages[i + 1] if i + 1 < len(self.stages) else None
+            stage.start(next_stage.queue.put if next_stage else discard)
+
+        reporter = asyncio.create_task(self._report_periodically()) if self.report_interval else None
+        try:
+            for item in items:
+                await self.stages[0].queue.put(item)
+
+            # Once a stage's queue is drained, everything it will ever emit is
+            # already queued in the next stage, so stages can be shut down in order
+            for stage in self.stages:
+                await stage.queue.join()
+                await stage.stop()
+        finally:
+            for stage in self.stages:
+                await stage.stop()
+            if reporter is not None:
+                reporter.cancel()
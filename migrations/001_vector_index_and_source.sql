@@ -0,0 +1,198 @@
+-- Upgrade a site_pages table created by an earlier site_pages.sql: full-text search
+-- column, dedicated source column, tunable match_site_pages and an index built over
+-- the loaded rows. Run it once in the SQL editor; new setups only need site_pages.sql.
+
+alter table site_pages add column if not exists fts tsvector generated always as (
+  to_tsvector('english', coalesce(title, '') || ' ' || coalesce(summary, '') || ' ' || content)
+) stored;
+create index if not exists idx_site_pages_fts on site_pages using gin (fts);
+
+alter table site_pages add column if not exists source varchar
+  generated always as (metadata->>'source') stored;
+create index if not exists idx_site_pages_source on site_pages (source);
+
+-- The old signature would make RPC calls ambiguous
+drop function if exists match_site_pages(vector, int, jsonb);
+drop function if exists hybrid_match_site_pages(text, vector, int, jsonb, int, int);
+drop function if exists build_site_pages_vector_index(text, int, int, int, boolean);
+
+-- ef_search (HNSW) and probes (IVFFlat) widen the index search for this call only:
+-- slower, but closer to an exact search. ef_search should be at least match_count.
+-- Anyone can call this, so both are clamped (ef_search to 1..400, probes to 1..100)
+-- to keep one request from scanning most of the index.
+create function match_site_pages (
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb DEFAULT '{}'::jsonb,
+  ef_search int default null,
+  probes int default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', least(greatest(ef_search, 1), 400)::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', least(greatest(probes, 1), 100)::text, true);
+  end if;
+
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    title,
+    summary,
+    content,
+    metadata,
+    1 - (site_pages.embedding <=> query_embedding) as similarity
+  from site_pages
+  where (filter->>'source' is null or site_pages.source = filter->>'source')
+    and metadata @> (filter - 'source')
+    and site_pages.embedding is not null  -- Duplicate chunks are stored without one
+  order by site_pages.embedding <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+-- Hybrid search: vector and full-text candidates fused with reciprocal rank fusion.
+-- Each row scores sum(1 / (rrf_k + rank)) over the rankings it appears in.
+create function hybrid_match_site_pages (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  candidate_count int default 50,
+  rrf_k int default 60
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language sql
+as $$
+  with semantic as (
+    select
+      site_pages.id,
+      row_number() over (order by site_pages.embedding <=> query_embedding) as rank
+    from site_pages
+    where (filter->>'source' is null or site_pages.source = filter->>'source')
+      and site_pages.metadata @> (filter - 'source')
+      and site_pages.embedding is not null
+    order by site_pages.embedding <=> query_embedding
+    limit candidate_count
+  ),
+  keyword as (
+    select
+      site_pages.id,
+      row_number() over (
+        order by ts_rank_cd(site_pages.fts, websearch_to_tsquery('english', query_text)) desc
+      ) as rank
+    from site_pages
+    where (filter->>'source' is null or site_pages.source = filter->>'source')
+      and site_pages.metadata @> (filter - 'source')
+      and site_pages.embedding is not null
+      and site_pages.fts @@ websearch_to_tsquery('english', query_text)
+    order by ts_rank_cd(site_pages.fts, websearch_to_tsquery('english', query_text)) desc
+    limit candidate_count
+  ),
+  fused as (
+    select
+      coalesce(semantic.id, keyword.id) as id,
+      coalesce(1.0 / (rrf_k + semantic.rank), 0.0) + coalesce(1.0 / (rrf_k + keyword.rank), 0.0) as score
+    from semantic
+    full outer join keyword on semantic.id = keyword.id
+  )
+  select
+    site_pages.id,
+    site_pages.url,
+    site_pages.chunk_number,
+    site_pages.title,
+    site_pages.summary,
+    site_pages.content,
+    site_pages.metadata,
+    fused.score as similarity
+  from fused
+  join site_pages on site_pages.id = fused.id
+  order by fused.score desc
+  limit match_count;
+$$;
+
+-- Build (or rebuild) the vector similarity index. Run it after bulk loading: IVFFlat
+-- trains its lists on the rows present at build time, and HNSW builds much faster
+-- over a loaded table than through one insert at a time. With rebuild = false an
+-- existing index is kept. A rebuild builds the new index under a temporary name
+-- while searches keep using the old one (writes wait), then swaps it in, so the
+-- exclusive lock is only held for the drop and rename. The call still runs under
+-- PostgREST's statement timeout: for large tables build the index from psql with
+-- create index concurrently instead.
+create function build_site_pages_vector_index (
+  method text default 'hnsw',
+  m int default 16,
+  ef_construction int default 64,
+  lists int default null,
+  rebuild boolean default true
+) returns text
+language plpgsql
+as $$
+declare
+  row_count bigint;
+begin
+  if not rebuild and to_regclass('idx_site_pages_embedding') is not null then
+    return 'kept existing vector index';
+  end if;
+
+  -- Left behind by a build that failed or timed out
+  drop index if exists idx_site_pages_embedding_new;
+  select count(*) into row_count from site_pages where embedding is not null;
+
+  if method = 'hnsw' then
+    execute format(
+      'create index idx_site_pages_embedding_new on site_pages '
+      'using hnsw (embedding vector_cosine_ops) with (m = %s, ef_construction = %s)',
+      m, ef_construction
+    );
+  elsif method = 'ivfflat' then
+    -- pgvector's guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond that
+    lists := coalesce(lists, greatest(
+      case when row_count > 1000000 then sqrt(row_count)::int else (row_count / 1000)::int end,
+      1
+    ));
+    execute format(
+      'create index idx_site_pages_embedding_new on site_pages '
+      'using ivfflat (embedding vector_cosine_ops) with (lists = %s)',
+      lists
+    );
+  else
+    raise exception 'Unknown vector index method: %', method;
+  end if;
+
+  drop index if exists idx_site_pages_embedding;
+  alter index idx_site_pages_embedding_new rename to idx_site_pages_embedding;
+
+  analyze site_pages;
+  return format('built %s vector index over %s rows', method, row_count);
+end;
+$$;
+
+revoke execute on function build_site_pages_vector_index from public, anon, authenticated;
+
+-- Replace the ivfflat index created on the empty table, whose lists were never trained
+drop index if exists site_pages_embedding_idx;
+select build_site_pages_vector_index('hnsw');
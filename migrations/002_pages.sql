@@ -0,0 +1,99 @@
+-- Add the pages table and the triggers that maintain it to a database set up with
+-- an earlier site_pages.sql, and fill it from the chunks already stored.
+
+-- One row per crawled page, kept up to date by triggers on site_pages so listing
+-- pages doesn't scan every chunk
+create table pages (
+    url varchar primary key,
+    source varchar,
+    title varchar not null,
+    chunk_count integer not null,
+    content_hash text not null,  -- md5 of the page's chunk contents in order
+    last_crawled timestamp with time zone not null,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index idx_pages_source on pages (source);
+
+-- Recompute the pages rows of the given URLs from their chunks
+create function refresh_pages (page_urls varchar[]) returns void
+language sql
+as $$
+  delete from pages
+  where pages.url = any(page_urls)
+    and not exists (select 1 from site_pages where site_pages.url = pages.url);
+
+  insert into pages (url, source, title, chunk_count, content_hash, last_crawled, updated_at)
+  select
+    site_pages.url,
+    max(site_pages.source),
+    -- The first chunk's title, without the section part
+    split_part((array_agg(site_pages.title order by site_pages.chunk_number))[1], ' - ', 1),
+    count(*),
+    md5(string_agg(site_pages.content, '' order by site_pages.chunk_number)),
+    timezone('utc'::text, now()),
+    timezone('utc'::text, now())
+  from site_pages
+  where site_pages.url = any(page_urls)
+  group by site_pages.url
+  on conflict (url) do update set
+    source = excluded.source,
+    title = excluded.title,
+    chunk_count = excluded.chunk_count,
+    content_hash = excluded.content_hash,
+    last_crawled = excluded.last_crawled,
+    updated_at = excluded.updated_at;
+$$;
+
+create function refresh_pages_after_insert() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select distinct url from new_rows));
+  return null;
+end;
+$$;
+
+create function refresh_pages_after_update() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select url from new_rows union select url from old_rows));
+  return null;
+end;
+$$;
+
+create function refresh_pages_after_delete() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select distinct url from old_rows));
+  return null;
+end;
+$$;
+
+-- Statement-level, so a batch upsert refreshes each of its pages once
+create trigger site_pages_refresh_pages_insert
+  after insert on site_pages
+  referencing new table as new_rows
+  for each statement execute function refresh_pages_after_insert();
+
+create trigger site_pages_refresh_pages_update
+  after update on site_pages
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function refresh_pages_after_update();
+
+create trigger site_pages_refresh_pages_delete
+  after delete on site_pages
+  referencing old table as old_rows
+  for each statement execute function refresh_pages_after_delete();
+
+select refresh_pages(array(select distinct url from site_pages));
+
+alter table pages enable row level security;
+
+create policy "Allow public read access"
+  on pages
+  for select
+  to public
+  using (true);
@@ -10,8 +10,14 @@ import os
 from pydantic_ai import Agent, ModelRetry, RunContext
 from pydantic_ai.models.openai import OpenAIModel
 from openai import AsyncOpenAI
-from supabase import Client
-from typing import List
+from typing import List, Optional
+
+from repository import Repository
+from retrieval_backends import RetrievalBackend, get_retrieval_backend
+from query_cache import QueryCache
+from reranker import get_reranker
+from context_assembler import ContextAssembler
+from page_index import PageIndex
 
 load_dotenv()
 
@@ -20,10 +26,29 @@ model = OpenAIModel(llm)
 
 logfire.configure(send_to_logfire='if-token-present')
 
+embedding_model = "text-embedding-3-small"
+
+# "hybrid" fuses full-text and vector search, "vector" uses embeddings only
+retrieval_mode = os.getenv('RETRIEVAL_MODE', 'hybrid')
+
+# With RERANK=cross-encoder the tool over-fetches candidates and reranks them
+rerank_candidates = int(os.getenv('RERANK_CANDIDATES', '30'))
+
+# Keeps every tool result within CONTEXT_MAX_TOKENS
+context_assembler = ContextAssembler()
+
+# Shared copy of the pages table, refreshed when a crawl changes it
+page_index = PageIndex('pydantic_ai_docs')
+
+# Shared across conversations, agents often repeat the same query
+query_cache = QueryCache()
+
 @dataclass
 class PydanticAIDeps:
-    supabase: Client
+    repository: Repository
     openai_client: AsyncOpenAI
+    # Defaults to the backend selected by RETRIEVAL_BACKEND
+    retriever: Optional[RetrievalBackend] = None
 
 system_prompt = """
 You are an expert at Pydantic AI - a Python AI agent framework that you have access to all the documentation to,
@@ -47,16 +72,19 @@ pydantic_ai_expert = Agent(
 )
 
 async def get_embedding(text: str, openai_client: AsyncOpenAI) -> List[float]:
-    """Get embedding vector from OpenAI."""
-    try:
-        response = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=text
-        )
-        return response.data[0].embedding
-    except Exception as e:
-        print(f"Error getting embedding: {e}")
-        return [0] * 1536  # Return zero vector on error
+    """Get embedding vector from OpenAI, reusing cached embeddings of the same query."""
+    cached = query_cache.get_embedding(embedding_model, text)
+    if cached is not None:
+        return cached
+
+    # Errors propagate to the tool, a zero vector would just match arbitrary chunks
+    response = await openai_client.embeddings.create(
+        model=embedding_model,
+        input=text
+    )
+    embedding = response.data[0].embedding
+    query_cache.put_embedding(embedding_model, text, embedding)
+    return embedding
 
 @pydantic_ai_expert.tool
 async def retrieve_relevant_documentation(ctx: RunContext[PydanticAIDeps], user_query: str) -> str:
@@ -64,41 +92,56 @@ async def retrieve_relevant_documentation(ctx: RunContext[PydanticAIDeps], user_
     Retrieve relevant documentation chunks based on the query with RAG.
     
     Args:
-        ctx: The context including the Supabase client and OpenAI client
+        ctx: The context including the repository and OpenAI client
         user_query: The user's question or query
         
     Returns:
-        A formatted string containing the top 5 most relevant documentation chunks
+        A formatted string with the most relevant documentation chunks, the best in
+        full and the others as summaries with their page URL
     """
     try:
         # Get the embedding for the query
         query_embedding = await get_embedding(user_query, ctx.deps.openai_client)
         
-        # Query Supabase for relevant documents
-        result = ctx.deps.supabase.rpc(
-            'match_site_pages',
-            {
-                'query_embedding': query_embedding,
-                'match_count': 5,
-                'filter': {'source': 'pydantic_ai_docs'}
-            }
-        ).execute()
+        reranker = get_reranker()
+        match_count = rerank_candidates if reranker else 5
+        match_filter = {'source': 'pydantic_ai_docs'}
+        query_text = user_query if retrieval_mode == 'hybrid' else None
+        cache_key = query_cache.result_key(query_embedding, match_count, match_filter, query_text)
+        cached = query_cache.get_result(cache_key)
+        if cached is not None:
+            return cached
+
+        # Query the retrieval backend for relevant documents
+        retriever = ctx.deps.retriever or get_retrieval_backend(ctx.deps.repository)
+        if query_text is not None:
+            matches = await retriever.hybrid_match(
+                query_text,
+                query_embedding,
+                match_count=match_count,
+                filter=match_filter
+            )
+        else:
+            matches = await retriever.match(
+                query_embedding,
+                match_count=match_count,
+                filter=match_filter
+            )
         
-        if not result.data:
+        if not matches:
             return "No relevant documentation found."
             
-        # Format the results
-        formatted_chunks = []
-        for doc in result.data:
-            chunk_text = f"""
-# {doc['title']}
-
-{doc['content']}
-"""
-            formatted_chunks.append(chunk_text)
-            
-        # Join all chunks with a separator
-        return "\n\n---\n\n".join(formatted_chunks)
+        if reranker:
+            try:
+                matches = await reranker.rerank(user_query, matches)
+            except Exception as e:
+                # e.g. onnxruntime not installed or the model can't be downloaded
+                print(f"Error reranking documentation, keeping retrieval order: {e}")
+
+        # Best hits in full, the rest as summaries, within the token budget
+        formatted = context_assembler.documentation(matches)
+        query_cache.put_result(cache_key, formatted)
+        return formatted
         
     except Exception as e:
         print(f"Error retrieving documentation: {e}")
@@ -113,18 +156,8 @@ async def list_documentation_pages(ctx: RunContext[PydanticAIDeps]) -> List[str]
         List[str]: List of unique URLs for all documentation pages
     """
     try:
-        # Query Supabase for unique URLs where source is pydantic_ai_docs
-        result = ctx.deps.supabase.from_('site_pages') \
-            .select('url') \
-            .eq('metadata->>source', 'pydantic_ai_docs') \
-            .execute()
-        
-        if not result.data:
-            return []
-            
-        # Extract unique URLs
-        urls = sorted(set(doc['url'] for doc in result.data))
-        return urls
+        # One row per page, served from memory between crawls
+        return await page_index.urls(ctx.deps.repository)
         
     except Exception as e:
         print(f"Error retrieving documentation pages: {e}")
@@ -136,34 +169,30 @@ async def get_page_content(ctx: RunContext[PydanticAIDeps], url: str) -> str:
     Retrieve the full content of a specific documentation page by combining all its chunks.
     
     Args:
-        ctx: The context including the Supabase client
+        ctx: The context including the repository
         url: The URL of the page to retrieve
         
     Returns:
-        str: The complete page content with all chunks combined in order
+        str: The page content with all chunks combined in order, trimmed to the
+        context budget with the remaining sections listed by summary
     """
     try:
-        # Query Supabase for all chunks of this URL, ordered by chunk_number
-        result = ctx.deps.supabase.from_('site_pages') \
-            .select('title, content, chunk_number') \
-            .eq('url', url) \
-            .eq('metadata->>source', 'pydantic_ai_docs') \
-            .order('chunk_number') \
-            .execute()
-        
-        if not result.data:
+        page = await page_index.get(ctx.deps.repository, url)
+        if page is None:
             return f"No content found for URL: {url}"
-            
-        # Format the page with its title and all chunks
-        page_title = result.data[0]['title'].split(' - ')[0]  # Get the main title
-        formatted_content = [f"# {page_title}\n"]
+
+        # All chunks of the page in one query on the (url, chunk_number) index
+        chunks = await ctx.deps.repository.page_chunks(url)
         
-        # Add each chunk's content
-        for chunk in result.data:
-            formatted_content.append(chunk['content'])
+        if not chunks:
+            page_index.invalidate()
+            return f"No content found for URL: {url}"
+        if len(chunks) != page['chunk_count']:
+            # Re-crawled since the copy was loaded
+            page_index.invalidate()
             
-        # Join everything together
-        return "\n\n".join(formatted_content)
+        # Format the page with its title and chunks, within the token budget
+        return context_assembler.page(page['title'], chunks)
         
     except Exception as e:
         print(f"Error retrieving page content: {e}")
@@ -0,0 +1,96 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+import logfire
+from cachetools import TTLCache
+
+from enrichment_cache import EnrichmentCache
+
+cache_hits = logfire.metric_counter('rag.cache.hits', description='Query cache hits')
+cache_misses = logfire.metric_counter('rag.cache.misses', description='Query cache misses')
+cache_hit_rate = logfire.metric_gauge('rag.cache.hit_rate', description='Query cache hit rate since startup')
+
+
+def normalize_query(text: str) -> str:
+    """Case- and whitespace-insensitive form of a query, so trivial rewrites share an entry."""
+    return " ".join(text.lower().split())
+
+
+class QueryCache:
+    """
+    In-memory TTL/LRU caches for the agent's retrieval tool.
+
+    `embeddings` maps (model, normalized query) to the query embedding and
+    `results` maps (embedding hash, match_count, filter, normalized query for
+    hybrid search) to the formatted tool
+    result. If QUERY_CACHE_PATH is set, embeddings are also kept in a SQLite
+    store shared between processes and restarts. Hits and misses are reported
+    as logfire metrics.
+    """
+
+    def __init__(
+        self,
+        maxsize: Optional[int] = None,
+        ttl: Optional[float] = None,
+        store_path: Optional[str] = None,
+    ):
+        maxsize = maxsize or int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+        ttl = ttl or float(os.getenv("QUERY_CACHE_TTL_SECONDS", "3600"))
+        store_path = store_path or os.getenv("QUERY_CACHE_PATH")
+
+        self.embeddings: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.results: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.store = EnrichmentCache(store_path) if store_path else None
+        self.counts: Dict[str, Dict[str, int]] = {
+            "embedding": {"hits": 0, "misses": 0},
+            "result": {"hits": 0, "misses": 0},
+        }
+
+    def _record(self, cache: str, hit: bool):
+        counts = self.counts[cache]
+        counts["hits" if hit else "misses"] += 1
+        (cache_hits if hit else cache_misses).add(1, {"cache": cache})
+        cache_hit_rate.set(self.hit_rate(cache), {"cache": cache})
+
+    def hit_rate(self, cache: str) -> float:
+        counts = self.counts[cache]
+        total = counts["hits"] + counts["misses"]
+        return counts["hits"] / total if total else 0.0
+
+    def get_embedding(self, model: str, text: str) -> Optional[List[float]]:
+        key = (model, normalize_query(text))
+        embedding = self.embeddings.get(key)
+        if embedding is None and self.store is not None:
+            embedding = self.store.get_embedding(model, key[1])
+            if embedding is not None:
+                self.embeddings[key] = embedding
+        self._record("embedding", embedding is not None)
+        return embedding
+
+    def put_embedding(self, model: str, text: str, embedding: List[float]):
+        key = (model, normalize_query(text))
+        self.embeddings[key] = embedding
+        if self.store is not None:
+            self.store.put_embedding(model, key[1], embedding)
+
+    @staticmethod
+    def result_key(
+        embedding: List[float],
+        match_count: int,
+        filter: Dict[str, Any],
+        query_text: Optional[str] = None,
+    ) -> tuple:
+        """Hybrid results also depend on the query's words, not just its embedding."""
+        embedding_hash = hashlib.sha256(json.dumps(embedding).encode("utf-8")).hexdigest()
+        text = normalize_query(query_text) if query_text is not None else None
+        return (embedding_hash, match_count, json.dumps(filter, sort_keys=True), text)
+
+    def get_result(self, key: tuple) -> Optional[str]:
+        result = self.results.get(key)
+        self._record("result", result is not None)
+        return result
+
+    def put_result(self, key: tuple, result: str):
+        self.results[key] = result
@@ -0,0 +1,245 @@
+import os
+import time
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Mapping, Optional
+
+import openai
+from openai import AsyncOpenAI
+
+from markdown_chunker import count_tokens
+
+# Completion tokens to reserve for a chat request that sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Seconds the server asked us to wait, from retry-after-ms or retry-after."""
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `per_minute` units per minute.
+
+    With no configured rate the bucket lets everything through until `observe`
+    learns the real limit from the API's rate-limit headers.
+    """
+
+    def __init__(self, per_minute: Optional[float] = None):
+        self.capacity = per_minute or 0.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60)
+        self._updated = now
+
+    async def acquire(self, amount: float):
+        if not self.capacity:
+            return
+        # Waiters are served in order, so a large request isn't starved by small ones
+        async with self._lock:
+            while True:
+                self._refill()
+                # A single request larger than the bucket only has to wait for a full one
+                needed = min(amount, self.capacity)
+                if self.level >= needed:
+                    self.level -= needed
+                    return
+                await asyncio.sleep((needed - self.level) * 60 / self.capacity)
+
+    def observe(self, limit: Optional[str], remaining: Optional[str]):
+        """Align the bucket with the limit and remaining quota reported by the API."""
+        try:
+            if limit:
+                self._refill()
+                if not self.capacity:
+                    self.level = float(limit)  # First sight of the limit, start from a full bucket
+                self.capacity = float(limit)
+            if remaining is not None and self.capacity:
+                self._refill()
+                self.level = min(self.level, float(remaining))
+        except ValueError:
+            pass
+
+
+class AimdConcurrency:
+    """
+    Concurrency limit that grows additively while requests succeed and halves on
+    rate limiting (AIMD, as in TCP congestion control). The limit grows by one for
+    every `limit` successful requests, i.e. once per round of full concurrency.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = 256):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.active = 0
+        self._condition = asyncio.Condition()
+        self._last_decrease = 0.0
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+
+    async def release(self, succeeded: bool):
+        async with self._condition:
+            self.active -= 1
+            if succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def decrease(self):
+        # Requests already in flight when the limit was hit fail together; count them once
+        now = time.monotonic()
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(self.minimum, self.limit / 2)
+
+
+@dataclass
+class LimiterStats:
+    requests: int = 0
+    rate_limited: int = 0
+    retries: int = 0
+    failures: int = 0
+
+    def report(self, concurrency: float) -> str:
+        return (
+            f"OpenAI requests: {self.requests}, rate limited: {self.rate_limited}, "
+            f"retries: {self.retries}, failed: {self.failures}, concurrency limit: {concurrency:.1f}"
+        )
+
+
+class RateLimitedOpenAI:
+    """
+    Wrapper around AsyncOpenAI shared by every caller of a process.
+
+    Exposes the same `embeddings.create` and `chat.completions.create` calls, but
+    every request first waits for a concurrency slot and for request and token
+    budget in two token buckets (requests and tokens per minute). Limits come from
+    OPENAI_RPM / OPENAI_TPM and are then kept in line with the
+    `x-ratelimit-*` headers of every response. Rate-limit errors, timeouts and 5xx
+    responses are retried with jittered exponential backoff (honouring
+    `retry-after`); a 429 also pauses every caller and halves the concurrency
+    limit, which then creeps back up while requests succeed. Anything still
+    failing after `max_retries` is raised to the caller.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        initial_concurrency: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        # Retries are handled here, with the shared limiter's knowledge
+        self.client = client.with_options(max_retries=0)
+        self.requests = TokenBucket(requests_per_minute or float(os.getenv("OPENAI_RPM") or 0))
+        self.tokens = TokenBucket(tokens_per_minute or float(os.getenv("OPENAI_TPM") or 0))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv("OPENAI_MAX_RETRIES") or 6)
+        self.concurrency = AimdConcurrency(
+            initial_concurrency or int(os.getenv("OPENAI_INITIAL_CONCURRENCY") or 8),
+            maximum=max_concurrency or int(os.getenv("OPENAI_MAX_CONCURRENCY") or 256),
+        )
+        self.stats = LimiterStats()
+        self._paused_until = 0.0
+
+        self.embeddings = _Embeddings(self)
+        self.chat = _Chat(self)
+
+    def _observe(self, headers: Mapping[str, str]):
+        self.requests.observe(headers.get("x-ratelimit-limit-requests"), headers.get("x-ratelimit-remaining-requests"))
+        self.tokens.observe(headers.get("x-ratelimit-limit-tokens"), headers.get("x-ratelimit-remaining-tokens"))
+
+    async def _wait_for_pause(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def request(self, send: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Send a `with_raw_response` request through the limiter and return the parsed result."""
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_pause()
+            await self.requests.acquire(1)
+            await self.tokens.acquire(tokens)
+            await self.concurrency.acquire()
+            succeeded = False
+            try:
+                self.stats.requests += 1
+                response = await send()
+                self._observe(response.headers)
+                succeeded = True
+                return response.parse()
+            except openai.RateLimitError as e:
+                self.stats.rate_limited += 1
+                self._observe(e.response.headers)
+                self.concurrency.decrease()
+                error, server_delay = e, retry_after(e.response.headers)
+            except (openai.APIConnectionError, openai.InternalServerError) as e:
+                # APIConnectionError includes timeouts
+                error, server_delay = e, None
+            finally:
+                await self.concurrency.release(succeeded)
+
+            if attempt == self.max_retries:
+                self.stats.failures += 1
+                raise error
+            self.stats.retries += 1
+            delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+            if server_delay is not None:
+                delay = max(delay, server_delay)
+            if isinstance(error, openai.RateLimitError):
+                # Everyone backs off, not just the request that hit the limit
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+            print(f"OpenAI request failed ({type(error).__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def report(self) -> str:
+        return self.stats.report(self.concurrency.limit)
+
+
+class _Embeddings:
+    def __init__(self, limiter: RateLimitedOpenAI):
+        self._limiter = limiter
+
+    async def create(self, **kwargs):
+        inputs = kwargs.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        tokens = sum(count_tokens(text) for text in inputs)
+        return await self._limiter.request(
+            lambda: self._limiter.client.embeddings.with_raw_response.create(**kwargs), tokens
+        )
+
+
+class _Completions:
+    def __init__(self, limiter: RateLimitedOpenAI):
+        self._limiter = limiter
+
+    async def create(self, **kwargs):
+        prompt_tokens = sum(count_tokens(str(message.get("content") or "")) for message in kwargs.get("messages", []))
+        completion_tokens = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+        return await self._limiter.request(
+            lambda: self._limiter.client.chat.completions.with_raw_response.create(**kwargs),
+            prompt_tokens + completion_tokens
+        )
+
+
+class _Chat:
+    def __init__(self, limiter: RateLimitedOpenAI):
+        self.completions = _Completions(limiter)
@@ -3,6 +3,8 @@ from bs4 import BeautifulSoup
 import requests
 import xml.etree.ElementTree as ET
 import logging
+import zlib
+import re
 import asyncio 
 import aiohttp   
 from collections import deque
@@ -26,157 +28,220 @@ ignore_urls = [
     "tel:", "#" , "javascript:"
 ]
 
+content_indicators = [
+    '/article/', '/post/', '/blog/',
+    '/guide/', '/tutorial/',
+    '/about/', '/page/', '/content/',
+    '/courses/', '/faculty/', '/department/',
+    '/research/', '/publication/',
+    '/news/', '/events/',
+    '/academics/', '/admission/',
+    '/programs/', '/curriculum/',
+    '/syllabus/', '/handbook/',
+    '/contact/', '/location/',
+    '/careers/', '/jobs/',
+    '/faq/', '/help/', '/support/',
+    '/policy/', '/terms/', '/privacy/',
+    '/press/', '/media/', '/announcements/',
+    '/projects/', '/portfolio/',
+    '/services/', '/solutions/',
+    '/team/', '/staff/', '/people/',
+    '/overview/', '/details/', '/description/'
+]
+
+exclude_paths = [
+    # CMS and Admin
+    '/tag/', '/category/', '/author/',
+    '/search/', '/page/', '/wp-content/',
+    '/feed/', '/rss/', '/sitemap/',
+    '/cart/', '/checkout/', '/account/',
+    '/login/', '/register/', '/signup/',
+    '/wp-admin/', '/wp-includes/',
+    '/wp-json/', '/wp-cron/', '/wp-login/',
+    '/administrator/', '/admin/', '/cpanel/',
+    '/dashboard/', '/manage/', '/control/',
+
+    # Assets and Resources
+    '/assets/', '/images/', '/css/', '/js/',
+    '/api/', '/cdn-cgi/', '/comment/',
+    '/archive/', '/month/', '/date/',
+    '/shop/', '/product/', '/cart/',
+    '/fonts/', '/dist/', '/build/',
+    '/temp/', '/tmp/', '/cache/',
+    '/uploads/', '/download/', '/files/',
+    '/thumb/', '/thumbnail/', '/preview/',
+    '/banner/', '/slider/', '/carousel/',
+    '/static/', '/media/', '/resources/',
+
+    # User Interaction
+    '/comment/', '/reply/', '/responses/',
+    '/like/', '/share/', '/favorite/',
+    '/rating/', '/review/', '/feedback/',
+    '/submit/', '/form/', '/contact-form/',
+
+    # Social and External
+    '/social/', '/community/', '/forum/',
+    '/chat/', '/message/', '/notification/',
+    '/profile/', '/user/', '/member/',
+    '/auth/', '/oauth/', '/sso/',
+
+    # Temporary and System
+    '/temp/', '/cache/', '/backup/',
+    '/log/', '/logs/', '/status/',
+    '/test/', '/testing/', '/debug/',
+    '/demo/', '/sample/', '/example/',
+
+    # eCommerce
+    '/cart/', '/basket/', '/checkout/',
+    '/order/', '/payment/', '/transaction/',
+    '/invoice/', '/receipt/', '/shipping/',
+
+    # Tracking and Analytics
+    '/track/', '/analytics/', '/stats/',
+    '/pixel/', '/beacon/', '/tracking/',
+    '/counter/', '/hit/', '/click/'
+]
+
+exclude_extensions = [
+    # Documents
+    '.pdf', '.doc', '.docx', '.txt', '.rtf',
+    '.ppt', '.pptx', '.xls', '.xlsx', '.csv',
+    '.odt', '.ods', '.odp', '.pages', '.numbers',
+    '.key', '.epub', '.mobi',
+
+    # Images
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp',
+    '.svg', '.webp', '.tiff', '.ico', '.psd',
+    '.ai', '.eps',
+
+    # Audio/Video
+    '.mp3', '.wav', '.ogg', '.m4a', '.wma',
+    '.mp4', '.avi', '.mov', '.wmv', '.flv',
+    '.webm', '.mkv', '.m4v',
+
+    # Archives
+    '.zip', '.rar', '.7z', '.tar', '.gz',
+    '.bz2', '.iso',
+
+    # Web Assets
+    '.css', '.js', '.jsx', '.ts', '.tsx',
+    '.json', '.xml', '.yaml', '.yml',
+    '.woff', '.woff2', '.ttf', '.eot',
+    '.map', '.min.js', '.min.css',
+
+    # Configuration
+    '.conf', '.config', '.ini', '.env',
+    '.htaccess', '.htpasswd',
+]
+
+exclude_params = [
+    'page=', 'sort=', 'filter=', 'tag=',
+    'category=', 'lang=', 'ref=', 'source=',
+    'utm_', 'fbclid=', 'gclid=', 'sid=',
+    'session=', 'token=', 'auth=', 'key=',
+    'id=', 'date=', 'version=', 'v=',
+    'format=', 'view=', 'layout=', 'type=',
+    'redirect=', 'return=', 'callback=',
+    'query=', 'search=', 'keywords=',
+    'limit=', 'offset=', 'start=', 'end=',
+    'from=', 'to=', 'dir=', 'order=',
+    'print=', 'download=', 'preview='
+]
+
+
+class URLClassifier:
+    """
+    Precompiled version of the content URL filter, built once and reused.
+
+    Gives exactly the same keep/drop decisions as the original list scans, but
+    patterns of the form '/segment/' are matched with one set lookup over the
+    URL's slash-delimited parts, extensions with a single str.endswith, and the
+    remaining substrings (query params) with one combined regex.
+    """
+
+    def __init__(
+        self,
+        content_indicators=content_indicators,
+        exclude_paths=exclude_paths,
+        exclude_extensions=exclude_extensions,
+        exclude_params=exclude_params,
+    ):
+        self.exclude_extensions = tuple(ext.lower() for ext in exclude_extensions)
+        self.exclude_params = self._compile_substrings(exclude_params)
+        self.exclude_paths = self._compile_substrings(exclude_paths)
+        self.content_indicators = self._compile_substrings(content_indicators)
+
+    @staticmethod
+    def _compile_substrings(patterns):
+        """Split patterns into a set of '/segment/' names and a regex for everything else."""
+        segments = set()
+        others = []
+        for pattern in patterns:
+            pattern = pattern.lower()
+            inner = pattern[1:-1]
+            if len(pattern) > 2 and pattern[0] == '/' and pattern[-1] == '/' and '/' not in inner:
+                segments.add(inner)
+            else:
+                others.append(pattern)
+        regex = None
+        if others:
+            # Longest first so the alternation never stops at a shorter prefix
+            others.sort(key=len, reverse=True)
+            regex = re.compile('|'.join(re.escape(pattern) for pattern in others))
+        return segments, regex
+
+    @staticmethod
+    def _matches(compiled, url_lower, inner_parts):
+        segments, regex = compiled
+        if segments and not segments.isdisjoint(inner_parts):
+            return True
+        return regex is not None and regex.search(url_lower) is not None
+
+    def classify_one(self, url):
+        """Return (keep, reason) for a single URL."""
+        url_lower = url.lower()
+        # '/x/' occurs in the URL exactly when x is one of these slash-delimited parts
+        inner_parts = url_lower.split('/')[1:-1]
+
+        if url_lower.endswith(self.exclude_extensions):
+            return False, 'excluded_extension'
+        if self._matches(self.exclude_params, url_lower, inner_parts):
+            return False, 'excluded_param'
+        if self._matches(self.exclude_paths, url_lower, inner_parts):
+            return False, 'excluded_path'
+
+        path = urlparse(url).path.lower()
+        if path.strip('/').isdigit():
+            return False, 'numeric_path'
+        if len(path.split('/')) > 4:
+            return False, 'too_deep'
+        if self._matches(self.content_indicators, url_lower, inner_parts):
+            return True, 'content_indicator'
+        if len([s for s in path.split('/') if s]) <= 2:
+            return True, 'shallow_path'
+        return False, 'no_content_indicator'
+
+    def classify(self, urls):
+        """Return a (keep, reason) tuple for each URL, in order."""
+        classify_one = self.classify_one
+        return [classify_one(url) for url in urls]
+
+    def is_content_url(self, url):
+        return self.classify_one(url)[0]
+
+
+default_url_classifier = URLClassifier()
+
 def is_content_url(url):
     """Enhanced filter for content-rich pages"""
-    
-    content_indicators = [
-        '/article/', '/post/', '/blog/',
-        '/guide/', '/tutorial/',
-        '/about/', '/page/', '/content/',
-        '/courses/', '/faculty/', '/department/',
-        '/research/', '/publication/',
-        '/news/', '/events/',
-        '/academics/', '/admission/',
-        '/programs/', '/curriculum/',
-        '/syllabus/', '/handbook/',
-        '/contact/', '/location/',
-        '/careers/', '/jobs/',
-        '/faq/', '/help/', '/support/',
-        '/policy/', '/terms/', '/privacy/',
-        '/press/', '/media/', '/announcements/',
-        '/projects/', '/portfolio/',
-        '/services/', '/solutions/',
-        '/team/', '/staff/', '/people/',
-        '/overview/', '/details/', '/description/'
-    ]
-    
-    exclude_paths = [
-        # CMS and Admin
-        '/tag/', '/category/', '/author/',
-        '/search/', '/page/', '/wp-content/',
-        '/feed/', '/rss/', '/sitemap/',
-        '/cart/', '/checkout/', '/account/',
-        '/login/', '/register/', '/signup/',
-        '/wp-admin/', '/wp-includes/',
-        '/wp-json/', '/wp-cron/', '/wp-login/',
-        '/administrator/', '/admin/', '/cpanel/',
-        '/dashboard/', '/manage/', '/control/',
-        
-        # Assets and Resources
-        '/assets/', '/images/', '/css/', '/js/',
-        '/api/', '/cdn-cgi/', '/comment/',
-        '/archive/', '/month/', '/date/',
-        '/shop/', '/product/', '/cart/',
-        '/fonts/', '/dist/', '/build/',
-        '/temp/', '/tmp/', '/cache/',
-        '/uploads/', '/download/', '/files/',
-        '/thumb/', '/thumbnail/', '/preview/',
-        '/banner/', '/slider/', '/carousel/',
-        '/static/', '/media/', '/resources/',
-        
-        # User Interaction
-        '/comment/', '/reply/', '/responses/',
-        '/like/', '/share/', '/favorite/',
-        '/rating/', '/review/', '/feedback/',
-        '/submit/', '/form/', '/contact-form/',
-        
-        # Social and External
-        '/social/', '/community/', '/forum/',
-        '/chat/', '/message/', '/notification/',
-        '/profile/', '/user/', '/member/',
-        '/auth/', '/oauth/', '/sso/',
-        
-        # Temporary and System
-        '/temp/', '/cache/', '/backup/',
-        '/log/', '/logs/', '/status/',
-        '/test/', '/testing/', '/debug/',
-        '/demo/', '/sample/', '/example/',
-        
-        # eCommerce
-        '/cart/', '/basket/', '/checkout/',
-        '/order/', '/payment/', '/transaction/',
-        '/invoice/', '/receipt/', '/shipping/',
-        
-        # Tracking and Analytics
-        '/track/', '/analytics/', '/stats/',
-        '/pixel/', '/beacon/', '/tracking/',
-        '/counter/', '/hit/', '/click/'
-    ]
-    
-    exclude_extensions = [
-        # Documents
-        '.pdf', '.doc', '.docx', '.txt', '.rtf',
-        '.ppt', '.pptx', '.xls', '.xlsx', '.csv',
-        '.odt', '.ods', '.odp', '.pages', '.numbers',
-        '.key', '.epub', '.mobi',
-        
-        # Images
-        '.jpg', '.jpeg', '.png', '.gif', '.bmp',
-        '.svg', '.webp', '.tiff', '.ico', '.psd',
-        '.ai', '.eps',
-        
-        # Audio/Video
-        '.mp3', '.wav', '.ogg', '.m4a', '.wma',
-        '.mp4', '.avi', '.mov', '.wmv', '.flv',
-        '.webm', '.mkv', '.m4v',
-        
-        # Archives
-        '.zip', '.rar', '.7z', '.tar', '.gz',
-        '.bz2', '.iso',
-        
-        # Web Assets
-        '.css', '.js', '.jsx', '.ts', '.tsx',
-        '.json', '.xml', '.yaml', '.yml',
-        '.woff', '.woff2', '.ttf', '.eot',
-        '.map', '.min.js', '.min.css',
-        
-        # Configuration
-        '.conf', '.config', '.ini', '.env',
-        '.htaccess', '.htpasswd',
-    ]
-    
-    exclude_params = [
-        'page=', 'sort=', 'filter=', 'tag=',
-        'category=', 'lang=', 'ref=', 'source=',
-        'utm_', 'fbclid=', 'gclid=', 'sid=',
-        'session=', 'token=', 'auth=', 'key=',
-        'id=', 'date=', 'version=', 'v=',
-        'format=', 'view=', 'layout=', 'type=',
-        'redirect=', 'return=', 'callback=',
-        'query=', 'search=', 'keywords=',
-        'limit=', 'offset=', 'start=', 'end=',
-        'from=', 'to=', 'dir=', 'order=',
-        'print=', 'download=', 'preview='
-    ]
-
-    url_lower = url.lower()
-    parsed_url = urlparse(url)
-    path = parsed_url.path.lower()
-
-  
-    if any(url_lower.endswith(ext) for ext in exclude_extensions):
-        return False
-    if any(param in url_lower for param in exclude_params):
-        return False
-    if any(path in url_lower for path in exclude_paths):
-        return False
-    if path.strip('/').isdigit():
-        return False
-    if len(path.split('/')) > 4:  
-        return False
-    has_content_indicator = any(indicator in url_lower for indicator in content_indicators)
-    
-    if not has_content_indicator: 
-        path_segments = [s for s in path.split('/') if s]
-        return len(path_segments) <= 2
-        
-    return True
+    return default_url_classifier.is_content_url(url)
 
 def filter_urls_for_knowledge_base(urls):
     """Filter and prioritize URLs for knowledge base creation"""
+    urls = list(urls)
     filtered_urls = set()
-    for url in urls:
-        if is_content_url(url):
+    for url, (keep, _reason) in zip(urls, default_url_classifier.classify(urls)):
+        if keep:
             filtered_urls.add(url)
     
     return list(filtered_urls)
@@ -198,10 +263,10 @@ def is_same_domain(base_link, href):
     href_domain = get_domain(href)
     return base_domain and href_domain and base_domain == href_domain
 
-def extract_urls_from_xml(xml_content):
-    """Extract URLs from sitemap XML content"""
+def extract_sitemap_entries(xml_content):
+    """Extract URLs and their <lastmod> (or None) from sitemap XML content"""
     try:
-        urls = set()
+        entries = {}
         root = ET.fromstring(xml_content)
         
       
@@ -211,18 +276,26 @@ def extract_urls_from_xml(xml_content):
                 try:
                     sub_response = requests.get(sitemap.text)
                     if sub_response.status_code == 200:
-                        sub_urls = extract_urls_from_xml(sub_response.content)
-                        urls.update(sub_urls)
+                        sub_entries = extract_sitemap_entries(sub_response.content)
+                        entries.update(sub_entries)
                 except Exception as e:
                     logging.warning(f"Failed to process sub-sitemap {sitemap.text}: {e}")
         else:
-            for url in root.findall('.//{*}loc'):
-                urls.add(url.text)
+            for url in root.findall('.//{*}url'):
+                loc = url.find('{*}loc')
+                if loc is None or not loc.text:
+                    continue
+                lastmod = url.find('{*}lastmod')
+                entries[loc.text.strip()] = lastmod.text.strip() if lastmod is not None and lastmod.text else None
         
-        return urls
+        return entries
     except ET.ParseError as e:
         logging.error(f"XML parsing error: {e}")
-        return set()
+        return {}
+
+def extract_urls_from_xml(xml_content):
+    """Extract URLs from sitemap XML content"""
+    return set(extract_sitemap_entries(xml_content))
 
 def try_default_sitemaps(base_url):
     """Try to fetch URLs from default sitemap locations"""
@@ -269,6 +342,134 @@ def try_robots_txt(base_url):
     return set()
 
 
+def _local_name(tag):
+    return tag.rsplit('}', 1)[-1]
+
+async def _stream_sitemap(session, sitemap_url):
+    """
+    Fetch and incrementally parse one sitemap.
+
+    Returns (entries, sub_sitemaps): page URLs with their <lastmod> for a urlset,
+    or the listed sitemap URLs for a sitemap index. The body is parsed as it
+    streams in (gunzipping .xml.gz on the fly) and each element is discarded once
+    read, so very large sitemaps never sit in memory whole.
+    """
+    entries = {}
+    sub_sitemaps = []
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    decompressor = None
+    root = None
+
+    def consume():
+        nonlocal root
+        for event, element in parser.read_events():
+            if event == 'start':
+                if root is None:
+                    root = element
+                continue
+            name = _local_name(element.tag)
+            if name not in ('url', 'sitemap'):
+                continue
+            loc = lastmod = None
+            for child in element:
+                child_name = _local_name(child.tag)
+                if child_name == 'loc' and child.text:
+                    loc = child.text.strip()
+                elif child_name == 'lastmod' and child.text:
+                    lastmod = child.text.strip()
+            if loc:
+                if name == 'sitemap':
+                    sub_sitemaps.append(loc)
+                else:
+                    entries[loc] = lastmod
+            # Everything read so far is done with
+            root.clear()
+
+    async with session.get(sitemap_url) as response:
+        if response.status != 200:
+            logging.info(f"No sitemap at {sitemap_url} (HTTP {response.status})")
+            return None
+        first = True
+        async for block in response.content.iter_chunked(64 * 1024):
+            # Gzipped sitemaps are usually served as application/gzip, not with Content-Encoding
+            if first:
+                first = False
+                if block[:2] == b'\x1f\x8b':
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            if decompressor is not None:
+                block = decompressor.decompress(block)
+            parser.feed(block)
+            consume()
+        if decompressor is not None:
+            parser.feed(decompressor.flush())
+        parser.close()
+        consume()
+
+    return entries, sub_sitemaps
+
+async def _sitemaps_from_robots(session, base_url):
+    robots_url = urljoin(base_url, '/robots.txt')
+    try:
+        async with session.get(robots_url) as response:
+            if response.status != 200:
+                return []
+            text = await response.text(errors='replace')
+    except Exception as e:
+        logging.warning(f"Failed to fetch robots.txt: {e}")
+        return []
+
+    sitemaps = []
+    for line in text.splitlines():
+        if line.lower().startswith('sitemap:'):
+            sitemaps.append(line.split(':', 1)[1].strip())
+    logging.info(f"Found {len(sitemaps)} sitemap URLs in robots.txt")
+    return sitemaps
+
+async def discover_sitemap_urls(base_url, max_connections_per_host: int = 8, timeout: float = 30):
+    """
+    Async replacement for try_default_sitemaps / try_robots_txt.
+
+    Probes every default sitemap location and robots.txt concurrently, then
+    fetches all sub-sitemaps of any sitemap index in parallel (bounded per host).
+    Returns a dict of page URL -> <lastmod> (or None).
+    """
+    entries = {}
+    seen = set()
+    connector = aiohttp.TCPConnector(limit_per_host=max_connections_per_host)
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_read=timeout, sock_connect=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        async def visit(sitemap_url):
+            if sitemap_url in seen:
+                return
+            seen.add(sitemap_url)
+            try:
+                parsed = await _stream_sitemap(session, sitemap_url)
+            except ET.ParseError as e:
+                logging.error(f"XML parsing error in {sitemap_url}: {e}")
+                return
+            except Exception as e:
+                logging.warning(f"Failed to fetch sitemap {sitemap_url}: {e}")
+                return
+            if parsed is None:
+                return
+            page_entries, sub_sitemaps = parsed
+            entries.update(page_entries)
+            if sub_sitemaps:
+                logging.info(f"Found sitemap index at {sitemap_url}, processing {len(sub_sitemaps)} sub-sitemaps...")
+                await asyncio.gather(*[visit(sub) for sub in sub_sitemaps])
+
+        async def visit_robots():
+            sitemaps = await _sitemaps_from_robots(session, base_url)
+            await asyncio.gather(*[visit(sitemap) for sitemap in sitemaps])
+
+        candidates = [urljoin(base_url, location) for location in sitemap_locations]
+        await asyncio.gather(visit_robots(), *[visit(candidate) for candidate in candidates])
+
+    logging.info(f"Discovered {len(entries)} URLs from {len(seen)} sitemaps")
+    return entries
+
+
 async def extract_urls_crawl(base_url):
     async with AsyncWebCrawler() as crawler: 
         result = await crawler.arun(
@@ -335,15 +536,9 @@ def get_all_urls(base_url):
         logging.info(f"Successfully found {len(urls)} URLs from crawl4ai")
         return urls  
     
-    urls = try_default_sitemaps(base_url)
-    if urls:
-        logging.info(f"Successfully found {len(urls)} URLs from default sitemap")
-        return list(urls)
-    
-
-    urls = try_robots_txt(base_url)
+    urls = asyncio.run(discover_sitemap_urls(base_url))
     if urls:
-        logging.info(f"Successfully found {len(urls)} URLs from robots.txt sitemap")
+        logging.info(f"Successfully found {len(urls)} URLs from sitemaps")
         return list(urls)
     
   
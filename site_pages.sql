@@ -10,24 +10,42 @@ create table site_pages (
     summary varchar not null,
     content text not null,  -- Added content column
     metadata jsonb not null default '{}'::jsonb,  -- Added metadata column
+    -- Every query filters on the source, so keep it in its own indexed column
+    source varchar generated always as (metadata->>'source') stored,
     embedding vector(1536),  -- OpenAI embeddings are 1536 dimensions
+    -- Full-text search document for keyword matching (exact API names and the like)
+    fts tsvector generated always as (
+        to_tsvector('english', coalesce(title, '') || ' ' || coalesce(summary, '') || ' ' || content)
+    ) stored,
     created_at timestamp with time zone default timezone('utc'::text, now()) not null,
     
     -- Add a unique constraint to prevent duplicate chunks for the same URL
     unique(url, chunk_number)
 );
 
--- Create an index for better vector similarity search performance
-create index on site_pages using ivfflat (embedding vector_cosine_ops);
+-- The vector similarity index is built after the first bulk load by
+-- build_site_pages_vector_index (see below), which the crawler calls once it's done
+
+-- Create an index on the source for filtered searches
+create index idx_site_pages_source on site_pages (source);
 
 -- Create an index on metadata for faster filtering
 create index idx_site_pages_metadata on site_pages using gin (metadata);
 
+-- Create an index for full-text search
+create index idx_site_pages_fts on site_pages using gin (fts);
+
 -- Create a function to search for documentation chunks
+-- ef_search (HNSW) and probes (IVFFlat) widen the index search for this call only:
+-- slower, but closer to an exact search. ef_search should be at least match_count.
+-- Anyone can call this, so both are clamped (ef_search to 1..400, probes to 1..100)
+-- to keep one request from scanning most of the index.
 create function match_site_pages (
   query_embedding vector(1536),
   match_count int default 10,
-  filter jsonb DEFAULT '{}'::jsonb
+  filter jsonb DEFAULT '{}'::jsonb,
+  ef_search int default null,
+  probes int default null
 ) returns table (
   id bigint,
   url varchar,
@@ -42,6 +60,13 @@ language plpgsql
 as $$
 #variable_conflict use_column
 begin
+  if ef_search is not null then
+    perform set_config('hnsw.ef_search', least(greatest(ef_search, 1), 400)::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', least(greatest(probes, 1), 100)::text, true);
+  end if;
+
   return query
   select
     id,
@@ -53,12 +78,240 @@ begin
     metadata,
     1 - (site_pages.embedding <=> query_embedding) as similarity
   from site_pages
-  where metadata @> filter
+  where (filter->>'source' is null or site_pages.source = filter->>'source')
+    and metadata @> (filter - 'source')
+    and site_pages.embedding is not null  -- Duplicate chunks are stored without one
   order by site_pages.embedding <=> query_embedding
   limit match_count;
 end;
 $$;
 
+-- Hybrid search: vector and full-text candidates fused with reciprocal rank fusion.
+-- Each row scores sum(1 / (rrf_k + rank)) over the rankings it appears in.
+-- ef_search and probes work as in match_site_pages and are clamped the same way;
+-- ef_search is raised to candidate_count if lower.
+create function hybrid_match_site_pages (
+  query_text text,
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb default '{}'::jsonb,
+  candidate_count int default 50,
+  rrf_k int default 60,
+  ef_search int default null,
+  probes int default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  title varchar,
+  summary varchar,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  -- The index must return candidate_count rows for the semantic ranking to have them
+  perform set_config('hnsw.ef_search', least(greatest(coalesce(ef_search, 1), candidate_count, 1), 400)::text, true);
+  if probes is not null then
+    perform set_config('ivfflat.probes', least(greatest(probes, 1), 100)::text, true);
+  end if;
+
+  return query
+    with semantic as (
+      select
+        site_pages.id,
+        row_number() over (order by site_pages.embedding <=> query_embedding) as rank
+      from site_pages
+      where (filter->>'source' is null or site_pages.source = filter->>'source')
+        and site_pages.metadata @> (filter - 'source')
+        and site_pages.embedding is not null
+      order by site_pages.embedding <=> query_embedding
+      limit candidate_count
+    ),
+    keyword as (
+      select
+        site_pages.id,
+        row_number() over (
+          order by ts_rank_cd(site_pages.fts, websearch_to_tsquery('english', query_text)) desc
+        ) as rank
+      from site_pages
+      where (filter->>'source' is null or site_pages.source = filter->>'source')
+        and site_pages.metadata @> (filter - 'source')
+        and site_pages.embedding is not null
+        and site_pages.fts @@ websearch_to_tsquery('english', query_text)
+      order by ts_rank_cd(site_pages.fts, websearch_to_tsquery('english', query_text)) desc
+      limit candidate_count
+    ),
+    fused as (
+      select
+        coalesce(semantic.id, keyword.id) as id,
+        coalesce(1.0 / (rrf_k + semantic.rank), 0.0) + coalesce(1.0 / (rrf_k + keyword.rank), 0.0) as score
+      from semantic
+      full outer join keyword on semantic.id = keyword.id
+    )
+    select
+      site_pages.id,
+      site_pages.url,
+      site_pages.chunk_number,
+      site_pages.title,
+      site_pages.summary,
+      site_pages.content,
+      site_pages.metadata,
+      fused.score::float as similarity  -- return query needs the declared type
+    from fused
+    join site_pages on site_pages.id = fused.id
+    order by fused.score desc
+    limit match_count;
+end;
+$$;
+
+-- Build (or rebuild) the vector similarity index. Run it after bulk loading: IVFFlat
+-- trains its lists on the rows present at build time, and HNSW builds much faster
+-- over a loaded table than through one insert at a time. With rebuild = false an
+-- existing index is kept. A rebuild builds the new index under a temporary name
+-- while searches keep using the old one (writes wait), then swaps it in, so the
+-- exclusive lock is only held for the drop and rename. The call still runs under
+-- PostgREST's statement timeout: for large tables build the index from psql with
+-- create index concurrently instead.
+create function build_site_pages_vector_index (
+  method text default 'hnsw',
+  m int default 16,
+  ef_construction int default 64,
+  lists int default null,
+  rebuild boolean default true
+) returns text
+language plpgsql
+as $$
+declare
+  row_count bigint;
+begin
+  if not rebuild and to_regclass('idx_site_pages_embedding') is not null then
+    return 'kept existing vector index';
+  end if;
+
+  -- Left behind by a build that failed or timed out
+  drop index if exists idx_site_pages_embedding_new;
+  select count(*) into row_count from site_pages where embedding is not null;
+
+  if method = 'hnsw' then
+    execute format(
+      'create index idx_site_pages_embedding_new on site_pages '
+      'using hnsw (embedding vector_cosine_ops) with (m = %s, ef_construction = %s)',
+      m, ef_construction
+    );
+  elsif method = 'ivfflat' then
+    -- pgvector's guidance: rows / 1000 lists up to 1M rows, sqrt(rows) beyond that
+    lists := coalesce(lists, greatest(
+      case when row_count > 1000000 then sqrt(row_count)::int else (row_count / 1000)::int end,
+      1
+    ));
+    execute format(
+      'create index idx_site_pages_embedding_new on site_pages '
+      'using ivfflat (embedding vector_cosine_ops) with (lists = %s)',
+      lists
+    );
+  else
+    raise exception 'Unknown vector index method: %', method;
+  end if;
+
+  drop index if exists idx_site_pages_embedding;
+  alter index idx_site_pages_embedding_new rename to idx_site_pages_embedding;
+
+  analyze site_pages;
+  return format('built %s vector index over %s rows', method, row_count);
+end;
+$$;
+
+-- One row per crawled page, kept up to date by triggers on site_pages so listing
+-- pages doesn't scan every chunk
+create table pages (
+    url varchar primary key,
+    source varchar,
+    title varchar not null,
+    chunk_count integer not null,
+    content_hash text not null,  -- md5 of the page's chunk contents in order
+    last_crawled timestamp with time zone not null,
+    updated_at timestamp with time zone default timezone('utc'::text, now()) not null
+);
+
+create index idx_pages_source on pages (source);
+
+-- Recompute the pages rows of the given URLs from their chunks
+create function refresh_pages (page_urls varchar[]) returns void
+language sql
+as $$
+  delete from pages
+  where pages.url = any(page_urls)
+    and not exists (select 1 from site_pages where site_pages.url = pages.url);
+
+  insert into pages (url, source, title, chunk_count, content_hash, last_crawled, updated_at)
+  select
+    site_pages.url,
+    max(site_pages.source),
+    -- The first chunk's title, without the section part
+    split_part((array_agg(site_pages.title order by site_pages.chunk_number))[1], ' - ', 1),
+    count(*),
+    md5(string_agg(site_pages.content, '' order by site_pages.chunk_number)),
+    timezone('utc'::text, now()),
+    timezone('utc'::text, now())
+  from site_pages
+  where site_pages.url = any(page_urls)
+  group by site_pages.url
+  on conflict (url) do update set
+    source = excluded.source,
+    title = excluded.title,
+    chunk_count = excluded.chunk_count,
+    content_hash = excluded.content_hash,
+    last_crawled = excluded.last_crawled,
+    updated_at = excluded.updated_at;
+$$;
+
+create function refresh_pages_after_insert() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select distinct url from new_rows));
+  return null;
+end;
+$$;
+
+create function refresh_pages_after_update() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select url from new_rows union select url from old_rows));
+  return null;
+end;
+$$;
+
+create function refresh_pages_after_delete() returns trigger
+language plpgsql
+as $$
+begin
+  perform refresh_pages(array(select distinct url from old_rows));
+  return null;
+end;
+$$;
+
+-- Statement-level, so a batch upsert refreshes each of its pages once
+create trigger site_pages_refresh_pages_insert
+  after insert on site_pages
+  referencing new table as new_rows
+  for each statement execute function refresh_pages_after_insert();
+
+create trigger site_pages_refresh_pages_update
+  after update on site_pages
+  referencing old table as old_rows new table as new_rows
+  for each statement execute function refresh_pages_after_update();
+
+create trigger site_pages_refresh_pages_delete
+  after delete on site_pages
+  referencing old table as old_rows
+  for each statement execute function refresh_pages_after_delete();
+
 -- Everything above will work for any PostgreSQL database. The below commands are for Supabase security
 
 -- Enable RLS on the table
@@ -69,4 +322,16 @@ create policy "Allow public read access"
   on site_pages
   for select
   to public
-  using (true);
\ No newline at end of file
+  using (true);
+
+-- Only the service key may rebuild the vector index
+revoke execute on function build_site_pages_vector_index from public, anon, authenticated;
+
+-- Enable RLS on the pages table, readable by anyone like site_pages
+alter table pages enable row level security;
+
+create policy "Allow public read access"
+  on pages
+  for select
+  to public
+  using (true);
@@ -1,12 +1,12 @@
 from __future__ import annotations
 from typing import Literal, TypedDict
 import asyncio
+import time
 import os
 
 import streamlit as st
 import json
 import logfire
-from supabase import Client
 from openai import AsyncOpenAI
 
 # Import all the message part classes
@@ -23,20 +23,22 @@ from pydantic_ai.messages import (
     ModelMessagesTypeAdapter
 )
 from pydantic_ai_expert import pydantic_ai_expert, PydanticAIDeps
+from repository import Repository
 
 # Load environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
 openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-supabase: Client = Client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
+# Streamlit reruns this script, and its event loop, on every interaction
+repository = Repository.from_env()
 
 # Configure logfire to suppress warnings (optional)
 logfire.configure(send_to_logfire='never')
 
+# Includes the tool calls made before the answer starts, so it tracks tool result size
+time_to_first_token = logfire.metric_histogram('rag.time_to_first_token', unit='ms', description='Time until the first streamed answer token')
+
 class ChatMessage(TypedDict):
     """Format of messages sent to the browser/API."""
 
@@ -72,11 +74,12 @@ async def run_agent_with_streaming(user_input: str):
     """
     # Prepare dependencies
     deps = PydanticAIDeps(
-        supabase=supabase,
+        repository=repository,
         openai_client=openai_client
     )
 
     # Run the agent in a stream
+    start = time.perf_counter()
     async with pydantic_ai_expert.run_stream(
         user_input,
         deps=deps,
@@ -88,6 +91,8 @@ async def run_agent_with_streaming(user_input: str):
 
         # Render partial text as it arrives
         async for chunk in result.stream_text(delta=True):
+            if not partial_text:
+                time_to_first_token.record((time.perf_counter() - start) * 1000)
             partial_text += chunk
             message_placeholder.markdown(partial_text)
 
@@ -138,6 +143,9 @@ async def main():
             # Actually run the agent now, streaming the text
             await run_agent_with_streaming(user_input)
 
+    # The repository's connections belong to this run's event loop
+    await repository.close()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,233 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+import tiktoken
+
+FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+HEADING_RE = re.compile(r"^ {0,3}(#{1,6})[ \t]+(.*?)[ \t#]*$")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Count cl100k tokens, estimating if the tokenizer data can't be loaded."""
+    global _encoding
+    if _encoding is None:
+        try:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception as e:
+            # tiktoken downloads its encoding files on first use
+            print(f"Tokenizer unavailable, estimating token counts: {e}")
+            _encoding = False
+    if _encoding is False:
+        return len(text) // 4 + 1  # Roughly 4 characters per token for English text
+    return len(_encoding.encode(text, disallowed_special=()))
+
+
+@dataclass
+class Block:
+    kind: str  # 'heading', 'fence' or 'paragraph'
+    text: str
+    level: int = 0  # Heading level
+    title: str = ""  # Heading text
+    fence: str = ""  # Opening fence marker, e.g. ``` or ~~~~
+
+
+@dataclass
+class Chunk:
+    text: str
+    tokens: int
+    # Titles of the headings this chunk sits under, outermost first
+    headings: List[str] = field(default_factory=list)
+
+
+def iter_lines(stream: Iterable[str]) -> Iterator[str]:
+    """Turn arbitrary pieces of streamed text into lines."""
+    buffer = ""
+    for piece in stream:
+        buffer += piece
+        if "\n" in piece:
+            *lines, buffer = buffer.split("\n")
+            yield from lines
+    if buffer:
+        yield buffer
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Block]:
+    """Single pass over markdown lines, yielding headings, fenced code blocks and paragraphs."""
+    paragraph: List[str] = []
+    fence_lines: List[str] = []
+    fence: Optional[str] = None
+
+    for line in lines:
+        if fence is not None:
+            fence_lines.append(line)
+            stripped = line.strip()
+            # A closing fence uses the same character, at least as many times, and nothing else
+            if stripped.startswith(fence) and stripped == fence[0] * len(stripped):
+                yield Block("fence", "\n".join(fence_lines), fence=fence)
+                fence, fence_lines = None, []
+            continue
+
+        fence_match = FENCE_RE.match(line)
+        if fence_match:
+            if paragraph:
+                yield Block("paragraph", "\n".join(paragraph))
+                paragraph = []
+            fence, fence_lines = fence_match.group(1), [line]
+            continue
+
+        heading_match = HEADING_RE.match(line)
+        if heading_match:
+            if paragraph:
+                yield Block("paragraph", "\n".join(paragraph))
+                paragraph = []
+            yield Block(
+                "heading",
+                line.strip(),
+                level=len(heading_match.group(1)),
+                title=heading_match.group(2).strip(),
+            )
+            continue
+
+        if not line.strip():
+            if paragraph:
+                yield Block("paragraph", "\n".join(paragraph))
+                paragraph = []
+            continue
+
+        paragraph.append(line)
+
+    if fence is not None:
+        # Unterminated fence in the source, close it so the chunk stays balanced
+        fence_lines.append(fence)
+        yield Block("fence", "\n".join(fence_lines), fence=fence)
+    if paragraph:
+        yield Block("paragraph", "\n".join(paragraph))
+
+
+class MarkdownChunker:
+    """
+    Split markdown into token-bounded chunks without cutting through its structure.
+
+    Works in one pass over the input (a string or any iterable of text pieces) and
+    yields chunks as it goes. Chunks break between blocks, preferring to start a
+    new chunk at a heading. Blocks larger than the budget are split by sentence
+    (paragraphs) or by line (code blocks, re-fencing every piece), so every chunk
+    has balanced ``` fences. Each chunk records the headings it sits under, and
+    `overlap_tokens` repeats the tail of one chunk at the start of the next.
+    """
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        overlap_tokens: Optional[int] = None,
+        token_counter: Callable[[str], int] = count_tokens,
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("CHUNK_MAX_TOKENS", "1200"))
+        self.overlap_tokens = overlap_tokens if overlap_tokens is not None else int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+        # Only break early at a heading once the chunk is this full
+        self.min_tokens = int(self.max_tokens * 0.3)
+        self.count_tokens = token_counter
+
+    def _hard_split(self, text: str, tokens: int) -> Iterator[Tuple[str, int]]:
+        """Last resort for a single line or sentence over budget: cut by length."""
+        piece_chars = max(1, int(len(text) * self.max_tokens / tokens))
+        for start in range(0, len(text), piece_chars):
+            piece = text[start:start + piece_chars]
+            yield piece, self.count_tokens(piece)
+
+    def _group(self, parts: Iterable[str], joiner: str, budget: int) -> Iterator[Tuple[str, int]]:
+        """Greedily pack parts into pieces of at most `budget` tokens."""
+        current: List[str] = []
+        current_tokens = 0
+        for part in parts:
+            part_tokens = self.count_tokens(part)
+            if part_tokens > budget:
+                if current:
+                    yield joiner.join(current), current_tokens
+                    current, current_tokens = [], 0
+                yield from self._hard_split(part, part_tokens)
+                continue
+            if current and current_tokens + part_tokens > budget:
+                yield joiner.join(current), current_tokens
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+        if current:
+            yield joiner.join(current), current_tokens
+
+    def _units(self, block: Block) -> Iterator[Tuple[str, int]]:
+        """Break a block into pieces that each fit in one chunk."""
+        tokens = self.count_tokens(block.text)
+        if tokens <= self.max_tokens:
+            yield block.text, tokens
+            return
+
+        if block.kind == "fence":
+            lines = block.text.split("\n")
+            opening, body = lines[0], lines[1:-1]
+            closing = block.fence[0] * len(block.fence)
+            overhead = self.count_tokens(opening) + self.count_tokens(closing) + 2
+            for piece, piece_tokens in self._group(body, "\n", max(1, self.max_tokens - overhead)):
+                yield f"{opening}\n{piece}\n{closing}", piece_tokens + overhead
+        else:
+            yield from self._group(SENTENCE_END_RE.split(block.text), " ", self.max_tokens)
+
+    def chunks(self, markdown: Union[str, Iterable[str]]) -> Iterator[Chunk]:
+        lines = markdown.split("\n") if isinstance(markdown, str) else iter_lines(markdown)
+
+        headings: List[Tuple[int, str]] = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        chunk_headings: List[str] = []
+        has_new_content = False  # False while `current` only holds overlap from the last chunk
+
+        def emit() -> Chunk:
+            nonlocal current, current_tokens, has_new_content
+            chunk = Chunk("\n\n".join(text for text, _ in current), current_tokens, chunk_headings)
+            # Carry the tail of this chunk into the next one as overlap
+            carried: List[Tuple[str, int]] = []
+            carried_tokens = 0
+            for text, tokens in reversed(current):
+                if carried_tokens + tokens > self.overlap_tokens:
+                    break
+                carried.insert(0, (text, tokens))
+                carried_tokens += tokens
+            current, current_tokens, has_new_content = carried, carried_tokens, False
+            return chunk
+
+        for block in iter_blocks(lines):
+            if block.kind == "heading":
+                # Prefer to start a new chunk at a heading rather than just before one
+                if has_new_content and current_tokens >= self.min_tokens:
+                    yield emit()
+                while headings and headings[-1][0] >= block.level:
+                    headings.pop()
+                headings.append((block.level, block.title))
+
+            for text, tokens in self._units(block):
+                if has_new_content and current_tokens + tokens > self.max_tokens:
+                    yield emit()
+                if current_tokens + tokens > self.max_tokens:
+                    # The overlap can't fit alongside this unit, drop it
+                    current, current_tokens = [], 0
+                if not has_new_content:
+                    chunk_headings = [title for _, title in headings]
+                    has_new_content = True
+                current.append((text, tokens))
+                current_tokens += tokens
+
+        if has_new_content:
+            yield emit()
+
+
+def chunk_markdown(
+    markdown: Union[str, Iterable[str]],
+    max_tokens: Optional[int] = None,
+    overlap_tokens: Optional[int] = None,
+) -> Iterator[Chunk]:
+    """Convenience wrapper around MarkdownChunker.chunks."""
+    return MarkdownChunker(max_tokens, overlap_tokens).chunks(markdown)
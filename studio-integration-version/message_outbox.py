@@ -0,0 +1,187 @@
+import os
+import json
+import random
+import sqlite3
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import logfire
+
+from repository import Repository, is_transient_error
+
+pending_messages = logfire.metric_gauge('rag.outbox.pending', description='Messages waiting to be written')
+
+
+@dataclass
+class OutboxStats:
+    queued: int = 0
+    written: int = 0
+    batches: int = 0
+    retries: int = 0
+    dropped: int = 0
+
+    def report(self) -> str:
+        return (
+            f"Outbox: {self.queued} queued, {self.written} written in {self.batches} batches, "
+            f"{self.retries} retries, {self.dropped} dropped"
+        )
+
+
+class MessageOutbox:
+    """
+    Durable queue of chat messages on their way to the messages table.
+
+    `put()` appends the row to a local SQLite file and returns, so requests don't
+    wait on the database; a background task writes queued rows in order, up to
+    `batch_size` per insert, and deletes them once stored. Transient failures are
+    retried with backoff until they succeed, and rows left behind by a crash or
+    restart are written when the next process starts. Each row keeps the time it
+    was queued as `created_at`, so late writes don't reorder a conversation.
+    """
+
+    def __init__(self, repository: Repository, path: Optional[str] = None, batch_size: Optional[int] = None):
+        self.repository = repository
+        self.path = path or os.getenv("MESSAGE_OUTBOX_PATH", "message_outbox.sqlite3")
+        self.batch_size = batch_size or int(os.getenv("MESSAGE_OUTBOX_BATCH_SIZE") or 100)
+        self.stats = OutboxStats()
+
+        # Used from worker threads, one at a time
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("pragma synchronous=normal")
+        self._db.execute("""
+            create table if not exists outbox (
+                id integer primary key autoincrement,
+                row text not null
+            )
+        """)
+        self._db.commit()
+
+        self._wake = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def _append(self, row: str) -> int:
+        with self._lock:
+            self._db.execute("insert into outbox (row) values (?)", (row,))
+            self._db.commit()
+            return self._db.execute("select count(*) from outbox").fetchone()[0]
+
+    def _peek(self, limit: int) -> List[Tuple[int, Dict[str, Any]]]:
+        with self._lock:
+            rows = self._db.execute("select id, row from outbox order by id limit ?", (limit,)).fetchall()
+        return [(id, json.loads(row)) for id, row in rows]
+
+    def _pending(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "select row from outbox where json_extract(row, '$.session_id') = ? order by id", (session_id,)
+            ).fetchall()
+        return [json.loads(row) for row, in rows]
+
+    def _remove(self, ids: List[int]) -> int:
+        with self._lock:
+            self._db.executemany("delete from outbox where id = ?", [(id,) for id in ids])
+            self._db.commit()
+            return self._db.execute("select count(*) from outbox").fetchone()[0]
+
+    async def put(self, session_id: str, message: Dict[str, Any]) -> None:
+        row = {
+            "session_id": session_id,
+            "message": message,
+            "created_at": datetime.now(timezone.utc).isoformat()
+        }
+        pending = await asyncio.to_thread(self._append, json.dumps(row))
+        self.stats.queued += 1
+        pending_messages.set(pending)
+        self._wake.set()
+
+    async def pending(self, session_id: str) -> List[Dict[str, Any]]:
+        """The session's queued rows that aren't written yet, oldest first."""
+        return await asyncio.to_thread(self._pending, session_id)
+
+    def _backoff(self, attempt: int) -> float:
+        self.stats.retries += 1
+        return min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> Tuple[int, List[int]]:
+        """
+        Insert the rows, retrying transient errors. Returns how many were dropped
+        and the positions of rows that hit a transient error and stay queued.
+        """
+        attempt = 0
+        while True:
+            try:
+                await self.repository.insert_messages(rows)
+                return 0, []
+            except Exception as e:
+                if not is_transient_error(e):
+                    break
+                delay = self._backoff(attempt)
+                attempt += 1
+                print(f"Transient error storing {len(rows)} messages, retrying in {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+
+        # Don't let one bad row hold up the queue: store the rest one at a time
+        dropped, kept = 0, []
+        for i, row in enumerate(rows):
+            try:
+                await self.repository.insert_messages([row])
+            except Exception as e:
+                if is_transient_error(e):
+                    print(f"Transient error storing message for session {row['session_id']}, keeping it queued: {e}")
+                    kept.append(i)
+                    continue
+                print(f"Dropping message for session {row['session_id']}: {e}")
+                dropped += 1
+        return dropped, kept
+
+    async def run(self):
+        """Write queued rows until `close()` is called and the queue is empty."""
+        attempt = 0
+        while True:
+            self._wake.clear()
+            batch = await asyncio.to_thread(self._peek, self.batch_size)
+            if not batch:
+                if self._closing:
+                    return
+                await self._wake.wait()
+                continue
+
+            dropped, kept = await self._write([row for _, row in batch])
+            done = [id for i, (id, _) in enumerate(batch) if i not in kept]
+            pending = await asyncio.to_thread(self._remove, done)
+            self.stats.written += len(done) - dropped
+            self.stats.dropped += dropped
+            self.stats.batches += 1
+            pending_messages.set(pending)
+
+            # Rows kept after a transient error go out again, first, after a pause
+            if kept:
+                delay = self._backoff(attempt)
+                attempt += 1
+                print(f"Retrying {len(kept)} queued messages in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            else:
+                attempt = 0
+
+    def start(self):
+        # Starts with whatever an earlier process left in the file
+        self._task = asyncio.create_task(self.run())
+
+    async def close(self, timeout: float = 10.0):
+        """Write what is queued, for up to `timeout` seconds; the rest stays in the file."""
+        self._closing = True
+        self._wake.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout)
+            except asyncio.TimeoutError:
+                print(f"Message outbox not drained after {timeout:g}s, the rest is written on next start")
+        print(self.stats.report())
+        with self._lock:
+            self._db.close()
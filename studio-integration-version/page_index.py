@@ -0,0 +1,51 @@
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from repository import Repository
+
+
+class PageIndex:
+    """
+    In-process copy of the `pages` table for one source.
+
+    The table holds a row per crawled page and is maintained by triggers on
+    site_pages, so loading it costs O(pages) rather than a scan of every chunk.
+    The copy is served from memory; after `ttl` seconds the next caller checks the
+    table's page count and latest `updated_at` and only reloads if a crawl changed
+    something. `invalidate()` forces a reload, e.g. when a page's chunks no longer
+    match.
+    """
+
+    def __init__(self, source: str = "pydantic_ai_docs", ttl: Optional[float] = None):
+        self.source = source
+        self.ttl = ttl if ttl is not None else float(os.getenv("PAGE_INDEX_TTL_SECONDS") or 300)
+        self._pages: Optional[Dict[str, Dict[str, Any]]] = None
+        self._version: Optional[tuple] = None
+        self._checked = 0.0
+
+    async def pages(self, repository: Repository) -> Dict[str, Dict[str, Any]]:
+        """Every page of the source by URL, in URL order."""
+        if self._pages is not None and time.monotonic() - self._checked < self.ttl:
+            return self._pages
+        version = await repository.pages_version(self.source)
+        if self._pages is None or version != self._version:
+            self._pages = {row['url']: row for row in await repository.pages(self.source)}
+            self._version = version
+        self._checked = time.monotonic()
+        return self._pages
+
+    async def urls(self, repository: Repository) -> List[str]:
+        return list(await self.pages(repository))
+
+    async def get(self, repository: Repository, url: str) -> Optional[Dict[str, Any]]:
+        pages = await self.pages(repository)
+        if url not in pages:
+            # The page may have been crawled since the last check, which is one small query
+            self._checked = 0.0
+            pages = await self.pages(repository)
+        return pages.get(url)
+
+    def invalidate(self):
+        self._pages = None
+        self._version = None
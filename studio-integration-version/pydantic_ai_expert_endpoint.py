@@ -1,30 +1,53 @@
-from typing import List, Optional, Dict, Any
-from fastapi import FastAPI, HTTPException, Security, Depends
+from typing import AsyncIterator, List, Optional, Dict, Any
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import FastAPI, HTTPException, Security, Depends, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from fastapi.middleware.cors import CORSMiddleware
-from supabase import create_client, Client
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from openai import AsyncOpenAI
 from pathlib import Path
-import httpx
+import asyncio
+import json
 import sys
 import os
 
 from pydantic_ai.messages import (
+    ModelMessage,
     ModelRequest,
     ModelResponse,
     UserPromptPart,
     TextPart
 )
 
+from message_outbox import MessageOutbox
 from pydantic_ai_expert import pydantic_ai_expert, PydanticAIDeps
+from repository import Repository
 
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create the pooled clients every request shares, and close them on shutdown."""
+    # Supabase setup, async and pooled so concurrent requests don't wait on each other
+    app.state.repository = Repository.from_env()
+    # OpenAI setup
+    app.state.openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    # Messages are queued locally and written in the background
+    app.state.outbox = MessageOutbox(app.state.repository)
+    app.state.outbox.start()
+    try:
+        yield
+    finally:
+        await app.state.outbox.close()
+        await app.state.openai_client.close()
+        await app.state.repository.close()
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 security = HTTPBearer()
 
 app.add_middleware(
@@ -36,15 +59,6 @@ app.add_middleware(
 )
 
 
-# Supabase setup
-supabase: Client = create_client(
-    os.getenv("SUPABASE_URL"),
-    os.getenv("SUPABASE_SERVICE_KEY")
-)
-
-# OpenAI setup
-openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 # Request/Response Models
 class AgentRequest(BaseModel):
     query: str
@@ -70,24 +84,42 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Security(security))
         )
     return True    
 
-async def fetch_conversation_history(session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
-    """Fetch the most recent conversation history for a session."""
+def created_at(row: Dict[str, Any]) -> datetime:
+    """A row's created_at in UTC; timestamps without an offset are taken to be UTC."""
+    value = datetime.fromisoformat(row["created_at"])
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def message_key(row: Dict[str, Any]) -> tuple:
+    """Identifies a message whether it's read from the table or the outbox."""
+    message = row["message"]
+    request_id = (message.get("data") or {}).get("request_id")
+    if request_id:
+        # A request stores one human and one ai message
+        return (request_id, message["type"])
+    return (created_at(row), message["type"], message["content"])
+
+async def fetch_conversation_history(
+    repository: Repository,
+    outbox: MessageOutbox,
+    session_id: str,
+    limit: int = 10
+) -> List[Dict[str, Any]]:
+    """Fetch the most recent conversation history for a session, including messages still in the outbox."""
     try:
-        response = supabase.table("messages") \
-            .select("*") \
-            .eq("session_id", session_id) \
-            .order("created_at", desc=True) \
-            .limit(limit) \
-            .execute()
-        
-        # Convert to list and reverse to get chronological order
-        messages = response.data[::-1]
-        return messages
+        # The outbox is read first: a row it writes in between is then in the table
+        pending = await outbox.pending(session_id)
+        stored = await repository.recent_messages(session_id, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch conversation history: {str(e)}")
 
-async def store_message(session_id: str, message_type: str, content: str, data: Optional[Dict] = None):
-    """Store a message in the Supabase messages table."""
+    # Oldest first; a row written since it was read from the outbox is in both
+    history = {message_key(row): row for row in stored + pending}
+    return sorted(history.values(), key=created_at)[-limit:]
+
+async def store_message(outbox: MessageOutbox, session_id: str, message_type: str, content: str, data: Optional[Dict] = None):
+    """Queue a message for the Supabase messages table; it is written in the background."""
     message_obj = {
         "type": message_type,
         "content": content
@@ -96,54 +128,73 @@ async def store_message(session_id: str, message_type: str, content: str, data:
         message_obj["data"] = data
 
     try:
-        supabase.table("messages").insert({
-            "session_id": session_id,
-            "message": message_obj
-        }).execute()
+        await outbox.put(session_id, message_obj)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to store message: {str(e)}")
+        print(f"Failed to queue message: {str(e)}")
+
+async def prepare_run(app: FastAPI, request: AgentRequest) -> List[ModelMessage]:
+    """Fetch the history and queue the user's query at the same time, returning the history for the agent."""
+    conversation_history, _ = await asyncio.gather(
+        fetch_conversation_history(app.state.repository, app.state.outbox, request.session_id),
+        store_message(
+            app.state.outbox,
+            session_id=request.session_id,
+            message_type="human",
+            content=request.query,
+            data={"request_id": request.request_id}
+        )
+    )
+
+    # Convert conversation history to format expected by agent
+    messages = []
+    for msg in conversation_history:
+        msg_data = msg["message"]
+        if (msg_data.get("data") or {}).get("request_id") == request.request_id:
+            # This request's own query, if it was written before the history was read
+            continue
+        msg_type = msg_data["type"]
+        msg_content = msg_data["content"]
+        msg = ModelRequest(parts=[UserPromptPart(content=msg_content)]) if msg_type == "human" else ModelResponse(parts=[TextPart(content=msg_content)])
+        messages.append(msg)
+    return messages
+
+async def store_error(app: FastAPI, request: AgentRequest, error: Exception):
+    print(f"Error processing agent request: {str(error)}")
+    # Store error message in conversation
+    await store_message(
+        app.state.outbox,
+        session_id=request.session_id,
+        message_type="ai",
+        content="I apologize, but I encountered an error processing your request.",
+        data={"error": str(error), "request_id": request.request_id}
+    )
 
 @app.post("/api/pydantic-ai-expert", response_model=AgentResponse)
 async def pydantic_ai_expert_endpoint(
     request: AgentRequest,
+    http_request: Request,
     authenticated: bool = Depends(verify_token)
 ):
+    app = http_request.app
     try:
-        # Fetch conversation history
-        conversation_history = await fetch_conversation_history(request.session_id)
-        
-        # Convert conversation history to format expected by agent
-        messages = []
-        for msg in conversation_history:
-            msg_data = msg["message"]
-            msg_type = msg_data["type"]
-            msg_content = msg_data["content"]
-            msg = ModelRequest(parts=[UserPromptPart(content=msg_content)]) if msg_type == "human" else ModelResponse(parts=[TextPart(content=msg_content)])
-            messages.append(msg)
-
-        # Store user's query
-        await store_message(
-            session_id=request.session_id,
-            message_type="human",
-            content=request.query
-        )            
+        messages = await prepare_run(app, request)
 
         # Initialize agent dependencies
-        async with httpx.AsyncClient() as client:
-            deps = PydanticAIDeps(
-                supabase=supabase,
-                openai_client=openai_client
-            )
-
-            # Run the agent with conversation history
-            result = await pydantic_ai_expert.run(
-                request.query,
-                message_history=messages,
-                deps=deps
-            )
+        deps = PydanticAIDeps(
+            repository=app.state.repository,
+            openai_client=app.state.openai_client
+        )
+
+        # Run the agent with conversation history
+        result = await pydantic_ai_expert.run(
+            request.query,
+            message_history=messages,
+            deps=deps
+        )
 
         # Store agent's response
         await store_message(
+            app.state.outbox,
             session_id=request.session_id,
             message_type="ai",
             content=result.data,
@@ -153,15 +204,56 @@ async def pydantic_ai_expert_endpoint(
         return AgentResponse(success=True)
 
     except Exception as e:
-        print(f"Error processing agent request: {str(e)}")
-        # Store error message in conversation
+        await store_error(app, request, e)
+        return AgentResponse(success=False)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_agent_events(app: FastAPI, request: AgentRequest) -> AsyncIterator[str]:
+    """`delta` events with the answer's text as it is generated, then a `done` event."""
+    try:
+        messages = await prepare_run(app, request)
+        deps = PydanticAIDeps(
+            repository=app.state.repository,
+            openai_client=app.state.openai_client
+        )
+
+        answer = ""
+        async with pydantic_ai_expert.run_stream(
+            request.query,
+            message_history=messages,
+            deps=deps
+        ) as result:
+            async for delta in result.stream_text(delta=True):
+                answer += delta
+                yield sse_event("delta", {"content": delta})
+
         await store_message(
+            app.state.outbox,
             session_id=request.session_id,
             message_type="ai",
-            content="I apologize, but I encountered an error processing your request.",
-            data={"error": str(e), "request_id": request.request_id}
+            content=answer,
+            data={"request_id": request.request_id}
         )
-        return AgentResponse(success=False)
+        yield sse_event("done", {"success": True})
+
+    except Exception as e:
+        await store_error(app, request, e)
+        yield sse_event("done", {"success": False})
+
+@app.post("/api/pydantic-ai-expert/stream")
+async def pydantic_ai_expert_stream_endpoint(
+    request: AgentRequest,
+    http_request: Request,
+    authenticated: bool = Depends(verify_token)
+):
+    """Same as /api/pydantic-ai-expert, but streams the answer as server-sent events."""
+    return StreamingResponse(
+        stream_agent_events(http_request.app, request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
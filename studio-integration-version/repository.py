@@ -0,0 +1,126 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase import AsyncClient
+
+PAGE_COLUMNS = "url, title, chunk_count, content_hash, last_crawled, updated_at"
+
+# Postgres SQLSTATEs worth retrying: connection failures, serialization failures,
+# deadlocks and admin shutdowns
+TRANSIENT_SQLSTATES = ("08", "40001", "40P01", "57P01", "57P03")
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, (httpx.TransportError, httpx.TimeoutException)):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code or "")
+        return code == "429" or code.startswith("5") or code.startswith(TRANSIENT_SQLSTATES)
+    return False
+
+
+class Repository:
+    """
+    Async data access for site_pages, pages and messages.
+
+    Wraps one supabase AsyncClient, whose PostgREST client keeps a pool of
+    HTTP/2 connections, so queries never block the event loop and concurrent
+    callers share connections instead of taking turns. At most `max_concurrency`
+    queries (DB_MAX_CONCURRENCY) are in flight at once, which keeps bursts within
+    what PostgREST's own database pool can serve. Create one per process and event
+    loop, and `close()` it on shutdown.
+    """
+
+    def __init__(self, client: AsyncClient, max_concurrency: Optional[int] = None):
+        self.client = client
+        self.max_concurrency = max_concurrency or int(os.getenv("DB_MAX_CONCURRENCY") or 20)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    @classmethod
+    def from_env(cls, max_concurrency: Optional[int] = None) -> "Repository":
+        """A repository for SUPABASE_URL with SUPABASE_SERVICE_KEY."""
+        client = AsyncClient(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+        return cls(client, max_concurrency)
+
+    async def _execute(self, query) -> Any:
+        async with self._semaphore:
+            return await query.execute()
+
+    async def rpc(self, function: str, params: Dict[str, Any]) -> Any:
+        result = await self._execute(self.client.rpc(function, params))
+        return result.data
+
+    # site_pages
+
+    async def upsert_chunks(self, rows: List[Dict[str, Any]], table: str = "site_pages") -> None:
+        await self._execute(self.client.table(table).upsert(rows, on_conflict="url,chunk_number"))
+
+    async def delete_page_chunks(self, url: str, from_chunk: int = 0) -> None:
+        """Delete a page's chunks numbered `from_chunk` and up, by default all of them."""
+        await self._execute(
+            self.client.table("site_pages").delete().eq("url", url).gte("chunk_number", from_chunk)
+        )
+
+    async def page_chunks(self, url: str) -> List[Dict[str, Any]]:
+        """Every chunk of a page in order, from the (url, chunk_number) index."""
+        result = await self._execute(
+            self.client.from_('site_pages')
+            .select('title, summary, content, chunk_number')
+            .eq('url', url)
+            .order('chunk_number')
+        )
+        return result.data or []
+
+    async def duplicate_chunks(self, url: str) -> List[Dict[str, Any]]:
+        """Stored chunks whose `metadata.duplicate_of` link points at a chunk of `url`."""
+        result = await self._execute(
+            self.client.from_('site_pages')
+            .select('url, chunk_number, title, summary, content, metadata')
+            .eq('metadata->duplicate_of->>url', url)
+        )
+        return result.data or []
+
+    # pages
+
+    async def pages_version(self, source: str) -> tuple:
+        """Page count and latest update, which change with any insert, update or delete."""
+        result = await self._execute(
+            self.client.from_('pages')
+            .select('updated_at', count='exact')
+            .eq('source', source)
+            .order('updated_at', desc=True)
+            .limit(1)
+        )
+        return (result.count, result.data[0]['updated_at'] if result.data else None)
+
+    async def pages(self, source: str) -> List[Dict[str, Any]]:
+        result = await self._execute(
+            self.client.from_('pages')
+            .select(PAGE_COLUMNS)
+            .eq('source', source)
+            .order('url')
+        )
+        return result.data or []
+
+    # messages
+
+    async def recent_messages(self, session_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """The session's last `limit` messages, oldest first."""
+        result = await self._execute(
+            self.client.table("messages")
+            .select("*")
+            .eq("session_id", session_id)
+            .order("created_at", desc=True)
+            .limit(limit)
+        )
+        return result.data[::-1]
+
+    async def insert_messages(self, rows: List[Dict[str, Any]]) -> None:
+        """One insert of several messages rows (session_id, message, created_at)."""
+        await self._execute(self.client.table("messages").insert(rows))
+
+    async def close(self):
+        await self.client.postgrest.aclose()
@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import logfire
+import numpy as np
+
+rerank_latency = logfire.metric_histogram('rag.rerank.latency', unit='ms', description='Cross-encoder rerank latency per query')
+
+# Small MS MARCO cross-encoder, fast enough on CPU for a few dozen candidates
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_ONNX_FILE = os.getenv("RERANK_ONNX_FILE", "onnx/model.onnx")
+
+
+@dataclass
+class RerankStats:
+    queries: int = 0
+    candidates: int = 0
+    latencies: List[float] = field(default_factory=list)
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def report(self) -> str:
+        return (
+            f"Rerank: {self.queries} queries, {self.candidates} candidates, "
+            f"p50 {self.percentile(0.5) * 1000:.0f} ms, p95 {self.percentile(0.95) * 1000:.0f} ms"
+        )
+
+
+def document_text(doc: Dict[str, Any]) -> str:
+    return f"{doc.get('title') or ''}\n{doc['content']}"
+
+
+class CrossEncoderReranker:
+    """
+    Rescore retrieval candidates with a cross-encoder run through ONNX Runtime on CPU.
+
+    The tokenizer and ONNX weights are downloaded from the Hugging Face Hub and
+    loaded on first use, then shared by every request of the process. Query and
+    candidate pairs are scored `batch_size` at a time in a worker thread so the
+    event loop keeps serving other requests. onnxruntime is an optional
+    dependency, only imported here.
+    """
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        onnx_file: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        max_length: int = 512,
+        threads: Optional[int] = None,
+    ):
+        self.model = model or RERANK_MODEL
+        self.onnx_file = onnx_file or RERANK_ONNX_FILE
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        self.max_length = max_length
+        self.threads = threads or int(os.getenv("RERANK_THREADS") or 0)
+        self.stats = RerankStats()
+        self._tokenizer = None
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._session is not None:
+                return
+            import onnxruntime
+            from huggingface_hub import hf_hub_download
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(hf_hub_download(self.model, "tokenizer.json"))
+            tokenizer.enable_truncation(max_length=self.max_length)
+            tokenizer.enable_padding(pad_id=tokenizer.token_to_id("[PAD]") or 0)
+
+            options = onnxruntime.SessionOptions()
+            if self.threads:
+                options.intra_op_num_threads = self.threads
+            self._session = onnxruntime.InferenceSession(
+                hf_hub_download(self.model, self.onnx_file),
+                sess_options=options,
+                providers=["CPUExecutionProvider"],
+            )
+            self._tokenizer = tokenizer
+
+    def score(self, query: str, passages: List[str]) -> List[float]:
+        """Relevance logits of each passage to the query, in input order."""
+        self._load()
+        input_names = {model_input.name for model_input in self._session.get_inputs()}
+        scores: List[float] = []
+        for start in range(0, len(passages), self.batch_size):
+            encodings = self._tokenizer.encode_batch(
+                [(query, passage) for passage in passages[start:start + self.batch_size]]
+            )
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            logits = self._session.run(None, {name: feeds[name] for name in input_names})[0]
+            scores.extend(float(score) for score in np.asarray(logits).reshape(len(encodings), -1)[:, 0])
+        return scores
+
+    async def rerank(self, query: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """The candidates ordered by cross-encoder score, best first, each with a `rerank_score`."""
+        if not docs:
+            return []
+        start = time.perf_counter()
+        scores = await asyncio.to_thread(self.score, query, [document_text(doc) for doc in docs])
+        elapsed = time.perf_counter() - start
+
+        self.stats.queries += 1
+        self.stats.candidates += len(docs)
+        self.stats.latencies.append(elapsed)
+        rerank_latency.record(elapsed * 1000)
+
+        ranked = sorted(zip(scores, range(len(docs))), reverse=True)
+        return [{**docs[i], "rerank_score": score} for score, i in ranked]
+
+    def report(self) -> str:
+        return self.stats.report()
+
+
+_reranker: Optional[CrossEncoderReranker] = None
+
+
+def get_reranker() -> Optional[CrossEncoderReranker]:
+    """The process-wide reranker if RERANK=cross-encoder, otherwise None."""
+    global _reranker
+    if os.getenv("RERANK", "none") != "cross-encoder":
+        return None
+    if _reranker is None:
+        _reranker = CrossEncoderReranker()
+    return _reranker
@@ -0,0 +1,279 @@
+from __future__ import annotations as _annotations
+
+import os
+import re
+import json
+import asyncio
+import threading
+import argparse
+from typing import Any, Dict, List, Optional, Protocol
+
+import numpy as np
+from dotenv import load_dotenv
+from supabase import Client, create_client
+
+from repository import Repository
+
+EMBEDDING_DIMENSIONS = 1536
+
+# Columns returned by the match_site_pages RPC, kept in the local index sidecar
+RESULT_COLUMNS = ["id", "url", "chunk_number", "title", "summary", "content", "metadata"]
+
+# Candidates taken from each ranking before fusion, and the RRF damping constant
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Query-time breadth of the site_pages ANN index (HNSW ef_search / IVFFlat probes),
+# unset to use the database defaults
+VECTOR_EF_SEARCH = os.getenv("VECTOR_EF_SEARCH")
+VECTOR_PROBES = os.getenv("VECTOR_PROBES")
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = RRF_K) -> List[tuple]:
+    """Fuse rankings of row positions into (position, score) pairs, best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking, start=1):
+            scores[position] = scores.get(position, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class RetrievalBackend(Protocol):
+    async def match(
+        self,
+        query_embedding: List[float],
+        match_count: int,
+        filter: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """Return the `match_count` most similar chunks whose metadata contains `filter`."""
+        ...
+
+    async def hybrid_match(
+        self,
+        query_text: str,
+        query_embedding: List[float],
+        match_count: int,
+        filter: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """Like `match`, fusing vector similarity with full-text relevance to `query_text`."""
+        ...
+
+
+class SupabaseBackend:
+    """Vector and hybrid search through the match_site_pages and hybrid_match_site_pages RPCs."""
+
+    def __init__(self, repository: Repository, ef_search: Optional[int] = None, probes: Optional[int] = None):
+        self.repository = repository
+        self.ef_search = ef_search or (int(VECTOR_EF_SEARCH) if VECTOR_EF_SEARCH else None)
+        self.probes = probes or (int(VECTOR_PROBES) if VECTOR_PROBES else None)
+
+    def _index_params(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        # Only sent when set, so databases without the tunable RPCs keep working
+        if self.ef_search:
+            params['ef_search'] = self.ef_search
+        if self.probes:
+            params['probes'] = self.probes
+        return params
+
+    async def match(self, query_embedding, match_count, filter):
+        params = {
+            'query_embedding': query_embedding,
+            'match_count': match_count,
+            'filter': filter
+        }
+        result = await self.repository.rpc('match_site_pages', self._index_params(params))
+        return result or []
+
+    async def hybrid_match(self, query_text, query_embedding, match_count, filter):
+        params = {
+            'query_text': query_text,
+            'query_embedding': query_embedding,
+            'match_count': match_count,
+            'filter': filter,
+            'candidate_count': HYBRID_CANDIDATES,
+            'rrf_k': RRF_K
+        }
+        result = await self.repository.rpc('hybrid_match_site_pages', self._index_params(params))
+        return result or []
+
+
+def jsonb_contains(value: Any, pattern: Any) -> bool:
+    """Python equivalent of Postgres `value @> pattern` for JSON values."""
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(
+            key in value and jsonb_contains(value[key], sub) for key, sub in pattern.items()
+        )
+    if isinstance(pattern, list):
+        if not isinstance(value, list):
+            return False
+        return all(any(jsonb_contains(item, sub) for item in value) for sub in pattern)
+    return value == pattern
+
+
+class LocalVectorIndex:
+    """
+    In-process exact cosine search over an exported copy of `site_pages`.
+
+    The index is two files next to each other: `<path>.npy`, a float32 matrix of
+    L2-normalized embeddings opened memory-mapped, and `<path>.json`, the other
+    columns of each row in the same order. Build it with `export_local_index`.
+    Hybrid search adds a BM25 index over each row's title, summary and content,
+    built in memory on first use.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.embeddings = np.load(f"{path}.npy", mmap_mode="r")
+        with open(f"{path}.json", encoding="utf-8") as f:
+            self.rows: List[Dict[str, Any]] = json.load(f)
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._bm25 = None
+        # Searches run in worker threads, only one of them builds the BM25 index
+        self._bm25_lock = threading.Lock()
+
+    def _mask(self, filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        if not filter:
+            return None
+        key = json.dumps(filter, sort_keys=True)
+        if key not in self._filter_masks:
+            self._filter_masks[key] = np.array(
+                [jsonb_contains(row["metadata"], filter) for row in self.rows], dtype=bool
+            )
+        return self._filter_masks[key]
+
+    @staticmethod
+    def _top(scores: np.ndarray, count: int) -> np.ndarray:
+        """Positions of the `count` highest finite scores, best first."""
+        k = min(count, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top[np.isfinite(scores[top])]
+
+    def _vector_scores(self, query_embedding: List[float], filter: Dict[str, Any]) -> Optional[np.ndarray]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return None
+        scores = self.embeddings @ (query / norm)
+        mask = self._mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return scores
+
+    def _keyword_scores(self, query_text: str, filter: Dict[str, Any]) -> np.ndarray:
+        if self._bm25 is None:
+            with self._bm25_lock:
+                if self._bm25 is None:
+                    from rank_bm25 import BM25Okapi
+                    self._bm25 = BM25Okapi([
+                        tokenize(f"{row.get('title') or ''} {row.get('summary') or ''} {row['content']}")
+                        for row in self.rows
+                    ])
+        scores = np.asarray(self._bm25.get_scores(tokenize(query_text)), dtype=np.float32)
+        # Like the tsquery match, only rows containing a query term are candidates
+        scores = np.where(scores > 0, scores, -np.inf)
+        mask = self._mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+        return scores
+
+    def search(self, query_embedding: List[float], match_count: int, filter: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not self.rows:
+            return []
+        scores = self._vector_scores(query_embedding, filter)
+        if scores is None:
+            return []
+        return [{**self.rows[i], "similarity": float(scores[i])} for i in self._top(scores, match_count)]
+
+    async def match(self, query_embedding, match_count, filter):
+        # The matrix product would otherwise block the event loop
+        return await asyncio.to_thread(self.search, query_embedding, match_count, filter)
+
+    async def hybrid_match(self, query_text, query_embedding, match_count, filter):
+        if not self.rows:
+            return []
+        # The two rankings are independent, compute them side by side
+        vector_scores, keyword_scores = await asyncio.gather(
+            asyncio.to_thread(self._vector_scores, query_embedding, filter),
+            asyncio.to_thread(self._keyword_scores, query_text, filter),
+        )
+        rankings = [list(self._top(keyword_scores, HYBRID_CANDIDATES))]
+        if vector_scores is not None:
+            rankings.insert(0, list(self._top(vector_scores, HYBRID_CANDIDATES)))
+        fused = reciprocal_rank_fusion(rankings)[:match_count]
+        return [{**self.rows[i], "similarity": score} for i, score in fused]
+
+
+def _parse_embedding(value: Any) -> List[float]:
+    # PostgREST returns pgvector columns as their text form, e.g. "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def export_local_index(supabase: Client, path: str, page_size: int = 500) -> int:
+    """Copy every `site_pages` row into a LocalVectorIndex at `path`. Returns the row count."""
+    rows = []
+    vectors = []
+    start = 0
+    while True:
+        result = supabase.from_('site_pages') \
+            .select(", ".join(RESULT_COLUMNS + ["embedding"])) \
+            .order('id') \
+            .range(start, start + page_size - 1) \
+            .execute()
+        if not result.data:
+            break
+        for row in result.data:
+            embedding = row.pop("embedding")
+            if embedding is None:
+                continue
+            vectors.append(_parse_embedding(embedding))
+            rows.append(row)
+        start += page_size
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(-1, EMBEDDING_DIMENSIONS)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    np.save(f"{path}.npy", matrix)
+    with open(f"{path}.json", "w", encoding="utf-8") as f:
+        json.dump(rows, f, ensure_ascii=False)
+    return len(rows)
+
+
+_local_indexes: Dict[str, LocalVectorIndex] = {}
+
+def get_retrieval_backend(repository: Repository) -> RetrievalBackend:
+    """
+    Pick the retrieval backend from the environment.
+
+    RETRIEVAL_BACKEND=supabase (default) uses the match_site_pages RPC;
+    RETRIEVAL_BACKEND=local searches the index at LOCAL_INDEX_PATH in process.
+    Local indexes are loaded once and shared.
+    """
+    backend = os.getenv("RETRIEVAL_BACKEND", "supabase")
+    if backend == "supabase":
+        return SupabaseBackend(repository)
+    if backend == "local":
+        path = os.getenv("LOCAL_INDEX_PATH", "local_index/site_pages")
+        if path not in _local_indexes:
+            _local_indexes[path] = LocalVectorIndex(path)
+        return _local_indexes[path]
+    raise ValueError(f"Unknown RETRIEVAL_BACKEND: {backend}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Export site_pages from Supabase into a local vector index.")
+    parser.add_argument("--path", default=os.getenv("LOCAL_INDEX_PATH", "local_index/site_pages"))
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.path) or ".", exist_ok=True)
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_SERVICE_KEY"))
+    count = export_local_index(supabase, args.path)
+    print(f"Exported {count} chunks to {args.path}.npy / {args.path}.json")
@@ -0,0 +1,204 @@
+import os
+import json
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from markdown_chunker import count_tokens
+
+# Characters of each chunk sent for summarization, as in the per-chunk prompt
+CHUNK_EXCERPT_CHARS = 1000
+
+BATCH_SYSTEM_PROMPT = """You are an AI that extracts titles and summaries from documentation chunks.
+You receive several consecutive chunks of one documentation page, each wrapped in <chunk index="N"> tags.
+Return a JSON object with a 'chunks' key holding an array with one object per chunk, in order,
+each with 'index', 'title' and 'summary' keys.
+For the title: If a chunk seems like the start of a document, extract its title. If it's a middle chunk, derive a descriptive title.
+For the summary: Create a concise summary of the main points in the chunk.
+Keep both title and summary concise but informative."""
+
+Fallback = Callable[[str, str], Awaitable[Dict[str, str]]]
+
+
+def chunk_excerpt(chunk: str) -> str:
+    return chunk[:CHUNK_EXCERPT_CHARS]
+
+
+def build_batch_prompt(url: str, chunks: List[str]) -> str:
+    parts = [f"URL: {url}\n"]
+    for i, chunk in enumerate(chunks):
+        parts.append(f'<chunk index="{i}">\n{chunk_excerpt(chunk)}...\n</chunk>')
+    return "\n".join(parts)
+
+
+def parse_batch_response(content: str, expected: int) -> Optional[List[Dict[str, str]]]:
+    """The titles and summaries in chunk order, or None unless every chunk got one."""
+    try:
+        items = json.loads(content)["chunks"]
+        by_index = {int(item["index"]): {"title": str(item["title"]), "summary": str(item["summary"])} for item in items}
+    except (ValueError, KeyError, TypeError):
+        return None
+    if sorted(by_index) != list(range(expected)):
+        return None
+    return [by_index[i] for i in range(expected)]
+
+
+@dataclass
+class SummaryStats:
+    requests: int = 0
+    single_requests: int = 0
+    chunks: int = 0
+    fallbacks: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    def report(self) -> str:
+        total = self.requests + self.single_requests
+        per_request = self.chunks / total if total else 0.0
+        return (
+            f"Summary requests: {total} for {self.chunks} chunks ({per_request:.1f} per request), "
+            f"{self.requests} batched and {self.single_requests} single, "
+            f"{self.fallbacks} batches fell back to per-chunk calls, "
+            f"batched tokens: {self.prompt_tokens} prompt / {self.completion_tokens} completion"
+        )
+
+
+class SummaryBatcher:
+    """
+    Generate titles and summaries for several chunks of a page in one request.
+
+    Callers await `summarize(url, chunk)` as if it were a single request. Chunks of
+    the same page are queued until `max_chunks` chunks or `max_tokens` prompt tokens
+    are pending, or `flush_interval` seconds have passed since the first one, and
+    are then sent as one structured-output request returning an array of
+    {index, title, summary}. If the response can't be parsed or is missing a
+    chunk, the batch falls back to `fallback(chunk, url)` for every chunk.
+    """
+
+    def __init__(
+        self,
+        client,
+        fallback: Fallback,
+        model: Optional[str] = None,
+        max_chunks: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+    ):
+        self.client = client
+        self.fallback = fallback
+        self.model = model or os.getenv("LLM_MODEL", "gpt-4o-mini")
+        self.max_chunks = max_chunks or int(os.getenv("SUMMARY_BATCH_MAX_CHUNKS", "10"))
+        # Well inside the context of current models, leaving room for the answer
+        self.max_tokens = max_tokens or int(os.getenv("SUMMARY_BATCH_MAX_TOKENS", "16000"))
+        self.flush_interval = flush_interval or float(os.getenv("SUMMARY_BATCH_FLUSH_SECONDS", "0.5"))
+        self.stats = SummaryStats()
+
+        self._pending: Dict[str, List[Tuple[str, asyncio.Future]]] = {}
+        self._pending_tokens: Dict[str, int] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self._in_flight: set = set()
+
+    async def summarize(self, url: str, chunk: str) -> Dict[str, str]:
+        """Queue a chunk and wait for its {'title', 'summary'}."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        tokens = count_tokens(chunk_excerpt(chunk))
+
+        # Flush first if this chunk would push the page's batch over its token budget
+        if self._pending.get(url) and self._pending_tokens[url] + tokens > self.max_tokens:
+            self._flush(url)
+
+        self._pending.setdefault(url, []).append((chunk, future))
+        self._pending_tokens[url] = self._pending_tokens.get(url, 0) + tokens
+
+        if len(self._pending[url]) >= self.max_chunks:
+            self._flush(url)
+        elif url not in self._timers:
+            self._timers[url] = loop.call_later(self.flush_interval, self._flush, url)
+
+        return await future
+
+    def _flush(self, url: str):
+        """Send everything queued for a page as one request."""
+        timer = self._timers.pop(url, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(url, [])
+        self._pending_tokens.pop(url, None)
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._send(url, batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, url: str, batch: List[Tuple[str, asyncio.Future]]):
+        self.stats.chunks += len(batch)
+        if len(batch) == 1:
+            # Nothing to share the prompt with
+            await self._fall_back(url, batch)
+            return
+
+        chunks = [chunk for chunk, _ in batch]
+        messages = [
+            {"role": "system", "content": BATCH_SYSTEM_PROMPT},
+            {"role": "user", "content": build_batch_prompt(url, chunks)},
+        ]
+        self.stats.requests += 1
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            print(f"Error summarizing batch of {len(batch)} chunks for {url}: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._count_usage(response, messages)
+        results = parse_batch_response(response.choices[0].message.content, len(batch))
+        if results is None:
+            print(f"Unusable batched summary for {url}, summarizing {len(batch)} chunks one by one")
+            self.stats.fallbacks += 1
+            await self._fall_back(url, batch)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def _fall_back(self, url: str, batch: List[Tuple[str, asyncio.Future]]):
+        self.stats.single_requests += len(batch)
+
+        async def one(chunk: str, future: asyncio.Future):
+            try:
+                result = await self.fallback(chunk, url)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                return
+            if not future.done():
+                future.set_result(result)
+
+        await asyncio.gather(*[one(chunk, future) for chunk, future in batch])
+
+    def _count_usage(self, response, messages: List[Dict[str, str]]):
+        usage = getattr(response, "usage", None)
+        if usage is not None and usage.prompt_tokens:
+            self.stats.prompt_tokens += usage.prompt_tokens
+            self.stats.completion_tokens += usage.completion_tokens
+        else:
+            self.stats.prompt_tokens += sum(count_tokens(message["content"]) for message in messages)
+            self.stats.completion_tokens += count_tokens(response.choices[0].message.content or "")
+
+    async def close(self):
+        """Flush whatever is still queued and wait for in-flight requests."""
+        for url in list(self._pending):
+            self._flush(url)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def report(self) -> str:
+        return self.stats.report()
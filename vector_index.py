@@ -0,0 +1,74 @@
+import os
+import asyncio
+import argparse
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from repository import Repository
+
+# "hnsw" (default), "ivfflat", or "none" to leave the index alone after a crawl
+VECTOR_INDEX_METHOD = os.getenv("VECTOR_INDEX_METHOD", "hnsw")
+
+
+async def build_vector_index(
+    repository: Repository,
+    method: Optional[str] = None,
+    rebuild: bool = True,
+    m: int = 16,
+    ef_construction: int = 64,
+    lists: Optional[int] = None,
+) -> Optional[str]:
+    """
+    Build the site_pages vector index through the build_site_pages_vector_index RPC.
+
+    Call it once the chunks are loaded: IVFFlat lists are trained on the rows present
+    at build time, and an HNSW graph built over the full table is both faster to
+    build and better connected than one grown insert by insert. With `rebuild=False`
+    an existing index is kept, which suits any crawl over an HNSW index (it keeps
+    itself up to date). A rebuild swaps the new index in once it's built. Returns
+    the RPC's description of what it did, or None if disabled.
+    """
+    method = method or VECTOR_INDEX_METHOD
+    if method == "none":
+        return None
+    return await repository.rpc(
+        'build_site_pages_vector_index',
+        {
+            'method': method,
+            'm': m,
+            'ef_construction': ef_construction,
+            'lists': lists,
+            'rebuild': rebuild
+        }
+    )
+
+
+async def main(args):
+    repository = Repository.from_env()
+    try:
+        print(await build_vector_index(
+            repository,
+            method=args.method,
+            rebuild=not args.keep_existing,
+            m=args.m,
+            ef_construction=args.ef_construction,
+            lists=args.lists,
+        ))
+    finally:
+        await repository.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Build the site_pages vector index after a bulk load.")
+    parser.add_argument(
+        "--method",
+        choices=["hnsw", "ivfflat"],
+        default=VECTOR_INDEX_METHOD if VECTOR_INDEX_METHOD != "none" else "hnsw"
+    )
+    parser.add_argument("--m", type=int, default=16, help="HNSW: links per node")
+    parser.add_argument("--ef-construction", type=int, default=64, help="HNSW: candidate list size while building")
+    parser.add_argument("--lists", type=int, default=None, help="IVFFlat: number of lists (default from row count)")
+    parser.add_argument("--keep-existing", action="store_true", help="Do nothing if the index already exists")
+    asyncio.run(main(parser.parse_args()))